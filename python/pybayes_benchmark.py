@@ -0,0 +1,487 @@
+# -*- coding: utf-8 -*-
+#%% NumPyの読み込み
+import numpy as np
+#   時間の計測，JSONファイル，実行環境の情報に用いるモジュールの読み込み
+import time
+import json
+import os
+import sys
+import platform
+import datetime
+import tempfile
+#   警告を出すモジュールの読み込み
+import warnings
+#   プロセスプールの読み込み（ケースごとに新しいプロセスで実行する）
+from concurrent.futures import ProcessPoolExecutor
+#   最大メモリ使用量の取得（Windowsでは使えない）
+try:
+    import resource
+except ImportError:
+    resource = None
+#   PyMCの読み込み（インストールされていなければPyMCのケースは飛ばす）
+try:
+    import pymc as pm
+except ImportError:
+    pm = None
+#   有効標本数の関数の読み込み
+from pybayes_diagnostics import ess
+#   各モデルのサンプラーの読み込み
+from pybayes_gibbs import gibbs_gaussian_chain, gibbs_regression_chains
+from pybayes_conjugate import suffstats, regression_sample
+from pybayes_kernels import ar1_simulate, get_backend
+from pybayes_statespace import ar1_sample, structural_sample
+from pybayes_sv import sv_sample
+from pybayes_glm import logit_gibbs, probit_gibbs, glm_sgld
+#%% 大きさnのデータの生成（各スクリプトと同じデータ生成過程）
+def _data_gaussian(n, rng):
+    return {'data': rng.normal(1.0, 2.0, size=n)}
+def _data_regression(n, rng):
+    x1 = rng.uniform(-np.sqrt(3.0), np.sqrt(3.0), size=n)
+    x2 = rng.uniform(-np.sqrt(3.0), np.sqrt(3.0), size=n)
+    y = 1.0 + 2.0 * x1 - x2 + 0.7 * rng.standard_normal(n)
+    return {'y': y, 'X': np.stack((np.ones(n), x1, x2), axis=1)}
+def _data_simple_regression(n, rng):
+    x = rng.uniform(-np.sqrt(3.0), np.sqrt(3.0), size=n)
+    y = 1.0 + 2.0 * x + 0.7 * rng.standard_normal(n)
+    return {'y': y, 'x': x, 'X': np.stack((np.ones(n), x), axis=1)}
+def _data_glm(model):
+    def generate(n, rng):
+        x1 = rng.uniform(-np.sqrt(3.0), np.sqrt(3.0), size=n)
+        x2 = rng.uniform(-np.sqrt(3.0), np.sqrt(3.0), size=n)
+        eta = 0.5 * x1 - 0.5 * x2
+        if model == 'logit':
+            y = rng.uniform(size=n) < 1.0 / (1.0 + np.exp(-eta))
+        elif model == 'probit':
+            y = eta + rng.standard_normal(n) > 0.0
+        else:
+            y = rng.poisson(np.exp(eta))
+        return {'y': y.astype(float),
+                'X': np.stack((np.ones(n), x1, x2), axis=1)}
+    return generate
+def _data_ar1(n, rng):
+    e = rng.standard_normal(n)
+    e[1:] *= np.sqrt(0.19)
+    return {'y': ar1_simulate(0.9, e) + 0.5 * rng.standard_normal(n)}
+def _data_decomp(n, rng):
+    #   トレンド x[t] = 2x[t-1] - x[t-2] + e[t]，季節変動の和は撹乱項のみ
+    trend = np.cumsum(np.cumsum(0.1 * rng.standard_normal(n)))
+    seasonal = np.empty(n)
+    seasonal[:3] = rng.standard_normal(3)
+    u = 0.2 * rng.standard_normal(n)
+    for t in range(3, n):
+        seasonal[t] = -seasonal[t-1] - seasonal[t-2] - seasonal[t-3] + u[t]
+    return {'y': trend + seasonal + 0.5 * rng.standard_normal(n)}
+def _data_sv(n, rng):
+    e = 0.15 * rng.standard_normal(n)
+    e[0] /= np.sqrt(1.0 - 0.97**2)
+    h = ar1_simulate(0.97, e)
+    return {'y': 0.5 * np.exp(h) * rng.standard_t(7.0, size=n)}
+#%% PyMCを使わないサンプラー（標本は (チェーン, 反復, パラメータ)）
+#   回帰係数の事前分布は平均0，精度行列a0 Iとし，次元はデータのXの列数とする
+_PRIOR = {'a0': 0.2, 'nu0': 5.0, 'lam0': 7.0}
+def _native_gaussian(d, draws, tune, chains, rng, backend):
+    return np.stack([gibbs_gaussian_chain(d['data'], tune + draws, 0.0, 1.0,
+                                          5.0, 7.0, rng,
+                                          backend=backend)[tune:]
+                     for _ in range(chains)])
+def _native_regression(d, draws, tune, chains, rng, backend):
+    k = d['X'].shape[1]
+    return gibbs_regression_chains(d['y'], d['X'], tune + draws,
+                                   np.zeros(k), _PRIOR['a0'] * np.eye(k),
+                                   _PRIOR['nu0'], _PRIOR['lam0'], chains,
+                                   rng)[:, tune:]
+def _native_conjugate(d, draws, tune, chains, rng, backend):
+    k = d['X'].shape[1]
+    state = suffstats('regression', np.column_stack((d['y'], d['X'])))
+    trace = regression_sample(state, np.zeros(k), _PRIOR['a0'] * np.eye(k),
+                              _PRIOR['nu0'], _PRIOR['lam0'], draws, rng,
+                              chains)
+    return np.concatenate((trace.posterior['b'].values,
+                           trace.posterior['sigma2'].values[:, :, None]),
+                          axis=2)
+def _native_ar1(d, draws, tune, chains, rng, backend):
+    return ar1_sample(d['y'], draws, tune, chains, rng, backend)[0]
+def _native_decomp(d, draws, tune, chains, rng, backend):
+    return structural_sample(d['y'], draws, tune, chains, rng,
+                             backend=backend)[0]
+def _native_sv(d, draws, tune, chains, rng, backend):
+    return sv_sample(d['y'], draws, tune, chains, rng)[0]
+def _native_glm(sampler):
+    def run(d, draws, tune, chains, rng, backend):
+        k = d['X'].shape[1]
+        return sampler(d['y'], d['X'], tune + draws, np.zeros(k),
+                       0.01 * np.eye(k), chains, rng)[:, tune:]
+    return run
+def _native_sgld(model):
+    def run(d, draws, tune, chains, rng, backend):
+        #   SGLDはディスク上のデータからミニバッチを読む
+        k = d['X'].shape[1]
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'data.npy')
+            np.save(path, np.column_stack((d['y'], d['X'])))
+            batch_size = max(min(d['y'].size // 10, 1000), 5)
+            return glm_sgld(model, path, tune + draws, np.zeros(k),
+                            0.01 * np.eye(k), chains, rng,
+                            batch_size=batch_size)[:, tune:]
+    return run
+#%% PyMCのモデル（各スクリプトと同じモデル）
+def _pymc_regression(d, prior):
+    X, y = d['X'], d['y']
+    k = X.shape[1]
+    model = pm.Model()
+    with model:
+        if prior == 'laplace':
+            sigma = pm.HalfCauchy('sigma', beta=1.0)
+            b = pm.Laplace('b', mu=0.0, b=1.0, shape=k)
+        else:
+            sigma2 = pm.InverseGamma('sigma2', alpha=0.5*_PRIOR['nu0'],
+                                     beta=0.5*_PRIOR['lam0'])
+            sigma = pm.math.sqrt(sigma2)
+            sd0 = np.full(k, 1.0 / np.sqrt(_PRIOR['a0']))
+            scale = sigma * sd0 if prior == 'conjugate' else sd0
+            b = pm.Normal('b', mu=0.0, sigma=scale, shape=k)
+        pm.Normal('y', mu=pm.math.dot(X, b), sigma=sigma, observed=y)
+    return model
+def _pymc_glm(d, link):
+    k = d['X'].shape[1]
+    model = pm.Model()
+    with model:
+        b = pm.MvNormal('b', mu=np.zeros(k), tau=0.01*np.eye(k), shape=k)
+        idx = pm.math.dot(d['X'], b)
+        if link == 'logit':
+            pm.Bernoulli('y', logit_p=idx, observed=d['y'])
+        elif link == 'probit':
+            pm.Bernoulli('y', p=pm.math.invprobit(idx), observed=d['y'])
+        else:
+            pm.Poisson('y', mu=pm.math.exp(idx), observed=d['y'])
+    return model
+def _pymc_ar1(d):
+    n = d['y'].size
+    model = pm.Model()
+    with model:
+        sigma = pm.HalfCauchy('sigma', beta=1.0)
+        rho = pm.Uniform('rho', lower=-1.0, upper=1.0)
+        omega = pm.HalfCauchy('omega', beta=1.0)
+        ar1 = pm.AR('ar1', rho, sigma=omega, shape=n,
+                    init_dist=pm.Normal.dist(
+                        sigma=omega/pm.math.sqrt(1 - rho**2)))
+        pm.Normal('y', mu=ar1, sigma=sigma, observed=d['y'])
+    return model
+def _pymc_decomp(d):
+    n = d['y'].size
+    model = pm.Model()
+    with model:
+        sigma = pm.HalfCauchy('sigma', beta=1.0)
+        tau = pm.HalfCauchy('tau', beta=1.0)
+        omega = pm.HalfCauchy('omega', beta=1.0)
+        trend = pm.AR('trend', np.array([2.0, -1.0]), sigma=tau, shape=n)
+        seasonal = pm.AR('seasonal', np.array([-1.0, -1.0, -1.0]),
+                         sigma=omega, shape=n)
+        pm.Normal('y', mu=trend+seasonal, sigma=sigma, observed=d['y'])
+    return model
+def _pymc_sv(d):
+    n = d['y'].size
+    model = pm.Model()
+    with model:
+        nu = pm.Exponential('nu', 0.2)
+        sigma = pm.HalfCauchy('sigma', beta=1.0)
+        rho = pm.Uniform('rho', lower=-1.0, upper=1.0)
+        omega = pm.HalfCauchy('omega', beta=1.0)
+        log_vol = pm.AR('log_vol', rho, sigma=omega, shape=n,
+                        init_dist=pm.Normal.dist(
+                            sigma=omega/pm.math.sqrt(1 - rho**2)))
+        pm.StudentT('y', nu, sigma=sigma*pm.math.exp(log_vol),
+                    observed=d['y'])
+    return model
+#%% ベンチマークのケース
+#   名前: (データ生成, PyMCを使わないサンプラー, PyMCのモデル, パラメータ)
+#   （PyMCのモデルのないケースはNone）
+_CASES = {
+    'gibbs_gaussian': (_data_gaussian, _native_gaussian, None,
+                       ['mu', 'sigma2']),
+    'gibbs_regression': (_data_regression, _native_regression, None,
+                         ['b'] * 3 + ['sigma2']),
+    'ar1': (_data_ar1, _native_ar1, _pymc_ar1, ['sigma', 'rho', 'omega']),
+    'decomp': (_data_decomp, _native_decomp, _pymc_decomp,
+               ['sigma', 'tau', 'omega']),
+    'sv': (_data_sv, _native_sv, _pymc_sv, ['nu', 'sigma', 'rho', 'omega']),
+    'logit': (_data_glm('logit'), _native_glm(logit_gibbs),
+              lambda d: _pymc_glm(d, 'logit'), ['b'] * 3),
+    'probit': (_data_glm('probit'), _native_glm(probit_gibbs),
+               lambda d: _pymc_glm(d, 'probit'), ['b'] * 3),
+    'logit_sgld': (_data_glm('logit'), _native_sgld('logit'),
+                   lambda d: _pymc_glm(d, 'logit'), ['b'] * 3),
+    'poisson': (_data_glm('poisson'), _native_sgld('poisson'),
+                lambda d: _pymc_glm(d, 'poisson'), ['b'] * 3),
+    'reg_ex1': (_data_simple_regression, _native_conjugate,
+                lambda d: _pymc_regression(d, 'conjugate'),
+                ['b'] * 2 + ['sigma2']),
+    'reg_ex2': (_data_simple_regression, _native_regression,
+                lambda d: _pymc_regression(d, 'normal'),
+                ['b'] * 2 + ['sigma2']),
+    'reg_ex3': (_data_regression, _native_regression,
+                lambda d: _pymc_regression(d, 'normal'),
+                ['b'] * 3 + ['sigma2']),
+    'reg_ex4': (_data_simple_regression, None,
+                lambda d: _pymc_regression(d, 'laplace'),
+                ['b'] * 2 + ['sigma'])}
+#   プロセスの最大メモリ使用量（MB）
+def _peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    #   Linuxではキロバイト，macOSではバイト単位
+    return peak / (1024.0**2 if sys.platform == 'darwin' else 1024.0)
+#   パラメータ名（同じ名前が続く場合はb[0], b[1], ...とする）
+def _vector_names(param_names):
+    names = []
+    for name in param_names:
+        if param_names.count(name) > 1:
+            names.append('{0:s}[{1:d}]'.format(
+                name, sum(1 for x in names if x.startswith(name + '['))))
+        else:
+            names.append(name)
+    return names
+#   PyMCの標本を (チェーン, 反復, パラメータ) の配列にする
+def _pymc_runs(trace, param_names):
+    runs = []
+    for name in dict.fromkeys(param_names):
+        values = trace.posterior[name].values
+        runs.append(values if values.ndim == 3 else values[:, :, None])
+    return np.concatenate(runs, axis=2)
+def run_benchmark(case, engine, n, draws=1000, tune=500, chains=4, seed=123,
+                  backend='numpy'):
+    """
+        入力
+        case:       ケースの名前（'gibbs_gaussian', 'logit', 'reg_ex1'など）
+        engine:     'native'（PyMCを使わないサンプラー）あるいは'pymc'
+        n:          データの大きさ
+        draws:      チェーンごとの標本の大きさ
+        tune:       バーンインあるいは調整の回数
+        chains:     チェーンの数
+        seed:       乱数のシード
+        backend:    'numpy'あるいは'numba'（'native'の場合）
+        出力
+        結果の辞書（wall_time: 実行時間（秒），compile_time: コンパイル時間（秒），
+        peak_rss_mb: 最大メモリ使用量，ess_per_sec: パラメータごとの
+        1秒あたりの有効標本数など）
+
+        'native'のコンパイル時間は小さなデータでの最初の実行（NumbaのJIT
+        コンパイルを含む）の時間，'pymc'はpm.sample全体の時間から
+        サンプリングの時間（sampling_time）を除いたモデルの構築と
+        コンパイルの時間である．どちらの実行時間もコンパイルを含まない．
+    """
+    if case not in _CASES:
+        raise ValueError('対応していないケースです: {0:s}'.format(case))
+    generate, native, pymc_model, param_names = _CASES[case]
+    rng = np.random.default_rng(seed)
+    data = generate(n, rng)
+    if engine == 'native':
+        if native is None:
+            raise ValueError('{0:s}にはPyMCを使わないサンプラーがない．'
+                             .format(case))
+        backend = get_backend(backend)
+        start = time.perf_counter()
+        native(generate(50, rng), 10, 10, 1, rng, backend)
+        compile_time = time.perf_counter() - start
+        start = time.perf_counter()
+        runs = native(data, draws, tune, chains, rng, backend)
+        wall_time = time.perf_counter() - start
+    elif engine == 'pymc':
+        if pm is None or pymc_model is None:
+            raise ValueError('{0:s}はPyMCで実行できない．'.format(case))
+        backend = 'pymc'
+        start = time.perf_counter()
+        with pymc_model(data):
+            trace = pm.sample(draws=draws, tune=tune, chains=chains, cores=1,
+                              random_seed=seed, progressbar=False)
+        total_time = time.perf_counter() - start
+        #   pm.sampleが記録するサンプリングだけの時間を実行時間とする
+        wall_time = float(trace.posterior.attrs['sampling_time'])
+        compile_time = total_time - wall_time
+        runs = _pymc_runs(trace, param_names)
+    else:
+        raise ValueError("engineは'native'か'pymc'でなければならない．")
+    ess_values = ess(np.asarray(runs))
+    names = _vector_names(param_names)
+    return {'case': case, 'engine': engine, 'backend': backend, 'n': n,
+            'draws': draws, 'tune': tune, 'chains': chains,
+            'wall_time': wall_time, 'compile_time': compile_time,
+            'peak_rss_mb': _peak_rss_mb(),
+            'ess': dict(zip(names, ess_values.tolist())),
+            'ess_per_sec': dict(zip(names,
+                                    (ess_values / wall_time).tolist())),
+            'min_ess_per_sec': float(ess_values.min() / wall_time)}
+#%% ベンチマーク全体の実行と記録
+#   プロセスの中で1つのケースを実行する関数
+def _run_case(args):
+    case, engine, n, draws, tune, chains, seed, backend = args
+    return run_benchmark(case, engine, n, draws, tune, chains, seed, backend)
+def run_suite(cases=None, engines=('native', 'pymc'),
+              sizes=(50, 500, 5000, 50000), draws=1000, tune=500, chains=4,
+              seed=123, backend='numpy'):
+    """
+        入力
+        cases:      ケースの名前のリスト（Noneならば全てのケース）
+        engines:    'native'と'pymc'のどちらか，あるいは両方
+        sizes:      データの大きさのリスト
+        draws:      チェーンごとの標本の大きさ
+        tune:       バーンインあるいは調整の回数
+        chains:     チェーンの数
+        seed:       乱数のシード
+        backend:    'numpy'あるいは'numba'（'native'の場合）
+        出力
+        records:    run_benchmarkの結果のリスト
+
+        最大メモリ使用量がケースごとに測れるように，各ケースを新しい
+        プロセスで実行する．実行できないケース（PyMCがインストールされて
+        いない場合など）や失敗したケースは警告を出して飛ばす．
+    """
+    if 'pymc' in engines and pm is None:
+        warnings.warn('PyMCがインストールされていないので，'
+                      'PyMCのケースを飛ばします．')
+        engines = [engine for engine in engines if engine != 'pymc']
+    records = []
+    for case in (list(_CASES) if cases is None else cases):
+        for engine in engines:
+            if (engine == 'native' and _CASES[case][1] is None) \
+               or (engine == 'pymc' and _CASES[case][2] is None):
+                continue
+            for n in sizes:
+                args = (case, engine, n, draws, tune, chains, seed, backend)
+                try:
+                    with ProcessPoolExecutor(max_workers=1) as executor:
+                        record = executor.submit(_run_case, args).result()
+                except Exception as error:
+                    warnings.warn('{0:s} {1:s} n={2:d}は失敗しました: {3}'
+                                  .format(case, engine, n, error))
+                    continue
+                print('{0:s} {1:s} n={2:d}: {3:.3g}秒, '
+                      '最小ESS/秒 {4:.4g}'.format(case, engine, n,
+                                                record['wall_time'],
+                                                record['min_ess_per_sec']))
+                records.append(record)
+    return records
+#   PyMCを使わないサンプラーとPyMCの比較
+def compare_engines(records, cases=None):
+    """
+        入力
+        records:    run_suiteの結果
+        cases:      比較するケースの名前のリスト（Noneならば全てのケース）
+        出力
+        comparison: 比較の結果のリスト（ratioはPyMCに対する'native'の
+                    最小ESS/秒の比で，1より大きければ'native'の方が効率的）
+
+        同じケース，データの大きさ，標本の大きさ，チェーンの数で'native'と
+        'pymc'の両方の結果があるものを比べる．PyMCがインストールされて
+        いなければrun_suiteがPyMCのケースを飛ばすので，結果は空となる．
+    """
+    def key(record):
+        return tuple(record[name] for name in
+                     ('case', 'n', 'draws', 'chains'))
+    pymc_records = {key(record): record for record in records
+                    if record['engine'] == 'pymc'}
+    comparison = []
+    for record in records:
+        base = pymc_records.get(key(record))
+        if record['engine'] != 'native' or base is None \
+           or (cases is not None and record['case'] not in cases):
+            continue
+        comparison.append({
+            'case': record['case'], 'n': record['n'],
+            'native_wall_time': record['wall_time'],
+            'pymc_wall_time': base['wall_time'],
+            'native_min_ess_per_sec': record['min_ess_per_sec'],
+            'pymc_min_ess_per_sec': base['min_ess_per_sec'],
+            'ratio': record['min_ess_per_sec'] / base['min_ess_per_sec']})
+    return comparison
+#   実行環境の情報
+def _environment():
+    return {'timestamp': datetime.datetime.now().isoformat(),
+            'platform': platform.platform(),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'pymc': None if pm is None else pm.__version__}
+def append_history(path, records):
+    """
+        入力
+        path:       履歴のファイル（.json）
+        records:    run_suiteの結果
+        出力
+        なし（実行環境の情報とともにファイルの末尾に追加する）
+    """
+    history = []
+    if os.path.exists(path):
+        with open(path, encoding='utf-8') as f:
+            history = json.load(f)
+    history.append(dict(_environment(), records=records))
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(history, f, ensure_ascii=False, indent=1)
+def save_baseline(path, records):
+    """
+        入力
+        path:       基準値のファイル（.json）
+        records:    run_suiteの結果
+        出力
+        なし
+    """
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(dict(_environment(), records=records), f,
+                  ensure_ascii=False, indent=1)
+def compare_baseline(records, path, tolerance=0.25):
+    """
+        入力
+        records:    run_suiteの結果
+        path:       基準値のファイル（.json）
+        tolerance:  許容する悪化の割合
+        出力
+        flags:      基準値より悪化した項目のリスト
+
+        同じケース，エンジン，バックエンド，データの大きさ，標本の大きさ，
+        チェーンの数の結果どうしを比べ，実行時間と最大メモリ使用量が
+        (1 + tolerance)倍を超えたもの，最小ESS/秒が1/(1 + tolerance)倍を
+        下回ったものを返す．
+    """
+    with open(path, encoding='utf-8') as f:
+        baseline = json.load(f)['records']
+    def key(record):
+        return tuple(record[name] for name in
+                     ('case', 'engine', 'backend', 'n', 'draws', 'chains'))
+    reference = {key(record): record for record in baseline}
+    flags = []
+    for record in records:
+        base = reference.get(key(record))
+        if base is None:
+            continue
+        for metric, worse in (('wall_time', 1), ('peak_rss_mb', 1),
+                              ('min_ess_per_sec', -1)):
+            if record[metric] is None or base[metric] is None:
+                continue
+            ratio = record[metric] / base[metric]
+            if ratio**worse > 1.0 + tolerance:
+                flags.append({'case': record['case'],
+                              'engine': record['engine'],
+                              'n': record['n'], 'metric': metric,
+                              'baseline': base[metric],
+                              'current': record[metric], 'ratio': ratio})
+    return flags
+#%% ベンチマークの実行
+#   結果はpybayes_benchmark.jsonに追加し，基準値のファイルがあれば比較する
+#   （最初の実行では基準値のファイルを作る．どちらも.gitignoreに含めてある）
+if __name__ == '__main__':
+    history_path = 'pybayes_benchmark.json'
+    baseline_path = 'pybayes_benchmark_baseline.json'
+    records = run_suite()
+    append_history(history_path, records)
+    if os.path.exists(baseline_path):
+        for flag in compare_baseline(records, baseline_path):
+            print('悪化: {case:s} {engine:s} n={n:d} {metric:s} '
+                  '{baseline:.4g} -> {current:.4g}'.format(**flag))
+    else:
+        save_baseline(baseline_path, records)
+    #   プロビット・モデルのギブズ・サンプラー，ポアソン回帰モデルと
+    #   ロジット・モデルのSGLDとPyMC（全データのNUTS）の比較
+    for row in compare_engines(records, ['probit', 'poisson', 'logit_sgld']):
+        print('{case:s} n={n:d}: 最小ESS/秒 {native_min_ess_per_sec:.4g} '
+              '(PyMC {pymc_min_ess_per_sec:.4g}), 比 {ratio:.3g}'
+              .format(**row))
@@ -0,0 +1,366 @@
+# -*- coding: utf-8 -*-
+#%% NumPyの読み込み
+import numpy as np
+#   SciPyのLinalgモジュールの読み込み
+import scipy.linalg as la
+#   SciPyのstatsモジュールの読み込み
+import scipy.stats as st
+#   SciPyのsparseモジュールの読み込み
+import scipy.sparse as sparse
+#   Pandasの読み込み
+import pandas as pd
+#   HPD区間の計算の関数の読み込み
+from pybayes_hpdi import invgamma_hpdi
+#   疎な精度行列の分解の関数の読み込み
+from pybayes_mvn import precision_factor, precision_sample, \
+    sparse_precision_factor, sparse_precision_solve, sparse_precision_sample
+#   モンテカルロ標本をInferenceDataに変換する関数の読み込み
+from pybayes_trace import trace_to_inference_data
+#%% 十分統計量の逐次計算
+#   データの塊（チャンク）からの十分統計量の計算
+def suffstats(model, chunk):
+    """
+        入力
+        model:  'bernoulli', 'poisson', 'gaussian', 'regression'のいずれか
+        chunk:  データの塊
+                （'regression'では1列目が被説明変数，2列目以降が説明変数で，
+                  scipy.sparseの疎行列でもよい）
+        出力
+        十分統計量の辞書（疎行列の塊ではXXも疎行列）
+    """
+    if model == 'regression' and sparse.issparse(chunk):
+        #   ダミー変数などの疎な説明変数はn×kの密行列にしない
+        chunk = sparse.csc_matrix(chunk, dtype=float)
+        y = chunk[:, 0].toarray()[:, 0]
+        X = chunk[:, 1:]
+        return {'n': y.size, 'XX': (X.T @ X).tocsc(), 'Xy': X.T @ y,
+                'yy': y.dot(y)}
+    chunk = np.asarray(chunk, dtype=float)
+    if model in ('bernoulli', 'poisson'):
+        return {'n': chunk.size, 'sum': chunk.sum()}
+    elif model == 'gaussian':
+        n = chunk.size
+        mean = chunk.mean() if n > 0 else 0.0
+        return {'n': n, 'mean': mean,
+                'ssd': np.square(chunk - mean).sum()}
+    elif model == 'regression':
+        y = chunk[:, 0]
+        X = chunk[:, 1:]
+        return {'n': y.size, 'XX': X.T.dot(X), 'Xy': X.T.dot(y),
+                'yy': y.dot(y)}
+    raise ValueError('対応していないモデルです: {0:s}'.format(model))
+#   2つの十分統計量の統合
+def merge_suffstats(model, state1, state2):
+    """
+        入力
+        model:  'bernoulli', 'poisson', 'gaussian', 'regression'のいずれか
+        state1: 十分統計量の辞書
+        state2: 十分統計量の辞書
+        出力
+        統合された十分統計量の辞書
+    """
+    n = state1['n'] + state2['n']
+    if model in ('bernoulli', 'poisson'):
+        return {'n': n, 'sum': state1['sum'] + state2['sum']}
+    elif model == 'gaussian':
+        #   Welfordの方法（Chanらの並列版）による平均と偏差平方和の統合
+        if n == 0:
+            return {'n': 0, 'mean': 0.0, 'ssd': 0.0}
+        delta = state2['mean'] - state1['mean']
+        mean = state1['mean'] + delta * state2['n'] / n
+        ssd = state1['ssd'] + state2['ssd'] \
+              + delta**2 * state1['n'] * state2['n'] / n
+        return {'n': n, 'mean': mean, 'ssd': ssd}
+    elif model == 'regression':
+        return {'n': n, 'XX': state1['XX'] + state2['XX'],
+                'Xy': state1['Xy'] + state2['Xy'],
+                'yy': state1['yy'] + state2['yy']}
+    raise ValueError('対応していないモデルです: {0:s}'.format(model))
+#   データの塊の系列からの十分統計量の逐次計算
+def stream_suffstats(model, chunks):
+    """
+        入力
+        model:  'bernoulli', 'poisson', 'gaussian', 'regression'のいずれか
+        chunks: データの塊を返すイテラブル
+        出力
+        十分統計量の辞書
+    """
+    state = None
+    for chunk in chunks:
+        new_state = suffstats(model, chunk)
+        state = new_state if state is None \
+                else merge_suffstats(model, state, new_state)
+    if state is None:
+        raise ValueError('データが空です．')
+    return state
+#   CSVファイルあるいは.npyファイルからのデータの塊の読み込み
+def read_chunks(path, chunksize, usecols=None):
+    """
+        入力
+        path:       CSVファイル（.csv）あるいはNumPy形式のファイル（.npy）
+        chunksize:  1つの塊に含まれる行数
+        usecols:    読み込む列（CSVファイルの場合のみ）
+        出力
+        データの塊を返すジェネレーター
+    """
+    if str(path).endswith('.npy'):
+        #   メモリマップで開くので，読み込むのは塊の部分だけとなる
+        data = np.load(path, mmap_mode='r')
+        for start in range(0, data.shape[0], chunksize):
+            yield np.asarray(data[start:start+chunksize])
+    else:
+        for frame in pd.read_csv(path, chunksize=chunksize, usecols=usecols):
+            yield frame.values
+#%% 十分統計量からの事後分布のパラメータの計算
+#   ベルヌーイ分布の成功確率の事後分布（ベータ分布）
+def bernoulli_posterior(state, a0, b0):
+    """
+        入力
+        state:  十分統計量の辞書
+        a0:     事前分布のパラメータ1
+        b0:     事前分布のパラメータ2
+        出力
+        a:      事後分布のパラメータ1
+        b:      事後分布のパラメータ2
+    """
+    return state['sum'] + a0, state['n'] - state['sum'] + b0
+#   ポアソン分布のパラメータの事後分布（ガンマ分布）
+def poisson_posterior(state, a0, b0):
+    """
+        入力
+        state:  十分統計量の辞書
+        a0:     事前分布の形状パラメータ
+        b0:     事前分布の尺度パラメータの逆数
+        出力
+        a_star: 事後分布の形状パラメータ
+        b_star: 事後分布の尺度パラメータの逆数
+    """
+    return state['sum'] + a0, state['n'] + b0
+#   正規分布の平均と分散の事後分布（正規・逆ガンマ分布）
+def gaussian_posterior(state, mu0, n0, nu0, lam0):
+    """
+        入力
+        state:  十分統計量の辞書
+        mu0:    平均の条件付事前分布（正規分布）の平均
+        n0:     平均の条件付事前分布（正規分布）の精度パラメータ
+        nu0:    分散の事前分布（逆ガンマ分布）の形状パラメータ
+        lam0:   分散の事前分布（逆ガンマ分布）の尺度パラメータ
+        出力
+        mu_star:    平均の条件付事後分布（正規分布）の平均
+        n_star:     平均の条件付事後分布（正規分布）の精度パラメータ
+        nu_star:    分散の事後分布（逆ガンマ分布）の形状パラメータ
+        lam_star:   分散の事後分布（逆ガンマ分布）の尺度パラメータ
+    """
+    n = state['n']
+    mean_data = state['mean']
+    n_star = n + n0
+    mu_star = (n * mean_data + n0 * mu0) / n_star
+    nu_star = n + nu0
+    lam_star = state['ssd'] + n * n0 / n_star * (mu0 - mean_data)**2 + lam0
+    return mu_star, n_star, nu_star, lam_star
+#   疎行列の事前分布の精度行列（対角要素のベクトルでもよい）
+def _sparse_precision(A0):
+    if np.ndim(A0) == 1:
+        A0 = sparse.diags(A0)
+    return sparse.csc_matrix(A0)
+#   回帰モデルの係数と誤差項の分散の事後分布（正規・逆ガンマ分布）
+def regression_posterior(state, b0, A0, nu0, lam0):
+    """
+        入力
+        state:  十分統計量の辞書
+        b0:     回帰係数の条件付事前分布（多変量正規分布）の平均
+        A0:     回帰係数の条件付事前分布（多変量正規分布）の精度行列
+        nu0:    誤差項の分散の事前分布（逆ガンマ分布）の形状パラメータ
+        lam0:   誤差項の分散の事前分布（逆ガンマ分布）の尺度パラメータ
+        出力
+        b_star:     回帰係数の条件付事後分布（多変量正規分布）の平均
+        A_star:     回帰係数の条件付事後分布（多変量正規分布）の精度行列
+        nu_star:    誤差項の分散の事後分布（逆ガンマ分布）の形状パラメータ
+        lam_star:   誤差項の分散の事後分布（逆ガンマ分布）の尺度パラメータ
+        rss:        最小二乗法の残差平方和
+
+        stateのXXが疎行列の場合はA0も疎行列（あるいはその対角要素の
+        ベクトル）でよく，A_starは疎行列となる．ダミー変数ではXXが正則とは
+        限らないので，最小二乗推定量を使わずに
+        lam_star = y'y + b0' A0 b0 - b_star' A_star b_star + lam0 とし，
+        rssはNoneとする．
+    """
+    if sparse.issparse(state['XX']):
+        A0 = _sparse_precision(A0)
+        A0b0 = A0 @ b0
+        r = state['Xy'] + A0b0
+        A_star = (state['XX'] + A0).tocsc()
+        b_star = sparse_precision_solve(sparse_precision_factor(A_star), r)
+        nu_star = state['n'] + nu0
+        lam_star = state['yy'] + b0.dot(A0b0) - b_star.dot(r) + lam0
+        return b_star, A_star, nu_star, lam_star, None
+    XX = state['XX']
+    Xy = state['Xy']
+    b_ols = la.solve(XX, Xy, assume_a='pos')
+    rss = max(state['yy'] - Xy.dot(b_ols), 0.0)
+    A_star = XX + A0
+    b_star = la.solve(A_star, Xy + A0.dot(b0), assume_a='pos')
+    nu_star = state['n'] + nu0
+    #   (XX^{-1} + A0^{-1})^{-1} = XX - XX (XX + A0)^{-1} XX を用いる
+    C_star = XX - XX.dot(la.solve(A_star, XX, assume_a='pos'))
+    lam_star = rss + (b0 - b_ols).T.dot(C_star).dot(b0 - b_ols) + lam0
+    return b_star, A_star, nu_star, lam_star, rss
+#%% 事後分布からの独立な標本の直接生成（自然共役事前分布）
+def regression_sample(state, b0, A0, nu0, lam0, draws, rng, chains=1,
+                      var_names=None):
+    """
+        入力
+        state:  十分統計量の辞書
+        b0:     回帰係数の条件付事前分布（多変量正規分布）の平均
+        A0:     回帰係数の条件付事前分布（多変量正規分布）の精度行列
+        nu0:    誤差項の分散の事前分布（逆ガンマ分布）の形状パラメータ
+        lam0:   誤差項の分散の事前分布（逆ガンマ分布）の尺度パラメータ
+        draws:  チェーンごとの標本の大きさ
+        rng:    乱数生成器 (numpy.random.Generator)
+        chains: チェーンの数
+        var_names:  回帰係数の変数名のリスト（Noneならば回帰係数全体を'b'とする）
+        出力
+        ArviZのInferenceData（誤差項の分散の変数名は'sigma2'）
+
+        sigma2 ~ IG(nu_star/2, lam_star/2)，
+        b | sigma2 ~ N(b_star, sigma2 A_star^{-1})
+        から直接生成するので，標本は互いに独立でMCMCのバーンインも不要である．
+        A_starのコレスキー分解は1回だけ計算して全ての標本に使い回す
+        （A_starが疎行列の場合は疎行列のまま分解する）．
+    """
+    b_star, A_star, nu_star, lam_star, _ \
+        = regression_posterior(state, b0, A0, nu0, lam0)
+    k = b_star.size
+    size = chains * draws
+    sigma2 = 0.5 * lam_star / rng.standard_gamma(0.5 * nu_star, size=size)
+    if sparse.issparse(A_star):
+        z = sparse_precision_sample(sparse_precision_factor(A_star),
+                                    np.zeros(k), rng, size=size)
+    else:
+        z = precision_sample(precision_factor(A_star), np.zeros(k), rng,
+                             size=size)
+    b = b_star + np.sqrt(sigma2)[:, None] * z
+    runs = np.column_stack((b, sigma2)).reshape((chains, draws, k + 1))
+    if var_names is None:
+        var_names = ['b'] * k
+    return trace_to_inference_data(runs, list(var_names) + ['sigma2'])
+#%% 多数のグループに対する回帰モデルの一括計算
+#   グループごとの十分統計量の計算
+def grouped_suffstats(y, X, groups=None):
+    """
+        入力
+        y:      被説明変数 (グループ, 観測値) あるいは (観測値)
+        X:      説明変数 (グループ, 観測値, 説明変数) あるいは (観測値, 説明変数)
+        groups: 各観測値が属するグループの番号 (0, 1, ..., G-1)
+                （欠番のグループは観測値のないグループとして扱う）
+                （yとXが3次元配列の場合はNone）
+        出力
+        グループごとの十分統計量の辞書（各要素の最初の次元がグループ）
+        （merge_suffstats('regression', ...)でそのまま統合できる）
+    """
+    y = np.asarray(y, dtype=float)
+    X = np.asarray(X, dtype=float)
+    if groups is None:
+        if X.ndim != 3:
+            raise ValueError('groupsを与えない場合はXが3次元配列でなければならない．')
+        return {'n': np.full(X.shape[0], X.shape[1]),
+                'XX': np.einsum('gni,gnj->gij', X, X),
+                'Xy': np.einsum('gni,gn->gi', X, y),
+                'yy': np.einsum('gn,gn->g', y, y)}
+    groups = np.asarray(groups)
+    G = groups.max() + 1
+    k = X.shape[1]
+    #   グループ番号を重み付きで数えることでグループごとの和を求める
+    XX = np.empty((G, k, k))
+    for i in range(k):
+        for j in range(i + 1):
+            XX[:, i, j] = XX[:, j, i] = np.bincount(groups, X[:, i] * X[:, j],
+                                                    minlength=G)
+    Xy = np.column_stack([np.bincount(groups, X[:, i] * y, minlength=G)
+                          for i in range(k)])
+    return {'n': np.bincount(groups, minlength=G), 'XX': XX, 'Xy': Xy,
+            'yy': np.bincount(groups, y * y, minlength=G)}
+#   コレスキー因子Lを用いた連立方程式 L L' x = b の一括計算
+def _cho_solve(L, b):
+    w = np.linalg.solve(L, b[..., None])
+    return np.linalg.solve(L.swapaxes(-1, -2), w)[..., 0]
+#   グループごとの回帰係数と誤差項の分散の事後分布（正規・逆ガンマ分布）
+def grouped_regression_posterior(state, b0, A0, nu0, lam0):
+    """
+        入力
+        state:  grouped_suffstatsで計算した十分統計量の辞書
+        b0:     回帰係数の条件付事前分布（多変量正規分布）の平均
+        A0:     回帰係数の条件付事前分布（多変量正規分布）の精度行列
+        nu0:    誤差項の分散の事前分布（逆ガンマ分布）の形状パラメータ
+        lam0:   誤差項の分散の事前分布（逆ガンマ分布）の尺度パラメータ
+        出力
+        b_star:     回帰係数の条件付事後分布の平均 (グループ, 説明変数)
+        L_star:     条件付事後分布の精度行列のコレスキー因子
+                    (グループ, 説明変数, 説明変数)
+        nu_star:    誤差項の分散の事後分布の形状パラメータ (グループ)
+        lam_star:   誤差項の分散の事後分布の尺度パラメータ (グループ)
+
+        逆行列は一切計算せず，A_star = XX + A0のコレスキー分解だけを使う．
+        観測値が説明変数より少ないグループではXXが正則でないので，最小二乗
+        推定量を使わずに lam_star = y'y + b0' A0 b0 - b_star' A_star b_star
+        + lam0 とする．観測値のないグループ（欠番）の事後分布は事前分布になる．
+    """
+    XX = state['XX']
+    A0b0 = A0.dot(b0)
+    r = state['Xy'] + A0b0
+    L_star = np.linalg.cholesky(XX + A0)
+    b_star = _cho_solve(L_star, r)
+    nu_star = state['n'] + nu0
+    lam_star = state['yy'] + b0.dot(A0b0) \
+               - np.einsum('gi,gi->g', b_star, r) + lam0
+    return b_star, L_star, nu_star, lam_star
+#   グループごとの事後統計量の計算
+def grouped_regression_stats(state, b0, A0, nu0, lam0, prob,
+                             param_names=None):
+    """
+        入力
+        state:  grouped_suffstatsで計算した十分統計量の辞書
+        b0:     回帰係数の条件付事前分布（多変量正規分布）の平均
+        A0:     回帰係数の条件付事前分布（多変量正規分布）の精度行列
+        nu0:    誤差項の分散の事前分布（逆ガンマ分布）の形状パラメータ
+        lam0:   誤差項の分散の事前分布（逆ガンマ分布）の尺度パラメータ
+        prob:   区間確率 (0 < prob < 1)
+        param_names:    回帰係数の名前のリスト（Noneならば番号を使う）
+        出力
+        results:    事後統計量のデータフレーム（行は(グループ, パラメータ)）
+        b_star:     回帰係数の条件付事後分布の平均
+        h_star:     回帰係数の周辺事後分布（t分布）の尺度パラメータ
+        nu_star:    誤差項の分散の事後分布の形状パラメータ
+        lam_star:   誤差項の分散の事後分布の尺度パラメータ
+    """
+    b_star, L_star, nu_star, lam_star \
+        = grouped_regression_posterior(state, b0, A0, nu0, lam0)
+    G, k = b_star.shape
+    #   diag(A_star^{-1})の各要素は L_star^{-1} の列の二乗和
+    W = np.linalg.solve(L_star, np.broadcast_to(np.eye(k), L_star.shape))
+    h_star = np.sqrt((lam_star / nu_star)[:, None] * np.square(W).sum(axis=1))
+    nu = nu_star[:, None]
+    sd_b = st.t.std(nu, loc=b_star, scale=h_star)
+    half_width = st.t.ppf(0.5 + 0.5 * prob, nu) * h_star
+    #   t分布は対称なのでHPD区間は信用区間と一致する
+    stats_b = np.stack((b_star, b_star, b_star, sd_b,
+                        b_star - half_width, b_star + half_width,
+                        b_star - half_width, b_star + half_width), axis=-1)
+    a = 0.5 * nu_star
+    scale = 0.5 * lam_star
+    stats_sigma2 = np.column_stack((
+        st.invgamma.mean(a, scale=scale), st.invgamma.median(a, scale=scale),
+        lam_star / (nu_star + 2.0), st.invgamma.std(a, scale=scale),
+        np.column_stack(st.invgamma.interval(prob, a, scale=scale)),
+        invgamma_hpdi(a, scale, prob)))
+    stats = np.concatenate((stats_b, stats_sigma2[:, None, :]), axis=1)
+    if param_names is None:
+        param_names = ['回帰係数{0:d}'.format(i) for i in range(k)]
+    stats_string = ['平均', '中央値', '最頻値', '標準偏差', '信用区間（下限）',
+                    '信用区間（上限）', 'HPD区間（下限）', 'HPD区間（上限）']
+    index = pd.MultiIndex.from_product(
+        (range(G), list(param_names) + ['分散 $\\sigma^2$']),
+        names=('グループ', 'パラメータ'))
+    results = pd.DataFrame(stats.reshape((G * (k + 1), 8)), index=index,
+                           columns=stats_string)
+    return results, b_star, h_star, nu_star, lam_star
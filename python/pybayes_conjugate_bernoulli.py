@@ -3,8 +3,8 @@
 import numpy as np
 #   SciPyのstatsモジュールの読み込み
 import scipy.stats as st
-#   SciPyのoptimizeモジュールの読み込み
-import scipy.optimize as opt
+#   HPD区間の計算の関数の読み込み
+from pybayes_hpdi import beta_hpdi
 #   Pandasの読み込み
 import pandas as pd
 #   MatplotlibのPyplotモジュールの読み込み
@@ -23,31 +23,6 @@ else:
     sys.exit()
 jpfont = FontProperties(fname=FontPath)
 #%% ベルヌーイ分布の成功確率に関するベイズ推論
-#   ベータ分布のHPD区間の計算
-def beta_hpdi(ci0, alpha, beta, prob):
-    """
-        入力
-        ci0:    HPD区間の初期値
-        alpha:  ベータ分布のパラメータ1
-        beta:   ベータ分布のパラメータ2
-        prob:   HPD区間の確率 (0 < prob < 1)
-        出力
-        HPD区間
-    """
-    def hpdi_conditions(v, a, b, p):
-        """
-            入力
-            v:  HPD区間
-            a:  ベータ分布のパラメータ1
-            b:  ベータ分布のパラメータ2
-            p:  HPD区間の確率 (0 < p < 1)
-            出力
-            HPD区間の条件式の値
-        """
-        eq1 = st.beta.cdf(v[1], a, b) - st.beta.cdf(v[0], a, b) - p
-        eq2 = st.beta.pdf(v[1], a, b) - st.beta.pdf(v[0], a, b)
-        return np.hstack((eq1, eq2))
-    return opt.root(hpdi_conditions, ci0, args=(alpha, beta, prob)).x
 #   ベルヌーイ分布の成功確率の事後統計量の計算
 def bernoulli_stats(data, a0, b0, prob):
     """
@@ -70,7 +45,7 @@ def bernoulli_stats(data, a0, b0, prob):
     mode_pi = (a - 1.0) / (a + b - 2.0)
     sd_pi = st.beta.std(a, b)
     ci_pi = st.beta.interval(prob, a, b)
-    hpdi_pi = beta_hpdi(ci_pi, a, b, prob)
+    hpdi_pi = beta_hpdi(a, b, prob)
     stats = np.hstack((mean_pi, median_pi, mode_pi, sd_pi, ci_pi, hpdi_pi))
     stats = stats.reshape((1, 8))
     stats_string = ['平均', '中央値', '最頻値', '標準偏差', '信用区間（下限）',
@@ -3,8 +3,8 @@
 import numpy as np
 #   SciPyのstatsモジュールの読み込み
 import scipy.stats as st
-#   SciPyのoptimizeモジュールの読み込み
-import scipy.optimize as opt
+#   HPD区間の計算の関数の読み込み
+from pybayes_hpdi import invgamma_hpdi
 #   Pandasの読み込み
 import pandas as pd
 #   MatplotlibのPyplotモジュールの読み込み
@@ -23,33 +23,6 @@ else:
     sys.exit()
 jpfont = FontProperties(fname=FontPath)
 #%% 正規分布の平均と分散に関するベイズ推論
-#   逆ガンマ分布のHPD区間の計算
-def invgamma_hpdi(ci0, alpha, beta, prob):
-    """
-        入力
-        ci0:    HPD区間の初期値
-        alpha:  逆ガンマ分布の形状パラメータ
-        beta:   逆ガンマ分布の尺度パラメータ
-        prob:   HPD区間の確率 (0 < prob < 1)
-        出力
-        HPD区間
-    """
-    def hpdi_conditions(v, a, b, p):
-        """
-            入力
-            v:  HPD区間
-            a:  逆ガンマ分布の形状パラメータ
-            b:  逆ガンマ分布の尺度パラメータ
-            p:  HPD区間の確率 (0 < p < 1)
-            出力
-            HPD区間の条件式の値
-        """
-        eq1 = st.invgamma.cdf(v[1], a, scale=b) \
-              - st.invgamma.cdf(v[0], a, scale=b) - p
-        eq2 = st.invgamma.pdf(v[1], a, scale=b) \
-              - st.invgamma.pdf(v[0], a, scale=b)
-        return np.hstack((eq1, eq2))
-    return opt.root(hpdi_conditions, ci0, args=(alpha, beta, prob)).x
 #   正規分布の平均と分散の事後統計量の計算
 def gaussian_stats(data, mu0, n0, nu0, lam0, prob):
     """
@@ -82,7 +55,7 @@ def gaussian_stats(data, mu0, n0, nu0, lam0, prob):
     median_sigma2 = st.invgamma.median(0.5*nu_star, scale=0.5*lam_star)
     sd_sigma2 = st.invgamma.std(0.5*nu_star, scale=0.5*lam_star)
     ci_sigma2 = st.invgamma.interval(prob, 0.5*nu_star, scale=0.5*lam_star)
-    hpdi_sigma2 = invgamma_hpdi(ci_sigma2, 0.5*nu_star, 0.5*lam_star, prob)
+    hpdi_sigma2 = invgamma_hpdi(0.5*nu_star, 0.5*lam_star, prob)
     stats_mu = np.hstack((mu_star, mu_star, mu_star, sd_mu, ci_mu, ci_mu))
     stats_sigma2 = np.hstack((mean_sigma2, median_sigma2, mode_sigma2,
                               sd_sigma2, ci_sigma2, hpdi_sigma2))
@@ -3,8 +3,8 @@
 import numpy as np
 #   SciPyのstatsモジュールの読み込み
 import scipy.stats as st
-#   SciPyのoptimizeモジュールの読み込み
-import scipy.optimize as opt
+#   HPD区間の計算の関数の読み込み
+from pybayes_hpdi import gamma_hpdi
 #   Pandasの読み込み
 import pandas as pd
 #   MatplotlibのPyplotモジュールの読み込み
@@ -23,33 +23,6 @@ else:
     sys.exit()
 jpfont = FontProperties(fname=FontPath)
 #%% ポアソン分布に関するベイズ推論
-#   ガンマ分布のHPD区間の計算
-def gamma_hpdi(ci0, alpha, theta, prob):
-    """
-        入力
-        ci0:    HPD区間の初期値
-        alpha:  ガンマ分布の形状パラメータ
-        theta:  ガンマ分布の尺度パラメータ
-        prob:   HPD区間の確率 (0 < prob < 1)
-        出力
-        HPD区間
-    """
-    def hpdi_conditions(v, a, t, p):
-        """
-            入力
-            v:  HPD区間
-            a:  ガンマ分布の形状パラメータ
-            t:  ガンマ分布の尺度パラメータ
-            p:  HPD区間の確率 (0 < p < 1)
-            出力
-            HPD区間の条件式の値
-        """
-        eq1 = st.gamma.cdf(v[1], a, scale=t) \
-              - st.gamma.cdf(v[0], a, scale=t) - p
-        eq2 = st.gamma.pdf(v[1], a, scale=t) \
-              - st.gamma.pdf(v[0], a, scale=t)
-        return np.hstack((eq1, eq2))
-    return opt.root(hpdi_conditions, ci0, args=(alpha, theta, prob)).x
 #   ポアソン分布のパラメータの事後統計量の計算
 def poisson_stats(data, a0, b0, prob):
     """
@@ -72,7 +45,7 @@ def poisson_stats(data, a0, b0, prob):
     mode_lam = (a_star - 1.0) * theta_star
     sd_lam = st.gamma.std(a_star, scale=theta_star)
     ci_lam = st.gamma.interval(prob, a_star, scale=theta_star)
-    hpdi_lam = gamma_hpdi(ci_lam, a_star, theta_star, prob)
+    hpdi_lam = gamma_hpdi(a_star, theta_star, prob)
     stats = np.hstack((mean_lam, median_lam, mode_lam,
                        sd_lam, ci_lam, hpdi_lam)).reshape((1, 8))
     stats_string = ['平均', '中央値', '最頻値', '標準偏差', '信用区間（下限）',
@@ -3,12 +3,15 @@
 import numpy as np
 #   SciPyのstatsモジュールの読み込み
 import scipy.stats as st
-#   SciPyのoptimizeモジュールの読み込み
-import scipy.optimize as opt
+#   HPD区間の計算の関数の読み込み
+from pybayes_hpdi import invgamma_hpdi
 #   SciPyのLinalgモジュールの読み込み
 import scipy.linalg as la
 #   Pandasの読み込み
 import pandas as pd
+#   十分統計量の逐次計算の関数の読み込み
+from pybayes_conjugate import stream_suffstats, regression_posterior, \
+    grouped_suffstats, grouped_regression_stats
 #   MatplotlibのPyplotモジュールの読み込み
 import matplotlib.pyplot as plt
 #   日本語フォントの設定
@@ -25,33 +28,6 @@ else:
     sys.exit()
 jpfont = FontProperties(fname=FontPath)
 #%% 回帰モデルの係数と誤差項の分散に関するベイズ推論
-#   逆ガンマ分布のHPD区間の計算
-def invgamma_hpdi(hpdi0, alpha, beta, prob):
-    """
-        入力
-        hpdi0:  HPD区間の初期値
-        alpha:  逆ガンマ分布の形状パラメータ
-        beta:   逆ガンマ分布の尺度パラメータ
-        prob:   HPD区間の確率 (0 < prob < 1)
-        出力
-        HPD区間
-    """
-    def hpdi_conditions(v, a, b, p):
-        """
-            入力
-            v:  HPD区間
-            a:  逆ガンマ分布の形状パラメータ
-            b:  逆ガンマ分布の尺度パラメータ
-            p:  HPD区間の確率 (0 < p < 1)
-            出力
-            HPD区間の条件式の値
-        """
-        eq1 = st.invgamma.cdf(v[1], a, scale=b) \
-              - st.invgamma.cdf(v[0], a, scale=b) - p
-        eq2 = st.invgamma.pdf(v[1], a, scale=b) \
-              - st.invgamma.pdf(v[0], a, scale=b)
-        return np.hstack((eq1, eq2))
-    return opt.root(hpdi_conditions, hpdi0, args=(alpha, beta, prob)).x
 #   回帰モデルの係数と誤差項の分散の事後統計量の計算
 def regression_stats(y, X, b0, A0, nu0, lam0, prob):
     """
@@ -89,7 +65,7 @@ def regression_stats(y, X, b0, A0, nu0, lam0, prob):
     mode_sigma2 = lam_star / (nu_star + 2.0)
     sd_sigma2 = st.invgamma.std(0.5*nu_star, scale=0.5*lam_star)
     ci_sigma2 = st.invgamma.interval(prob, 0.5*nu_star, scale=0.5*lam_star)
-    hpdi_sigma2 = invgamma_hpdi(ci_sigma2, 0.5*nu_star, 0.5*lam_star, prob)
+    hpdi_sigma2 = invgamma_hpdi(0.5*nu_star, 0.5*lam_star, prob)
     stats_sigma2 = np.hstack((mean_sigma2, median_sigma2, mode_sigma2,
                               sd_sigma2, ci_sigma2, hpdi_sigma2))
     stats = np.vstack((stats_b, stats_sigma2))
@@ -127,6 +103,28 @@ prob = 0.95
 results, b_star, h, nu_star, lam_star = regression_stats(y, X, b0, A0, nu0,
                                                          lam0, prob)
 print(results.to_string(float_format='{:,.4f}'.format))
+#%% データを10行ずつの塊に分けて十分統計量を逐次計算
+chunks = (np.column_stack((y, X))[i:i+10] for i in range(0, n, 10))
+state = stream_suffstats('regression', chunks)
+b_chunk, A_chunk, nu_chunk, lam_chunk, rss_chunk \
+    = regression_posterior(state, b0, A0, nu0, lam0)
+print(np.allclose(b_chunk, b_star), np.isclose(lam_chunk, lam_star))
+#%% 多数のグループに対する事後統計量の一括計算
+G = 1000
+u_groups = st.norm.rvs(scale=0.7, size=(G, n))
+x_groups = st.uniform.rvs(loc=-np.sqrt(3.0), scale=2.0*np.sqrt(3.0),
+                          size=(G, n))
+y_groups = 1.0 + 2.0 * x_groups + u_groups
+X_groups = np.stack((np.ones((G, n)), x_groups), axis=-1)
+#   最初のグループを元のデータに置き換えて，1つずつの計算と比較する
+y_groups[0] = y
+X_groups[0] = X
+state_groups = grouped_suffstats(y_groups, X_groups)
+results_groups, b_groups, h_groups, nu_groups, lam_groups \
+    = grouped_regression_stats(state_groups, b0, A0, nu0, lam0, prob,
+                               param_names=results.index[:2])
+print(results_groups.loc[0].to_string(float_format='{:,.4f}'.format))
+print(np.allclose(results_groups.loc[0].values, results.values))
 #%% 事後分布のグラフの作成
 labels = ['切片 $\\alpha$', '傾き $\\beta$', '分散 $\\sigma^2$']
 fig2, ax2 = plt.subplots(1, 3, sharey='all', sharex='all',
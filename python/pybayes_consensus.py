@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+#%% NumPyの読み込み
+import numpy as np
+#   回帰モデルのギブズ・サンプラーの読み込み
+from pybayes_gibbs import gibbs_regression_chain
+#   ロジット・モデルとプロビット・モデルのギブズ・サンプラーの読み込み
+from pybayes_glm import logit_gibbs, probit_gibbs
+#   プロセスプールの読み込み
+from concurrent.futures import ProcessPoolExecutor
+#%% データの分割
+def write_shards(path, shards, prefix, chunksize=100000):
+    """
+        入力
+        path:       データのファイル（.npy，1列目が被説明変数，
+                    2列目以降が説明変数）
+        shards:     分割の数
+        prefix:     分割したファイルの名前の先頭（prefix_0.npyなどとなる）
+        chunksize:  一度に書き込む行数
+        出力
+        paths:      分割したファイルのリスト
+
+        行を前から順にほぼ同じ大きさに分ける．行の並びに規則性がある場合は，
+        あらかじめ並べ替えておく．
+    """
+    data = np.load(path, mmap_mode='r')
+    bounds = np.linspace(0, data.shape[0], shards + 1).astype(int).tolist()
+    paths = []
+    for s in range(shards):
+        shard_path = '{0:s}_{1:d}.npy'.format(prefix, s)
+        shard = np.lib.format.open_memmap(
+            shard_path, mode='w+', dtype=np.float64,
+            shape=(bounds[s+1] - bounds[s], data.shape[1]))
+        for start in range(bounds[s], bounds[s+1], chunksize):
+            stop = min(start + chunksize, bounds[s+1])
+            shard[start-bounds[s]:stop-bounds[s]] = data[start:stop]
+        shard.flush()
+        paths.append(shard_path)
+    return paths
+#%% 部分事後分布からのサンプリング
+#   1/S乗した逆ガンマ分布の事前分布の形状パラメータ
+def _shard_shape(nu0, shards):
+    nu0_shard = (nu0 + 2.0) / shards - 2.0
+    if nu0_shard <= 0.0:
+        raise ValueError('分割の数が多すぎて部分事前分布が正則でない'
+                         '（nu0 + 2 > 2 × 分割の数でなければならない）．')
+    return nu0_shard
+def shard_sample(model, path, shards, iterations, b0, A0, rng, nu0=None,
+                 lam0=None):
+    """
+        入力
+        model:      'regression', 'logit', 'probit'のいずれか
+        path:       分割したデータのファイル（.npy）
+        shards:     分割の数S
+        iterations: 反復回数
+        b0:         回帰係数の事前分布（多変量正規分布）の平均
+        A0:         回帰係数の事前分布（多変量正規分布）の精度行列
+        rng:        乱数生成器 (numpy.random.Generator)
+        nu0:        誤差項の分散の事前分布の形状パラメータ（'regression'のみ）
+        lam0:       誤差項の分散の事前分布の尺度パラメータ（'regression'のみ）
+        出力
+        runs:       モンテカルロ標本 (反復, パラメータ)
+
+        事前分布を1/S乗した部分事後分布から生成する．正規分布の精度行列は
+        A0/S，逆ガンマ分布 IG(nu0/2, lam0/2) は IG(nu0'/2, lam0/(2S)) で
+        nu0' = (nu0 + 2)/S - 2 となる．nu0' <= 0 では部分事前分布が正則で
+        なくなるので，nu0 + 2 <= 2S の場合はエラーとする．読み込むのは
+        この分割だけなので，別のマシンで実行して標本のファイルだけを
+        集めてもよい．
+    """
+    if model == 'regression':
+        nu0_shard = _shard_shape(nu0, shards)
+    data = np.load(path)
+    y, X = data[:, 0], data[:, 1:]
+    A0 = np.asarray(A0, dtype=float) / shards
+    if model == 'regression':
+        return gibbs_regression_chain(y, X, iterations, b0, A0, nu0_shard,
+                                      lam0 / shards, rng)
+    elif model == 'logit':
+        return logit_gibbs(y, X, iterations, b0, A0, 1, rng)[0]
+    elif model == 'probit':
+        return probit_gibbs(y, X, iterations, b0, A0, 1, rng)[0]
+    raise ValueError('対応していないモデルです: {0:s}'.format(model))
+#%% 部分事後分布の標本の統合
+def consensus_combine(subdraws, method='consensus', rng=None):
+    """
+        入力
+        subdraws:   部分事後分布の標本 (分割, 反復, パラメータ)
+        method:     'consensus'（加重平均）あるいは'gaussian'（正規分布の積）
+        rng:        乱数生成器（'gaussian'の場合のみ使う．Noneならば新しく
+                    作る）
+        出力
+        draws:      統合した標本 (反復, パラメータ)
+
+        W_sを分割sの標本の共分散行列の逆行列とすると，'consensus'は
+        反復ごとに (sum W_s)^{-1} sum W_s theta_s とする（Scott et al.の
+        コンセンサス・モンテカルロ法）．'gaussian'は部分事後分布を正規分布で
+        近似して，その積の正規分布から生成する．部分事後分布が正規分布ならば
+        どちらも事後分布に一致する．
+    """
+    subdraws = np.asarray(subdraws, dtype=float)
+    shards, iterations, k = subdraws.shape
+    W = np.stack([np.linalg.inv(np.atleast_2d(np.cov(d.T)))
+                  for d in subdraws])
+    cov = np.linalg.inv(W.sum(axis=0))
+    if method == 'consensus':
+        return np.einsum('ij,sjk,snk->ni', cov, W, subdraws)
+    elif method == 'gaussian':
+        if rng is None:
+            rng = np.random.default_rng()
+        mean = cov.dot(np.einsum('sjk,sk->j', W, subdraws.mean(axis=1)))
+        return rng.multivariate_normal(mean, cov, size=iterations)
+    raise ValueError("methodは'consensus'か'gaussian'でなければならない．")
+#   プロセスの中で1つの分割を処理する関数
+def _run_shard(model, path, shards, iterations, b0, A0, nu0, lam0, seed):
+    return shard_sample(model, path, shards, iterations, b0, A0,
+                        np.random.default_rng(seed), nu0, lam0)
+def consensus_sample(model, shard_paths, iterations, tune, b0, A0, nu0=None,
+                     lam0=None, method='consensus', seed=None,
+                     processes=None):
+    """
+        入力
+        model:          'regression', 'logit', 'probit'のいずれか
+        shard_paths:    分割したデータのファイルのリスト（write_shardsの出力）
+        iterations:     反復回数
+        tune:           バーンインの回数（統合の前に捨てる）
+        b0:             回帰係数の事前分布（多変量正規分布）の平均
+        A0:             回帰係数の事前分布（多変量正規分布）の精度行列
+        nu0:            誤差項の分散の事前分布の形状パラメータ
+                        （'regression'のみ）
+        lam0:           誤差項の分散の事前分布の尺度パラメータ
+                        （'regression'のみ）
+        method:         'consensus'あるいは'gaussian'（consensus_combineを参照）
+        seed:           乱数のシード
+        processes:      プロセスの数（Noneならば全てのCPUコアを使う）
+        出力
+        draws:          統合した標本 (反復, パラメータ)
+        subdraws:       部分事後分布の標本 (分割, 反復, パラメータ)
+
+        分割ごとの部分事後分布をプロセスプールで並列に生成して統合する．
+        各プロセスが読み込むのは自分の分割のファイルだけである．
+        gibbs_parallelと同じく，WindowsとmacOSでは
+        if __name__ == '__main__': の中で呼び出す．
+    """
+    shards = len(shard_paths)
+    if model == 'regression':
+        #   プロセスを起動する前に部分事前分布が正則かどうかを確かめる
+        _shard_shape(nu0, shards)
+    seeds = np.random.SeedSequence(seed).spawn(shards + 1)
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        futures = [executor.submit(_run_shard, model, path, shards,
+                                   iterations, b0, A0, nu0, lam0, s)
+                   for path, s in zip(shard_paths, seeds[:-1])]
+        subdraws = np.stack([future.result()[tune:] for future in futures])
+    draws = consensus_combine(subdraws, method,
+                              np.random.default_rng(seeds[-1]))
+    return draws, subdraws
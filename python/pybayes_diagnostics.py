@@ -0,0 +1,304 @@
+# -*- coding: utf-8 -*-
+#%% NumPyの読み込み
+import numpy as np
+#   SciPyのspecialモジュールの読み込み
+import scipy.special as sp
+#   SciPyのfftモジュールの読み込み
+import scipy.fft as fft
+#%% モンテカルロ標本の診断統計量（全パラメータの一括計算）
+#   乱数系列の前半と後半を別のチェーンとみなす分割
+def split_chains(traces):
+    """
+        入力
+        traces: モンテカルロ標本 (チェーン, 反復, パラメータ)
+        出力
+        分割されたモンテカルロ標本 (2 × チェーン, 反復 / 2, パラメータ)
+    """
+    half = traces.shape[1] // 2
+    return np.concatenate((traces[:, :half], traces[:, -half:]), axis=0)
+#   順位に基づく正規化
+def rank_normalize(traces):
+    """
+        入力
+        traces: モンテカルロ標本 (チェーン, 反復, パラメータ)
+        出力
+        順位を標準正規分布の分位点に変換した値
+    """
+    chains, draws, k = traces.shape
+    size = chains * draws
+    #   パラメータごとに連続したメモリ配置にしてから並べ替える
+    values = np.ascontiguousarray(traces.reshape((size, k)).T)
+    order = np.argsort(values, axis=1)
+    sorted_values = np.take_along_axis(values, order, axis=1)
+    #   同順位には平均順位を与える
+    position = np.broadcast_to(np.arange(size), (k, size))
+    is_start = np.ones((k, size), dtype=bool)
+    is_start[:, 1:] = sorted_values[:, 1:] != sorted_values[:, :-1]
+    is_end = np.ones((k, size), dtype=bool)
+    is_end[:, :-1] = is_start[:, 1:]
+    start = np.maximum.accumulate(np.where(is_start, position, 0), axis=1)
+    end = np.minimum.accumulate(np.where(is_end, position, size - 1)[:, ::-1],
+                                axis=1)[:, ::-1]
+    rank = np.empty((k, size))
+    np.put_along_axis(rank, order, 0.5 * (start + end) + 1.0, axis=1)
+    z = sp.ndtri((rank.T - 0.375) / (size + 0.25))
+    return z.reshape((chains, draws, k))
+#   自己共分散の計算（FFTによる）
+def autocovariance(traces):
+    """
+        入力
+        traces: モンテカルロ標本 (チェーン, 反復, パラメータ)
+        出力
+        各チェーンの自己共分散 (チェーン, ラグ, パラメータ)
+    """
+    draws = traces.shape[1]
+    m = fft.next_fast_len(2 * draws)
+    centered = traces - traces.mean(axis=1, keepdims=True)
+    f = fft.rfft(centered, n=m, axis=1)
+    return fft.irfft(f * np.conjugate(f), n=m, axis=1)[:, :draws] / draws
+#   Gelman-Rubinの収束判定統計量（分割なし）
+def _rhat(traces):
+    draws = traces.shape[1]
+    chain_mean = traces.mean(axis=1)
+    chain_var = traces.var(axis=1, ddof=1)
+    between_chain_variance = draws * chain_mean.var(axis=0, ddof=1)
+    within_chain_variance = chain_var.mean(axis=0)
+    return np.sqrt((between_chain_variance / within_chain_variance
+                    + draws - 1) / draws)
+#   順位正規化した分割R-hat
+def rhat(traces):
+    """
+        入力
+        traces: モンテカルロ標本 (チェーン, 反復, パラメータ)
+        出力
+        各パラメータのR-hat
+    """
+    split = split_chains(traces)
+    return _split_rhat(split, rank_normalize(split))
+#   分割したモンテカルロ標本とその順位正規化からのR-hat
+def _split_rhat(split, z):
+    rhat_bulk = _rhat(z)
+    folded = np.abs(split - np.median(split.reshape((-1, split.shape[2])),
+                                      axis=0))
+    rhat_tail = _rhat(rank_normalize(folded))
+    return np.maximum(rhat_bulk, rhat_tail)
+#   有効標本数（Geyerの初期単調系列推定量）
+def _ess(traces):
+    chains, draws, k = traces.shape
+    acov = autocovariance(traces)
+    mean_var = acov[:, 0].mean(axis=0) * draws / (draws - 1.0)
+    var_plus = mean_var * (draws - 1.0) / draws
+    if chains > 1:
+        var_plus = var_plus + traces.mean(axis=1).var(axis=0, ddof=1)
+    rho = 1.0 - (mean_var - acov.mean(axis=0)) / var_plus
+    rho[0] = 1.0
+    #   ラグ(2m, 2m+1)の自己相関の和が初めて正でなくなるmで打ち切る
+    n_pairs = (draws - 2) // 2
+    pairs = rho[:2*n_pairs:2] + rho[1:2*n_pairs:2]
+    nonpositive = pairs <= 0.0
+    nonpositive[0] = False
+    cutoff = np.where(nonpositive.any(axis=0),
+                      nonpositive.argmax(axis=0), n_pairs - 1)
+    #   自己相関の和が単調減少となるように修正する
+    pairs = np.minimum.accumulate(pairs, axis=0)
+    m = np.arange(n_pairs)[:, None]
+    rho_extra = rho[2*cutoff, np.arange(k)]
+    tau = -1.0 + 2.0 * np.where(m < cutoff, pairs, 0.0).sum(axis=0) \
+          + np.maximum(rho_extra, 0.0)
+    ess_total = chains * draws
+    tau = np.maximum(tau, 1.0 / np.log10(ess_total))
+    return ess_total / tau
+#   順位正規化した分割チェーンによる有効標本数（bulk ESS）
+def ess(traces):
+    """
+        入力
+        traces: モンテカルロ標本 (チェーン, 反復, パラメータ)
+        出力
+        各パラメータの有効標本数
+    """
+    return _ess(rank_normalize(split_chains(traces)))
+#   バッチ平均法によるモンテカルロ標準誤差
+def mcse_batch_means(traces, batch_size=None):
+    """
+        入力
+        traces:     モンテカルロ標本 (チェーン, 反復, パラメータ)
+        batch_size: バッチの大きさ（既定値は反復回数の平方根）
+        出力
+        各パラメータの平均のモンテカルロ標準誤差
+    """
+    chains, draws, k = traces.shape
+    if batch_size is None:
+        batch_size = int(np.sqrt(draws))
+    n_batches = draws // batch_size
+    batches = traces[:, :n_batches*batch_size] \
+              .reshape((chains * n_batches, batch_size, k)).mean(axis=1)
+    return np.sqrt(batch_size * batches.var(axis=0, ddof=1)
+                   / (chains * n_batches * batch_size))
+#   HPD区間（最短区間）
+def hdi(traces, prob):
+    """
+        入力
+        traces: モンテカルロ標本 (チェーン, 反復, パラメータ)
+        prob:   区間確率 (0 < prob < 1)
+        出力
+        各パラメータのHPD区間 (パラメータ, 2)
+    """
+    k = traces.shape[2]
+    sorted_traces = np.sort(traces.reshape((-1, k)), axis=0)
+    n = sorted_traces.shape[0]
+    interval_idx_inc = int(np.floor(prob * n))
+    n_intervals = n - interval_idx_inc
+    widths = sorted_traces[interval_idx_inc:] - sorted_traces[:n_intervals]
+    min_idx = widths.argmin(axis=0)
+    columns = np.arange(k)
+    return np.stack((sorted_traces[min_idx, columns],
+                     sorted_traces[min_idx + interval_idx_inc, columns]),
+                    axis=1)
+#   事後統計量の一括計算
+def mcmc_summary(traces, prob):
+    """
+        入力
+        traces: モンテカルロ標本 (チェーン, 反復, パラメータ)
+        prob:   区間確率 (0 < prob < 1)
+        出力
+        事後統計量 (パラメータ, 統計量)
+        統計量は平均，中央値，標準偏差，近似誤差，信用区間（下限），
+        信用区間（上限），HPDI（下限），HPDI（上限），R-hat，有効標本数の順
+    """
+    k = traces.shape[2]
+    pooled = traces.reshape((-1, k))
+    alpha = 100 * (1.0 - prob)
+    post_mean = pooled.mean(axis=0)
+    post_sd = pooled.std(axis=0)
+    post_median, ci_lower, ci_upper = np.percentile(
+        pooled, [50.0, 0.5 * alpha, 100 - 0.5 * alpha], axis=0)
+    #   順位正規化はR-hatと有効標本数で共通化する
+    split = split_chains(traces)
+    z = rank_normalize(split)
+    post_rhat = _split_rhat(split, z)
+    post_ess = _ess(z)
+    return np.vstack((post_mean, post_median, post_sd,
+                      mcse_batch_means(traces), ci_lower, ci_upper,
+                      hdi(traces, prob).T, post_rhat, post_ess)).T
+#%% モンテカルロ標本を保存しない逐次的な事後統計量の計算
+#   逐次計算の状態の初期化
+def summary_init(k, prob, burnin=0, batch_size=100):
+    """
+        入力
+        k:          パラメータの数
+        prob:       区間確率 (0 < prob < 1)
+        burnin:     バーンインの回数（最初のburnin個の標本は使わない）
+        batch_size: バッチ平均法のバッチの大きさ
+        出力
+        逐次計算の状態を保持する辞書
+    """
+    p = np.array([0.5 * (1.0 - prob), 0.5, 1.0 - 0.5 * (1.0 - prob)])
+    #   分位点はP2アルゴリズムで推定する（分位点 × パラメータ × 5個の標識）
+    return {'k': k, 'burnin': burnin, 'skipped': 0, 'count': 0,
+            'mean': np.zeros(k), 'm2': np.zeros(k),
+            'batch_size': batch_size, 'batch_sum': np.zeros(k),
+            'batch_fill': 0, 'batch_count': 0,
+            'batch_mean': np.zeros(k), 'batch_m2': np.zeros(k),
+            'p2_first': [],
+            'p2_height': np.empty((3, k, 5)),
+            'p2_position': np.tile(np.arange(5.0), (3, k, 1)),
+            'p2_desired': np.tile(np.column_stack(
+                (np.zeros(3), 2.0*p, 4.0*p, 2.0 + 2.0*p, np.full(3, 4.0))
+                )[:, None, :], (1, k, 1)),
+            'p2_increment': np.tile(np.column_stack(
+                (np.zeros(3), 0.5*p, p, 0.5*(1.0 + p), np.ones(3))
+                )[:, None, :], (1, k, 1))}
+#   P2アルゴリズムによる分位点の標識の更新
+def _p2_update(state, x):
+    q = state['p2_height']
+    n = state['p2_position']
+    x = np.broadcast_to(x, q.shape[:2])
+    #   新しい標本が入る区間を探して，両端の標識を更新する
+    q[:, :, 0] = np.minimum(q[:, :, 0], x)
+    q[:, :, 4] = np.maximum(q[:, :, 4], x)
+    cell = (x[:, :, None] >= q[:, :, 1:4]).sum(axis=2)
+    n += np.arange(5) > cell[:, :, None]
+    state['p2_desired'] += state['p2_increment']
+    for i in range(1, 4):
+        d = state['p2_desired'][:, :, i] - n[:, :, i]
+        move = ((d >= 1.0) & (n[:, :, i+1] - n[:, :, i] > 1.0)) \
+               | ((d <= -1.0) & (n[:, :, i-1] - n[:, :, i] < -1.0))
+        if not move.any():
+            continue
+        d = np.sign(d)
+        n_lower = n[:, :, i] - n[:, :, i-1]
+        n_upper = n[:, :, i+1] - n[:, :, i]
+        #   放物線による補間
+        parabolic = q[:, :, i] + d / (n[:, :, i+1] - n[:, :, i-1]) \
+            * ((n_lower + d) * (q[:, :, i+1] - q[:, :, i]) / n_upper
+               + (n_upper - d) * (q[:, :, i] - q[:, :, i-1]) / n_lower)
+        #   放物線が隣の標識を越える場合は線形補間
+        neighbor = np.where(d > 0, i + 1, i - 1)[:, :, None]
+        q_neighbor = np.take_along_axis(q, neighbor, axis=2)[:, :, 0]
+        n_neighbor = np.take_along_axis(n, neighbor, axis=2)[:, :, 0]
+        linear = q[:, :, i] + d * (q_neighbor - q[:, :, i]) \
+                 / (n_neighbor - n[:, :, i])
+        inside = (q[:, :, i-1] < parabolic) & (parabolic < q[:, :, i+1])
+        q[:, :, i] = np.where(move, np.where(inside, parabolic, linear),
+                              q[:, :, i])
+        n[:, :, i] += np.where(move, d, 0.0)
+#   逐次計算の状態の更新
+def summary_update(state, draw):
+    """
+        入力
+        state:  逐次計算の状態を保持する辞書
+        draw:   1回分のモンテカルロ標本 (パラメータ)
+        出力
+        なし（stateを更新する）
+    """
+    if state['skipped'] < state['burnin']:
+        state['skipped'] += 1
+        return
+    draw = np.asarray(draw, dtype=float)
+    #   Welfordの方法による平均と偏差平方和
+    state['count'] += 1
+    delta = draw - state['mean']
+    state['mean'] += delta / state['count']
+    state['m2'] += delta * (draw - state['mean'])
+    #   バッチ平均の平均と偏差平方和
+    state['batch_sum'] += draw
+    state['batch_fill'] += 1
+    if state['batch_fill'] == state['batch_size']:
+        batch_mean = state['batch_sum'] / state['batch_size']
+        state['batch_count'] += 1
+        delta = batch_mean - state['batch_mean']
+        state['batch_mean'] += delta / state['batch_count']
+        state['batch_m2'] += delta * (batch_mean - state['batch_mean'])
+        state['batch_sum'][:] = 0.0
+        state['batch_fill'] = 0
+    #   分位点の標識（最初の5個は並べ替えて初期値とする）
+    if state['count'] <= 5:
+        state['p2_first'].append(draw)
+        if state['count'] == 5:
+            state['p2_height'][:] = np.sort(np.array(state['p2_first']),
+                                            axis=0).T[None, :, :]
+    else:
+        _p2_update(state, draw)
+#   逐次計算の状態からの事後統計量の計算
+def summary_result(state):
+    """
+        入力
+        state:  逐次計算の状態を保持する辞書
+        出力
+        事後統計量 (パラメータ, 統計量)
+        統計量は平均，中央値，標準偏差，近似誤差，信用区間（下限），
+        信用区間（上限）の順
+    """
+    count = state['count']
+    if count < 5:
+        raise ValueError('標本の数が少なすぎます．')
+    post_sd = np.sqrt(state['m2'] / count)
+    if state['batch_count'] > 1:
+        mc_err = np.sqrt(state['batch_size'] * state['batch_m2']
+                         / (state['batch_count'] - 1)
+                         / (state['batch_count'] * state['batch_size']))
+    else:
+        mc_err = np.full(state['k'], np.nan)
+    quantiles = state['p2_height'][:, :, 2]
+    return np.vstack((state['mean'], quantiles[1], post_sd, mc_err,
+                      quantiles[0], quantiles[2])).T
@@ -0,0 +1,370 @@
+# -*- coding: utf-8 -*-
+#%% NumPyの読み込み
+import numpy as np
+#   SciPyのlinalgモジュールの読み込み
+import scipy.linalg as la
+#   SciPyのsparseモジュールの読み込み
+import scipy.sparse as sparse
+#   tqdmからプログレスバーの関数を読み込む
+from tqdm import trange
+#   ディスク上に標本を保存する関数の読み込み
+from pybayes_trace import trace_create, trace_load
+#   反復計算の核となる関数（NumPy版とNumba版）の読み込み
+from pybayes_kernels import get_backend, get_kernel
+#   疎な精度行列による多変量正規乱数の関数の読み込み
+from pybayes_mvn import sparse_precision_ordering, \
+    sparse_precision_factor, sparse_precision_sample
+#   途中経過の保存に用いるモジュールの読み込み
+import os
+import pickle
+import hashlib
+#   プロセスプールの読み込み
+from concurrent.futures import ProcessPoolExecutor
+#%% 回帰モデルのギブズ・サンプラー（複数チェーンの同時実行）
+def gibbs_regression_chains(y, X, iterations, b0, A0, nu0, lam0, chains, rng,
+                            method='cholesky', trace_path=None,
+                            checkpoint_path=None, checkpoint_every=1000):
+    """
+        入力
+        y:          被説明変数
+        X:          説明変数（scipy.sparseの疎行列でもよい）
+        iterations: 反復回数
+        b0:         回帰係数の事前分布（多変量正規分布）の平均
+        A0:         回帰係数の事前分布（多変量正規分布）の精度行列
+                    （Xが疎行列ならば疎行列あるいはその対角要素のベクトル）
+        nu0:        誤差項の分散の事前分布（逆ガンマ分布）の形状パラメータ
+        lam0:       誤差項の分散の事前分布（逆ガンマ分布）の尺度パラメータ
+        chains:     チェーンの数
+        rng:        乱数生成器 (numpy.random.Generator)
+        method:     'cholesky'（反復ごとにコレスキー分解）または
+                    'eigh'（一般化固有値分解を最初に1回だけ計算）
+        trace_path: 標本を保存するファイル（.npy）（Noneならばメモリ上に保存）
+        checkpoint_path:    途中経過を保存するファイル（Noneならば保存しない）
+        checkpoint_every:   途中経過を保存する間隔（反復回数）
+        出力
+        runs:   モンテカルロ標本 (チェーン, 反復, パラメータ)
+
+        Xが疎行列の場合は精度行列を疎行列のまま分解するので，必要なメモリは
+        説明変数の非ゼロ要素の数に比例し，n×kの密行列は作らない．
+        ただし標本runsはtrace_pathを指定しなければメモリ上の密な配列で，
+        chains×iterations×(k+1)×8バイトが必要になる（例えばk = 10000，
+        反復回数22000，1チェーンで約1.7GB）．kが大きい場合はtrace_pathを
+        指定してディスク上のファイルに保存する．
+        残差平方和は |y - Xb|^2 = y'y - 2 b'X'y + b'X'X b で計算するので，
+        X'Xが正則でなくてもよい（methodは'cholesky'に限る）．
+    """
+    if method not in ('cholesky', 'eigh'):
+        raise ValueError("methodは'cholesky'か'eigh'でなければならない．")
+    if checkpoint_path is not None and trace_path is None:
+        raise ValueError('途中経過を保存するにはtrace_pathが必要です．')
+    n, k = X.shape
+    if sparse.issparse(X):
+        if method != 'cholesky':
+            raise ValueError("疎行列の説明変数ではmethodは'cholesky'で"
+                             "なければならない．")
+        sigma2 = np.square(y).mean()
+    else:
+        XX = X.T.dot(X)
+        b_ols = la.solve(XX, X.T.dot(y))
+        sigma2 = np.square(y - X.dot(b_ols)).sum() / (n - k)
+    if trace_path is not None:
+        runs = trace_create(trace_path, (chains, iterations, k + 1))
+    else:
+        runs = np.empty((chains, iterations, k + 1))
+    checkpoint = {'iterations': iterations, 'chains': chains,
+                  'method': method, 'trace_path': trace_path,
+                  'checkpoint_every': checkpoint_every,
+                  'next': 0, 'converted': 0,
+                  'sigma2': np.full(chains, sigma2),
+                  'fingerprint': _fingerprint(y, X, b0, A0, nu0, lam0,
+                                              method)}
+    return _gibbs_regression_run(y, X, b0, A0, nu0, lam0, rng, runs,
+                                 checkpoint, checkpoint_path)
+#   途中経過からの回帰モデルのギブズ・サンプラーの再開
+def gibbs_regression_resume(y, X, b0, A0, nu0, lam0, checkpoint_path):
+    """
+        入力
+        y:          被説明変数
+        X:          説明変数
+        b0:         回帰係数の事前分布（多変量正規分布）の平均
+        A0:         回帰係数の事前分布（多変量正規分布）の精度行列
+        nu0:        誤差項の分散の事前分布（逆ガンマ分布）の形状パラメータ
+        lam0:       誤差項の分散の事前分布（逆ガンマ分布）の尺度パラメータ
+        checkpoint_path:    途中経過を保存したファイル
+        出力
+        runs:   モンテカルロ標本 (チェーン, 反復, パラメータ)
+                （中断せずに実行した場合と同一の値となる）
+
+        データや事前分布が途中経過を保存したときと異なる場合はエラーとなる．
+        乱数生成器は保存したときと同じ種類（PCG64，Philox，SFC64，MT19937
+        など）で作り直す．
+    """
+    with open(checkpoint_path, 'rb') as f:
+        checkpoint = pickle.load(f)
+    if checkpoint['fingerprint'] != _fingerprint(y, X, b0, A0, nu0, lam0,
+                                                 checkpoint['method']):
+        raise ValueError('データあるいは事前分布が途中経過を保存したときと'
+                         '異なる．')
+    bit_generator = getattr(np.random, checkpoint.pop('bit_generator'))()
+    bit_generator.state = checkpoint.pop('rng_state')
+    rng = np.random.Generator(bit_generator)
+    runs = trace_load(checkpoint['trace_path'], mode='r+')
+    return _gibbs_regression_run(y, X, b0, A0, nu0, lam0, rng, runs,
+                                 checkpoint, checkpoint_path)
+#   データと事前分布の指紋（再開時に同じ設定かどうかを確かめる）
+def _fingerprint(y, X, b0, A0, nu0, lam0, method):
+    digest = hashlib.sha256()
+    for a in (y, X, b0, A0):
+        if sparse.issparse(a):
+            a = sparse.csr_matrix(a)
+            a.sum_duplicates()
+            a.sort_indices()
+            arrays = (np.array(a.shape), a.data, a.indices, a.indptr)
+        else:
+            a = np.asarray(a, dtype=np.float64)
+            arrays = (np.array(a.shape), a)
+        for array in arrays:
+            digest.update(np.ascontiguousarray(array).tobytes())
+    digest.update(repr((float(nu0), float(lam0), method)).encode())
+    return digest.hexdigest()
+#   途中経過の保存（書き込みの途中で中断しても壊れないように置き換える）
+def _save_checkpoint(checkpoint_path, checkpoint, rng, runs):
+    runs.flush()
+    state = dict(checkpoint, rng_state=rng.bit_generator.state,
+                 bit_generator=type(rng.bit_generator).__name__)
+    temporary_path = checkpoint_path + '.tmp'
+    with open(temporary_path, 'wb') as f:
+        pickle.dump(state, f)
+    os.replace(temporary_path, checkpoint_path)
+#   回帰モデルのギブズ・サンプラーの本体
+def _gibbs_regression_run(y, X, b0, A0, nu0, lam0, rng, runs, checkpoint,
+                          checkpoint_path):
+    if sparse.issparse(X):
+        return _gibbs_regression_sparse_run(y, X, b0, A0, nu0, lam0, rng,
+                                            runs, checkpoint,
+                                            checkpoint_path)
+    n, k = X.shape
+    XX = X.T.dot(X)
+    Xy = X.T.dot(y)
+    b_ols = la.solve(XX, Xy)
+    rss = np.square(y - X.dot(b_ols)).sum()
+    lam_hat = rss + lam0
+    nu_star = 0.5 * (n + nu0)
+    A0b0 = A0.dot(b0)
+    iterations = checkpoint['iterations']
+    chains = checkpoint['chains']
+    method = checkpoint['method']
+    every = checkpoint['checkpoint_every']
+    sigma2 = checkpoint['sigma2']
+    if method == 'eigh':
+        #   XX V = A0 V diag(lam), V' A0 V = I となるVを求めておくと
+        #   (XX / sigma2 + A0)^{-1} = V diag(1 / (lam / sigma2 + 1)) V'
+        #   となるので，反復ごとの計算はVの座標系でO(k)で済む
+        lam, V = la.eigh(XX, A0)
+        lam = np.maximum(lam, 0.0)
+        c_Xy = V.T.dot(Xy)
+        c_A0b0 = V.T.dot(A0b0)
+        eta_ols = V.T.dot(A0.dot(b_ols))
+    for idx in trange(checkpoint['next'], iterations):
+        if method == 'eigh':
+            d = 1.0 / (lam / sigma2[:, None] + 1.0)
+            z = rng.standard_normal((chains, k))
+            b = d * (c_Xy / sigma2[:, None] + c_A0b0) + np.sqrt(d) * z
+            lam_star = 0.5 * (np.square(b - eta_ols).dot(lam) + lam_hat)
+        else:
+            #   全チェーンの精度行列をまとめてコレスキー分解する
+            prec_b = XX / sigma2[:, None, None] + A0
+            L = np.linalg.cholesky(prec_b)
+            r = Xy / sigma2[:, None] + A0b0
+            z = rng.standard_normal((chains, k))
+            #   b = Q^{-1} r + L^{-T} z = L^{-T} (L^{-1} r + z)
+            w = np.linalg.solve(L, r[:, :, None])[:, :, 0] + z
+            b = np.linalg.solve(L.swapaxes(1, 2), w[:, :, None])[:, :, 0]
+            diff = b - b_ols
+            lam_star = 0.5 * (np.einsum('ci,ij,cj->c', diff, XX, diff)
+                              + lam_hat)
+        sigma2 = lam_star / rng.standard_gamma(nu_star, size=chains)
+        runs[:, idx, :-1] = b
+        runs[:, idx, -1] = sigma2
+        if checkpoint_path is not None and (idx + 1) % every == 0:
+            checkpoint.update(next=idx + 1, sigma2=sigma2)
+            _save_checkpoint(checkpoint_path, checkpoint, rng, runs)
+    checkpoint.update(next=iterations, sigma2=sigma2)
+    if method == 'eigh' and checkpoint_path is None:
+        #   回帰係数は最後にまとめて元の座標系に戻す
+        for start in range(0, iterations, 1000):
+            block = runs[:, start:start+1000, :-1]
+            runs[:, start:start+1000, :-1] = block.dot(V.T)
+    elif method == 'eigh':
+        #   中断したブロックを再開時に二重に変換しないように，変換した標本は
+        #   別のファイルに書き込み，全て変換してから元のファイルと置き換える
+        trace_path = checkpoint['trace_path']
+        converted_path = trace_path[:-4] + '_converted.npy'
+        if checkpoint['converted'] < iterations:
+            if checkpoint['converted'] == 0:
+                converted = trace_create(converted_path, runs.shape)
+            else:
+                converted = trace_load(converted_path, mode='r+')
+            for start in range(checkpoint['converted'], iterations, 1000):
+                block = runs[:, start:start+1000]
+                converted[:, start:start+1000, :-1] = block[:, :, :-1].dot(V.T)
+                converted[:, start:start+1000, -1] = block[:, :, -1]
+                checkpoint.update(converted=min(start + 1000, iterations))
+                _save_checkpoint(checkpoint_path, checkpoint, rng, converted)
+            del converted
+        #   置き換えの後に中断した場合は変換済みのファイルはもう存在しない
+        if os.path.exists(converted_path):
+            del runs
+            os.replace(converted_path, trace_path)
+        runs = trace_load(trace_path, mode='r+')
+    if checkpoint_path is not None:
+        _save_checkpoint(checkpoint_path, checkpoint, rng, runs)
+    elif isinstance(runs, np.memmap):
+        runs.flush()
+    return runs
+#   疎な説明変数（例えばダミー変数）の回帰モデルのギブズ・サンプラーの本体
+def _gibbs_regression_sparse_run(y, X, b0, A0, nu0, lam0, rng, runs,
+                                 checkpoint, checkpoint_path):
+    X = sparse.csr_matrix(X)
+    n, k = X.shape
+    XX = (X.T @ X).tocsc()
+    Xy = X.T @ y
+    yy = y.dot(y)
+    if np.ndim(A0) == 1:
+        A0 = sparse.diags(A0)
+    A0 = sparse.csc_matrix(A0)
+    A0b0 = A0 @ b0
+    nu_star = 0.5 * (n + nu0)
+    iterations = checkpoint['iterations']
+    chains = checkpoint['chains']
+    every = checkpoint['checkpoint_every']
+    sigma2 = checkpoint['sigma2']
+    #   精度行列の非ゼロ要素の位置は変わらないので，分解の並べ替えは
+    #   最初に1回だけ求めて全ての反復で使い回す
+    perm = sparse_precision_ordering(XX + A0)
+    lam_star = np.empty(chains)
+    for idx in trange(checkpoint['next'], iterations):
+        for c in range(chains):
+            factor = sparse_precision_factor(XX / sigma2[c] + A0, perm)
+            b = sparse_precision_sample(factor, Xy / sigma2[c] + A0b0, rng)
+            ssr = max(yy - 2.0 * b.dot(Xy) + b.dot(XX @ b), 0.0)
+            lam_star[c] = 0.5 * (ssr + lam0)
+            runs[c, idx, :-1] = b
+        sigma2 = lam_star / rng.standard_gamma(nu_star, size=chains)
+        runs[:, idx, -1] = sigma2
+        if checkpoint_path is not None and (idx + 1) % every == 0:
+            checkpoint.update(next=idx + 1, sigma2=sigma2)
+            _save_checkpoint(checkpoint_path, checkpoint, rng, runs)
+    checkpoint.update(next=iterations, sigma2=sigma2)
+    if checkpoint_path is not None:
+        _save_checkpoint(checkpoint_path, checkpoint, rng, runs)
+    elif isinstance(runs, np.memmap):
+        runs.flush()
+    return runs
+#%% 独立な複数チェーンの並列実行
+#   正規分布の平均と分散のギブズ・サンプラー（1本のチェーン）
+def gibbs_gaussian_chain(data, iterations, mu0, tau0, nu0, lam0, rng,
+                         block=1000, backend='numpy'):
+    """
+        入力
+        data:       データ
+        iterations: 反復回数
+        mu0:        平均の事前分布（正規分布）の平均
+        tau0:       平均の事前分布（正規分布）の標準偏差
+        nu0:        分散の事前分布（逆ガンマ分布）の形状パラメータ
+        lam0:       分散の事前分布（逆ガンマ分布）の尺度パラメータ
+        rng:        乱数生成器 (numpy.random.Generator)
+        block:      まとめて生成する乱数の個数
+        backend:    'numpy'あるいは'numba'（Numbaによる反復のJITコンパイル）
+        出力
+        runs:       モンテカルロ標本 (反復, パラメータ)
+
+        標準正規乱数とガンマ乱数（形状パラメータは反復によらず一定）を
+        block個ずつまとめて生成しておき，反復の中では
+        mu = 平均 + 標準偏差 * z，sigma2 = b / g の四則演算だけで済ませる．
+    """
+    n = data.size
+    sum_data = float(data.sum())
+    mean_data = sum_data / n
+    variance_data = float(data.var())
+    inv_tau02 = 1.0 / tau0**2
+    mu0_tau02 = mu0 * inv_tau02
+    a = 0.5 * (n + nu0)
+    c = n * variance_data + lam0
+    sigma2 = variance_data
+    backend = get_backend(backend)
+    kernel = get_kernel('gaussian', backend)
+    runs = np.empty((iterations, 2))
+    for start in trange(0, iterations, block):
+        size = min(block, iterations - start)
+        z = rng.standard_normal(size)
+        g = rng.standard_gamma(a, size=size)
+        if backend == 'numpy':
+            #   Pythonの反復ではNumPyの配列よりリストの方が速い
+            z, g = z.tolist(), g.tolist()
+        sigma2 = kernel(z, g, n, sum_data, mean_data, inv_tau02, mu0_tau02,
+                        c, sigma2, runs[start:start+size])
+    return runs
+#   回帰モデルのギブズ・サンプラー（1本のチェーン）
+def gibbs_regression_chain(y, X, iterations, b0, A0, nu0, lam0, rng,
+                           backend='numpy'):
+    """
+        入力
+        y:          被説明変数
+        X:          説明変数（疎行列ならばbackendによらずNumPy版を使う）
+        iterations: 反復回数
+        b0:         回帰係数の事前分布（多変量正規分布）の平均
+        A0:         回帰係数の事前分布（多変量正規分布）の精度行列
+        nu0:        誤差項の分散の事前分布（逆ガンマ分布）の形状パラメータ
+        lam0:       誤差項の分散の事前分布（逆ガンマ分布）の尺度パラメータ
+        rng:        乱数生成器 (numpy.random.Generator)
+        backend:    'numpy'あるいは'numba'（Numbaによる反復のJITコンパイル）
+        出力
+        runs:       モンテカルロ標本 (反復, パラメータ)
+    """
+    if get_backend(backend) == 'numpy' or sparse.issparse(X):
+        return gibbs_regression_chains(y, X, iterations, b0, A0, nu0, lam0,
+                                       1, rng)[0]
+    n, k = X.shape
+    XX = X.T.dot(X)
+    Xy = X.T.dot(y)
+    b_ols = la.solve(XX, Xy)
+    rss = np.square(y - X.dot(b_ols)).sum()
+    A0 = np.asarray(A0, dtype=np.float64)
+    A0b0 = A0.dot(b0)
+    nu_star = 0.5 * (n + nu0)
+    kernel = get_kernel('regression', backend)
+    runs = np.empty((iterations, k + 1))
+    sigma2 = rss / (n - k)
+    for start in trange(0, iterations, 1000):
+        size = min(1000, iterations - start)
+        z = rng.standard_normal((size, k))
+        g = rng.standard_gamma(nu_star, size=size)
+        sigma2 = kernel(XX, Xy, b_ols, A0, A0b0, rss + lam0, z, g, sigma2,
+                        runs[start:start+size])
+    return runs
+#   プロセスの中で1本のチェーンを実行する関数
+def _run_chain(sampler, args, seed):
+    return sampler(*args, rng=np.random.default_rng(seed))
+#   独立な複数チェーンの並列実行
+def gibbs_parallel(sampler, args, chains, seed=None, processes=None):
+    """
+        入力
+        sampler:    1本のチェーンを実行する関数（引数rngで乱数生成器を受け取る）
+                    例えばgibbs_gaussian_chainやgibbs_regression_chain
+        args:       samplerに渡すrng以外の引数のタプル
+        chains:     チェーンの数
+        seed:       乱数のシード
+        processes:  プロセスの数（Noneならば全てのCPUコアを使う）
+        出力
+        runs:       モンテカルロ標本 (チェーン, 反復, パラメータ)
+
+        各チェーンの乱数はSeedSequence.spawnで作った互いに独立な系列を使う．
+        WindowsとmacOSでは子プロセスがスクリプトを読み込み直すので，
+        スクリプトから呼び出す場合は if __name__ == '__main__': の中に置く．
+    """
+    seeds = np.random.SeedSequence(seed).spawn(chains)
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        futures = [executor.submit(_run_chain, sampler, args, s)
+                   for s in seeds]
+        return np.stack([future.result() for future in futures])
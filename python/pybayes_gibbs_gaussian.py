@@ -5,12 +5,17 @@ import numpy as np
 import scipy.stats as st
 #   Pandasの読み込み
 import pandas as pd
-#   ArviZの読み込み
-import arviz as az
 #   MatplotlibのPyplotモジュールの読み込み
 import matplotlib.pyplot as plt
 #   tqdmからプログレスバーの関数を読み込む
 from tqdm import trange
+#   MCMCの診断統計量の関数の読み込み
+from pybayes_diagnostics import summary_init, summary_update, summary_result
+#   ディスク上に標本を保存する関数の読み込み
+from pybayes_trace import trace_create, trace_summary
+#   乱数をまとめて生成する高速版のギブズ・サンプラーの読み込み
+#   （複数チェーンの並列実行はpybayes_gibbs_gaussian_parallel.pyを参照）
+from pybayes_gibbs import gibbs_gaussian_chain
 #   日本語フォントの設定
 from matplotlib.font_manager import FontProperties
 import sys
@@ -26,7 +31,8 @@ else:
 jpfont = FontProperties(fname=FontPath)
 #%% ギブズ・サンプラーによる正規分布の平均と分散に関するベイズ推論
 #   正規分布の平均と分散のギブズ・サンプラー
-def gibbs_gaussian(data, iterations, mu0, tau0, nu0, lam0):
+def gibbs_gaussian(data, iterations, mu0, tau0, nu0, lam0, summary=None,
+                   trace_path=None):
     """
         入力
         data:       データ
@@ -35,8 +41,10 @@ def gibbs_gaussian(data, iterations, mu0, tau0, nu0, lam0):
         tau0:       平均の事前分布（正規分布）の標準偏差
         nu0:        分散の事前分布（逆ガンマ分布）の形状パラメータ
         lam0:       分散の事前分布（逆ガンマ分布）の尺度パラメータ
+        summary:    逐次的な事後統計量の計算の状態（Noneならば標本を保存）
+        trace_path: 標本を保存するファイル（.npy）（Noneならばメモリ上に保存）
         出力
-        runs:       モンテカルロ標本
+        runs:       モンテカルロ標本（summaryを与えた場合はsummary）
     """
     n = data.size
     sum_data = data.sum()
@@ -47,15 +55,27 @@ def gibbs_gaussian(data, iterations, mu0, tau0, nu0, lam0):
     a = 0.5 * (n + nu0)
     c = n * variance_data + lam0
     sigma2 = variance_data
-    runs = np.empty((iterations, 2))
+    if summary is not None:
+        runs = None
+    elif trace_path is not None:
+        runs = trace_create(trace_path, (iterations, 2))
+    else:
+        runs = np.empty((iterations, 2))
     for idx in trange(iterations):
         variance_mu = 1.0 / (n / sigma2 + inv_tau02)
         mean_mu = variance_mu * (sum_data / sigma2 + mu0_tau02)
         mu = st.norm.rvs(loc=mean_mu, scale=np.sqrt(variance_mu))
         b = 0.5 * (n * (mu - mean_data)**2 + c)
         sigma2 = st.invgamma.rvs(a, scale=b)
-        runs[idx, 0] = mu
-        runs[idx, 1] = sigma2
+        if summary is None:
+            runs[idx, 0] = mu
+            runs[idx, 1] = sigma2
+        else:
+            summary_update(summary, (mu, sigma2))
+    if summary is not None:
+        return summary
+    if trace_path is not None:
+        runs.flush()
     return runs
 #   モンテカルロ標本からの事後統計量の計算
 def mcmc_stats(runs, burnin, prob, batch):
@@ -71,22 +91,11 @@ def mcmc_stats(runs, burnin, prob, batch):
     traces = runs[burnin:, :]
     n = traces.shape[0] // batch
     k = traces.shape[1]
-    alpha = 100 * (1.0 - prob)
-    post_mean = np.mean(traces, axis=0)
-    post_median = np.median(traces, axis=0)
-    post_sd = np.std(traces, axis=0)
-    mc_err = [az.mcse(traces[:, i].reshape((n, batch), order='F')).item(0) \
-              for i in range(k)]
-    ci_lower = np.percentile(traces, 0.5 * alpha, axis=0)
-    ci_upper = np.percentile(traces, 100 - 0.5 * alpha, axis=0)
-    hpdi = az.hdi(traces, prob)
-    rhat = [az.rhat(traces[:, i].reshape((n, batch), order='F')).item(0) \
-            for i in range(k)]
-    stats = np.vstack((post_mean, post_median, post_sd, mc_err,
-                       ci_lower, ci_upper, hpdi.T, rhat)).T
+    #   乱数系列をbatch個に分割して，それぞれを別のチェーンとみなす
+    stats = trace_summary(traces[:n*batch].reshape((batch, n, k)), prob)
     stats_string = ['平均', '中央値', '標準偏差', '近似誤差',
                     '信用区間（下限）', '信用区間（上限）',
-                    'HPDI（下限）', 'HPDI（上限）', '$\\hat R$']
+                    'HPDI（下限）', 'HPDI（上限）', '$\\hat R$', '有効標本数']
     param_string = ['平均 $\\mu$', '分散 $\\sigma^2$']
     return pd.DataFrame(stats, index=param_string, columns=stats_string)
 #%% 正規分布からのデータ生成
@@ -110,6 +119,19 @@ runs = gibbs_gaussian(data, iterations, mu0, tau0, nu0, lam0)
 batch = 4
 results = mcmc_stats(runs, burnin, prob, batch)
 print(results.to_string(float_format='{:,.4f}'.format))
+#%% 標本を保存せずに事後統計量を逐次計算
+np.random.seed(123)
+summary = summary_init(2, prob, burnin, int(np.sqrt(samplesize)))
+summary = gibbs_gaussian(data, iterations, mu0, tau0, nu0, lam0,
+                         summary)
+results_online = pd.DataFrame(summary_result(summary), index=results.index,
+                              columns=results.columns[:6])
+print(results_online.to_string(float_format='{:,.4f}'.format))
+#%% 乱数をまとめて生成する高速版のギブズ・サンプラー
+rng = np.random.default_rng(123)
+runs_fast = gibbs_gaussian_chain(data, iterations, mu0, tau0, nu0, lam0, rng)
+results_fast = mcmc_stats(runs_fast, burnin, prob, batch)
+print(results_fast.to_string(float_format='{:,.4f}'.format))
 #%% 事後分布のグラフの作成
 fig, ax = plt.subplots(2, 2, num=1, figsize=(8, 3), facecolor='w')
 labels = ['$\\mu$', '$\\sigma^2$']
@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+#%% NumPyの読み込み
+import numpy as np
+#   SciPyのstatsモジュールの読み込み
+import scipy.stats as st
+#   Pandasの読み込み
+import pandas as pd
+#   ディスク上の標本の事後統計量の関数の読み込み
+from pybayes_trace import trace_summary
+#   複数チェーンを並列に実行する関数の読み込み
+from pybayes_gibbs import gibbs_gaussian_chain, gibbs_parallel
+#%% 独立な4本のチェーンを並列に実行して事後統計量を計算
+#   （WindowsやmacOSなどでは子プロセスがこのファイルを読み込み直すので，
+#     関数の読み込み以外は全て if __name__ == '__main__': の中で実行する）
+if __name__ == '__main__':
+    #   pybayes_gibbs_gaussian.pyと同じデータと事前分布
+    mu = 1.0
+    sigma = 2.0
+    n = 50
+    np.random.seed(99)
+    data = st.norm.rvs(loc=mu, scale=sigma, size=n)
+    mu0 = 0.0
+    tau0 = 1.0
+    nu0 = 5.0
+    lam0 = 7.0
+    prob = 0.95
+    burnin = 2000
+    samplesize = 20000
+    iterations = burnin + samplesize
+    runs_parallel = gibbs_parallel(gibbs_gaussian_chain,
+                                   (data, iterations, mu0, tau0, nu0, lam0),
+                                   4, seed=123)
+    stats_parallel = trace_summary(runs_parallel[:, burnin:, :], prob)
+    stats_string = ['平均', '中央値', '標準偏差', '近似誤差',
+                    '信用区間（下限）', '信用区間（上限）',
+                    'HPDI（下限）', 'HPDI（上限）', '$\\hat R$', '有効標本数']
+    param_string = ['平均 $\\mu$', '分散 $\\sigma^2$']
+    results_parallel = pd.DataFrame(stats_parallel, index=param_string,
+                                    columns=stats_string)
+    print(results_parallel.to_string(float_format='{:,.4f}'.format))
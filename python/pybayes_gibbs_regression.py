@@ -7,10 +7,22 @@ import scipy.linalg as la
 import scipy.stats as st
 #   Pandasの読み込み
 import pandas as pd
-#   ArviZの読み込み
-import arviz as az
 #   tqdmからプログレスバーの関数を読み込む
 from tqdm import trange
+#   MCMCの診断統計量の関数の読み込み
+from pybayes_diagnostics import rhat, summary_init, summary_update, \
+    summary_result
+#   ディスク上に標本を保存する関数の読み込み
+from pybayes_trace import trace_create, trace_load, trace_summary
+#   複数チェーンのギブズ・サンプラーの読み込み
+from pybayes_gibbs import gibbs_regression_chains
+#   SciPyのsparseモジュールの読み込み
+import scipy.sparse as sparse
+#   精度行列による多変量正規乱数の関数の読み込み
+from pybayes_mvn import precision_factor, precision_sample
+#   一時フォルダーの作成に用いるモジュールの読み込み
+import os
+import tempfile
 #   MatplotlibのPyplotモジュールの読み込み
 import matplotlib.pyplot as plt
 #   日本語フォントの設定
@@ -28,7 +40,8 @@ else:
 jpfont = FontProperties(fname=FontPath)
 #%% ギブズ・サンプラーによる回帰モデルのパラメータに関するベイズ推論
 #   回帰モデルの回帰係数と誤差項の分散のギブズ・サンプラー
-def gibbs_regression(y, X, iterations, b0, A0, nu0, lam0):
+def gibbs_regression(y, X, iterations, b0, A0, nu0, lam0, summary=None,
+                     trace_path=None):
     """
         入力
         y:          被説明変数
@@ -38,8 +51,10 @@ def gibbs_regression(y, X, iterations, b0, A0, nu0, lam0):
         A0:         回帰係数の事前分布（多変量正規分布）の精度行列
         nu0:        誤差項の分散の事前分布（逆ガンマ分布）の形状パラメータ
         lam0:       誤差項の分散の事前分布（逆ガンマ分布）の尺度パラメータ
+        summary:    逐次的な事後統計量の計算の状態（Noneならば標本を保存）
+        trace_path: 標本を保存するファイル（.npy）（Noneならばメモリ上に保存）
         出力
-        runs:   モンテカルロ標本
+        runs:   モンテカルロ標本（summaryを与えた場合はsummary）
     """
     n, k = X.shape
     XX = X.T.dot(X)
@@ -50,16 +65,27 @@ def gibbs_regression(y, X, iterations, b0, A0, nu0, lam0):
     nu_star = 0.5 * (n + nu0)
     A0b0 = A0.dot(b0)
     sigma2 = rss / (n - k)
-    runs = np.empty((iterations, k + 1))
+    if summary is not None:
+        runs = None
+    elif trace_path is not None:
+        runs = trace_create(trace_path, (iterations, k + 1))
+    else:
+        runs = np.empty((iterations, k + 1))
     for idx in trange(iterations):
-        cov_b = la.inv(XX / sigma2 + A0)
-        mean_b = cov_b.dot(Xy / sigma2 + A0b0)
-        b = st.multivariate_normal.rvs(mean=mean_b, cov=cov_b)
+        L = precision_factor(XX / sigma2 + A0)
+        b = precision_sample(L, Xy / sigma2 + A0b0, np.random)
         diff = b - b_ols
         lam_star = 0.5 * (diff.T.dot(XX).dot(diff) + lam_hat)
         sigma2 = st.invgamma.rvs(nu_star, scale=lam_star)
-        runs[idx, :-1] = b
-        runs[idx, -1] = sigma2
+        if summary is None:
+            runs[idx, :-1] = b
+            runs[idx, -1] = sigma2
+        else:
+            summary_update(summary, np.append(b, sigma2))
+    if summary is not None:
+        return summary
+    if trace_path is not None:
+        runs.flush()
     return runs
 #   モンテカルロ標本からの事後統計量の計算
 def mcmc_stats(runs, burnin, prob, batch):
@@ -75,22 +101,11 @@ def mcmc_stats(runs, burnin, prob, batch):
     traces = runs[burnin:, :]
     n = traces.shape[0] // batch
     k = traces.shape[1]
-    alpha = 100 * (1.0 - prob)
-    post_mean = np.mean(traces, axis=0)
-    post_median = np.median(traces, axis=0)
-    post_sd = np.std(traces, axis=0)
-    mc_err = [az.mcse(traces[:, i].reshape((n, batch), order='F')).item(0) \
-              for i in range(k)]
-    ci_lower = np.percentile(traces, 0.5 * alpha, axis=0)
-    ci_upper = np.percentile(traces, 100 - 0.5 * alpha, axis=0)
-    hpdi = az.hdi(traces, prob)
-    rhat = [az.rhat(traces[:, i].reshape((n, batch), order='F')).item(0) \
-            for i in range(k)]
-    stats = np.vstack((post_mean, post_median, post_sd, mc_err,
-                       ci_lower, ci_upper, hpdi.T, rhat)).T
+    #   乱数系列をbatch個に分割して，それぞれを別のチェーンとみなす
+    stats = trace_summary(traces[:n*batch].reshape((batch, n, k)), prob)
     stats_string = ['平均', '中央値', '標準偏差', '近似誤差',
                     '信用区間（下限）', '信用区間（上限）',
-                    'HPDI（下限）', 'HPDI（上限）', '$\\hat R$']
+                    'HPDI（下限）', 'HPDI（上限）', '$\\hat R$', '有効標本数']
     param_string = ['$\\beta_{0:<d}$'.format(i+1) for i in range(k-1)]
     param_string.append('$\\sigma^2$')
     return pd.DataFrame(stats, index=param_string, columns=stats_string)
@@ -119,6 +134,48 @@ runs = gibbs_regression(y, X, iterations, b0, A0, nu0, lam0)
 batch = 4
 results = mcmc_stats(runs, burnin, prob, batch)
 print(results.to_string(float_format='{:,.4f}'.format))
+#%% 標本を保存せずに事後統計量を逐次計算
+np.random.seed(123)
+summary = summary_init(k + 1, prob, burnin, int(np.sqrt(samplesize)))
+summary = gibbs_regression(y, X, iterations, b0, A0, nu0, lam0,
+                           summary)
+results_online = pd.DataFrame(summary_result(summary), index=results.index,
+                              columns=results.columns[:6])
+print(results_online.to_string(float_format='{:,.4f}'.format))
+#%% 標本をディスク上のファイルに保存して事後統計量を計算
+#   （ファイルは一時フォルダーに作り，計算が終われば削除する）
+np.random.seed(123)
+with tempfile.TemporaryDirectory() as directory:
+    trace_path = os.path.join(directory, 'pybayes_trace_gibbs_regression.npy')
+    gibbs_regression(y, X, iterations, b0, A0, nu0, lam0,
+                     trace_path=trace_path)
+    runs_disk = trace_load(trace_path)
+    results_disk = mcmc_stats(runs_disk, burnin, prob, batch)
+    del runs_disk
+print(results_disk.to_string(float_format='{:,.4f}'.format))
+#%% 複数チェーンによるギブズ・サンプラーの実行
+chains = 4
+rng = np.random.default_rng(123)
+runs_chains = gibbs_regression_chains(y, X, iterations, b0, A0, nu0, lam0,
+                                      chains, rng)
+rhat_chains = rhat(runs_chains[:, burnin:, :])
+print(pd.Series(rhat_chains, index=results.index, name='$\\hat R$')
+      .to_string(float_format='{:,.4f}'.format))
+#%% ダミー変数（疎行列）を説明変数とするギブズ・サンプラーの実行
+#   観測値ごとに500個のグループのどれか1つに1が立つダミー変数
+n_dummy = 20000
+groups = 500
+rng = np.random.default_rng(99)
+group = rng.integers(0, groups, size=n_dummy)
+X_dummy = sparse.csr_matrix((np.ones(n_dummy), (np.arange(n_dummy), group)),
+                            shape=(n_dummy, groups))
+effect = rng.normal(size=groups)
+y_dummy = X_dummy @ effect + rng.normal(scale=0.5, size=n_dummy)
+runs_dummy = gibbs_regression_chains(y_dummy, X_dummy, iterations,
+                                     np.zeros(groups), np.full(groups, 0.2),
+                                     nu0, lam0, 1, rng)[0]
+print(np.corrcoef(runs_dummy[burnin:, :-1].mean(axis=0), effect)[0, 1],
+      runs_dummy[burnin:, -1].mean())
 #%% 事後分布のグラフの作成
 fig, ax = plt.subplots(k+1, 2, num=1, figsize=(8, 1.5*(k+1)), facecolor='w')
 for index in range(k+1):
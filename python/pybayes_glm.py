@@ -0,0 +1,410 @@
+# -*- coding: utf-8 -*-
+#%% NumPyの読み込み
+import numpy as np
+#   SciPyのstatsモジュールの読み込み
+import scipy.stats as st
+#   SciPyのlinalgモジュールの読み込み
+import scipy.linalg as la
+#   SciPyのspecialモジュールの読み込み
+import scipy.special as sp
+#   ArviZの読み込み
+import arviz as az
+#   tqdmからプログレスバーの関数を読み込む
+from tqdm import trange
+#   精度行列による多変量正規乱数の生成の関数の読み込み
+from pybayes_mvn import precision_factor, precision_sample
+#   データの塊の読み込みの関数の読み込み
+from pybayes_conjugate import read_chunks
+#   ディスク上のモンテカルロ標本の関数の読み込み
+from pybayes_trace import trace_create
+#%% ポリア・ガンマ分布 PG(1, z) からの乱数の生成
+#   （Polson, Scott and Windleの棄却法．J*(1, z/2)を生成してPG = J*/4とする）
+_PG_T = 0.64
+#   交代級数の係数 a_n(x)
+def _pg_coef(n, x):
+    k = n + 0.5
+    with np.errstate(divide='ignore', over='ignore'):
+        small = np.pi * k * (2.0 / (np.pi * x))**1.5 * np.exp(-2.0 * k**2 / x)
+    large = np.pi * k * np.exp(-0.5 * (k * np.pi)**2 * x)
+    return np.where(x > _PG_T, large, small)
+#   区間(0, t)に切断した逆ガウス分布 IG(1/z, 1) からの乱数の生成
+def _truncated_inverse_gaussian(z, rng):
+    x = np.empty(z.size)
+    todo = np.arange(z.size)
+    while todo.size > 0:
+        zz = z[todo]
+        mu = 1.0 / np.maximum(zz, 1e-300)
+        proposal = np.empty(todo.size)
+        #   平均が切断点より大きい場合はレヴィ分布を提案分布とする
+        wide = mu > _PG_T
+        m = wide.sum()
+        e1 = rng.standard_exponential(m)
+        e2 = rng.standard_exponential(m)
+        redo = e1**2 > 2.0 * e2 / _PG_T
+        while redo.any():
+            e1[redo] = rng.standard_exponential(redo.sum())
+            e2[redo] = rng.standard_exponential(redo.sum())
+            redo = e1**2 > 2.0 * e2 / _PG_T
+        proposal[wide] = _PG_T / (1.0 + _PG_T * e1)**2
+        accept = np.ones(todo.size, dtype=bool)
+        accept[wide] = rng.uniform(size=m) \
+                       <= np.exp(-0.5 * zz[wide]**2 * proposal[wide])
+        #   それ以外は逆ガウス分布から生成して切断点以下のものを採択する
+        mu_n = mu[~wide]
+        y = mu_n * rng.standard_normal(mu_n.size)**2
+        w = mu_n + 0.5 * mu_n * y - 0.5 * mu_n * np.sqrt(4.0 * y + y**2)
+        flip = rng.uniform(size=mu_n.size) > mu_n / (mu_n + w)
+        w[flip] = mu_n[flip]**2 / w[flip]
+        proposal[~wide] = w
+        accept[~wide] = w < _PG_T
+        x[todo[accept]] = proposal[accept]
+        todo = todo[~accept]
+    return x
+def polya_gamma(z, rng):
+    """
+        入力
+        z:      ポリア・ガンマ分布 PG(1, z) のパラメータ（スカラーあるいは配列）
+        rng:    乱数生成器 (numpy.random.Generator)
+        出力
+        zと同じ形の乱数
+
+        すべての要素をまとめて提案し，交代級数による採否の判定も配列で行う．
+        採択率は0.99以上なので，棄却された要素だけを生成し直す反復はすぐに終わる．
+    """
+    z = np.asarray(z, dtype=float)
+    shape = z.shape
+    z = 0.5 * np.abs(z.ravel())
+    #   切断指数分布と切断逆ガウス分布の混合の重み
+    K = 0.125 * np.pi**2 + 0.5 * z**2
+    p = 0.5 * np.pi / K * np.exp(-K * _PG_T)
+    sqrt_t = np.sqrt(_PG_T)
+    q = 2.0 * np.exp(-z + st.norm.logcdf((_PG_T * z - 1.0) / sqrt_t)) \
+        + 2.0 * np.exp(z + st.norm.logcdf(-(_PG_T * z + 1.0) / sqrt_t))
+    prob_exponential = p / (p + q)
+    out = np.empty(z.size)
+    todo = np.arange(z.size)
+    while todo.size > 0:
+        m = todo.size
+        x = np.empty(m)
+        exponential = rng.uniform(size=m) < prob_exponential[todo]
+        x[exponential] = _PG_T + rng.standard_exponential(exponential.sum()) \
+                         / K[todo[exponential]]
+        x[~exponential] = _truncated_inverse_gaussian(z[todo[~exponential]],
+                                                      rng)
+        #   交代級数 S_0 - S_1 + S_2 - ... による採否の判定
+        s = _pg_coef(0, x)
+        u = rng.uniform(size=m) * s
+        accept = np.zeros(m, dtype=bool)
+        undecided = np.ones(m, dtype=bool)
+        n = 0
+        while undecided.any():
+            n += 1
+            idx = np.flatnonzero(undecided)
+            if n % 2 == 1:
+                s[idx] -= _pg_coef(n, x[idx])
+                decided = idx[u[idx] <= s[idx]]
+                accept[decided] = True
+            else:
+                s[idx] += _pg_coef(n, x[idx])
+                decided = idx[u[idx] > s[idx]]
+            undecided[decided] = False
+        out[todo[accept]] = 0.25 * x[accept]
+        todo = todo[~accept]
+    return out.reshape(shape)
+#%% ポリア・ガンマ分布によるデータ拡大を用いたロジット・モデルのギブズ・サンプラー
+def logit_gibbs(y, X, iterations, b0, A0, chains, rng):
+    """
+        入力
+        y:          被説明変数（0または1）
+        X:          説明変数
+        iterations: 反復回数
+        b0:         回帰係数の事前分布（多変量正規分布）の平均
+        A0:         回帰係数の事前分布（多変量正規分布）の精度行列
+        chains:     チェーンの数
+        rng:        乱数生成器 (numpy.random.Generator)
+        出力
+        runs:       モンテカルロ標本 (チェーン, 反復, パラメータ)
+
+        omega[i] ~ PG(1, x[i]'b) を与えると，bの条件付事後分布は精度行列
+        X' diag(omega) X + A0，平均が(精度行列)^{-1} (X'(y - 1/2) + A0 b0)の
+        多変量正規分布となるので，回帰モデルのギブズ・サンプラーと同じく
+        精度行列のコレスキー分解から生成する．
+    """
+    y = np.asarray(y, dtype=float)
+    X = np.asarray(X, dtype=float)
+    n, k = X.shape
+    if np.any((y != 0.0) & (y != 1.0)):
+        raise ValueError('yは0か1でなければならない．')
+    A0 = np.asarray(A0, dtype=float)
+    r = X.T.dot(y - 0.5) + A0.dot(b0)
+    runs = np.empty((chains, iterations, k))
+    for chain in range(chains):
+        b = np.zeros(k)
+        for idx in trange(iterations):
+            omega = polya_gamma(X.dot(b), rng)
+            L = precision_factor((X.T * omega).dot(X) + A0)
+            b = precision_sample(L, r, rng)
+            runs[chain, idx] = b
+    return runs
+#%% Albert and Chibのデータ拡大を用いたプロビット・モデルのギブズ・サンプラー
+#   潜在変数 z[i] ~ N(m[i], 1) を y[i] = 1ならば正，y[i] = 0ならば負に
+#   切断した切断正規分布からの乱数の生成（逆関数法）
+def truncated_normal_sign(m, y, rng):
+    """
+        入力
+        m:      切断前の正規分布の平均（分散は1）
+        y:      0または1（1ならば(0, inf)，0ならば(-inf, 0)に切断する）
+        rng:    乱数生成器 (numpy.random.Generator)
+        出力
+        mと同じ形の乱数
+
+        s = 2y - 1とするとs(z - m)は(-s m, inf)に切断した標準正規分布に
+        従うので，z = m - s Phi^{-1}(u Phi(s m))とする．裾の確率は対数で計算し，
+        |m|が大きくても切断点の外の値やinfは出ない．
+    """
+    m = np.asarray(m, dtype=float)
+    s = 2.0 * np.asarray(y, dtype=float) - 1.0
+    log_u = np.log(rng.uniform(size=m.shape))
+    return m - s * sp.ndtri_exp(log_u + sp.log_ndtr(s * m))
+def probit_gibbs(y, X, iterations, b0, A0, chains, rng):
+    """
+        入力
+        y:          被説明変数（0または1）
+        X:          説明変数
+        iterations: 反復回数
+        b0:         回帰係数の事前分布（多変量正規分布）の平均
+        A0:         回帰係数の事前分布（多変量正規分布）の精度行列
+        chains:     チェーンの数
+        rng:        乱数生成器 (numpy.random.Generator)
+        出力
+        runs:       モンテカルロ標本 (チェーン, 反復, パラメータ)
+
+        潜在変数zを与えるとbの条件付事後分布は誤差項の分散が1の回帰モデルと
+        同じで，精度行列X'X + A0は反復によらないので，コレスキー分解は
+        最初に1回だけ行う．1回の反復の計算量はデータの大きさに比例する．
+    """
+    y = np.asarray(y, dtype=float)
+    X = np.asarray(X, dtype=float)
+    n, k = X.shape
+    if np.any((y != 0.0) & (y != 1.0)):
+        raise ValueError('yは0か1でなければならない．')
+    A0 = np.asarray(A0, dtype=float)
+    A0b0 = A0.dot(b0)
+    L = precision_factor(X.T.dot(X) + A0)
+    runs = np.empty((chains, iterations, k))
+    for chain in range(chains):
+        b = np.zeros(k)
+        for idx in trange(iterations):
+            z = truncated_normal_sign(X.dot(b), y, rng)
+            b = precision_sample(L, X.T.dot(z) + A0b0, rng)
+            runs[chain, idx] = b
+    return runs
+#%% ラプラス近似と重点リサンプリングによる近似事後分布
+#   線形予測子etaに対する対数尤度とその1階・2階微分（2階微分は符号を反転）
+def _glm_terms(model, eta, y):
+    if model == 'logit':
+        prob = sp.expit(eta)
+        return y * eta - np.logaddexp(0.0, eta), y - prob, prob * (1.0 - prob)
+    elif model == 'probit':
+        s = 2.0 * y - 1.0
+        log_cdf = sp.log_ndtr(s * eta)
+        ratio = s * np.exp(-0.5 * eta**2 - 0.5 * np.log(2.0 * np.pi)
+                           - log_cdf)
+        return log_cdf, ratio, ratio * (ratio + eta)
+    elif model == 'poisson':
+        mu = np.exp(eta)
+        return y * eta - mu - sp.gammaln(y + 1.0), y - mu, mu
+    raise ValueError('対応していないモデルです: {0:s}'.format(model))
+#   対数事後密度（正規化定数を除く）
+def _glm_log_posterior(model, b, y, X, b0, A0):
+    diff = b - b0
+    return _glm_terms(model, X.dot(b), y)[0].sum() \
+           - 0.5 * diff.dot(A0.dot(diff))
+def glm_laplace(model, y, X, b0, A0, tol=1e-8, max_iter=100):
+    """
+        入力
+        model:      'logit', 'probit', 'poisson'のいずれか
+        y:          被説明変数
+        X:          説明変数
+        b0:         回帰係数の事前分布（多変量正規分布）の平均
+        A0:         回帰係数の事前分布（多変量正規分布）の精度行列
+        tol:        ニュートン法の収束判定の閾値（更新幅の最大値）
+        max_iter:   ニュートン法の最大反復回数
+        出力
+        b_mode:     事後分布の最頻値
+        L:          最頻値での対数事後密度のヘッセ行列（符号を反転）の
+                    コレスキー因子（precision_sampleにそのまま渡せる）
+
+        ニュートン法（IRLS）で最頻値を求め，事後分布を平均b_mode，精度行列
+        L L'の正規分布で近似する．対数事後密度が増えない場合は更新幅を半分にする．
+    """
+    y = np.asarray(y, dtype=float)
+    X = np.asarray(X, dtype=float)
+    A0 = np.asarray(A0, dtype=float)
+    b = np.asarray(b0, dtype=float).copy()
+    log_post = _glm_log_posterior(model, b, y, X, b0, A0)
+    for _ in range(max_iter):
+        _, grad, weight = _glm_terms(model, X.dot(b), y)
+        L = precision_factor((X.T * weight).dot(X) + A0)
+        step = la.cho_solve((L, True), X.T.dot(grad) - A0.dot(b - b0))
+        while True:
+            b_new = b + step
+            log_post_new = _glm_log_posterior(model, b_new, y, X, b0, A0)
+            if log_post_new >= log_post or np.abs(step).max() < tol:
+                break
+            step *= 0.5
+        b, log_post = b_new, log_post_new
+        if np.abs(step).max() < tol:
+            break
+    _, _, weight = _glm_terms(model, X.dot(b), y)
+    return b, precision_factor((X.T * weight).dot(X) + A0)
+def glm_laplace_sample(model, y, X, b0, A0, draws, rng, block=100):
+    """
+        入力
+        model:      'logit', 'probit', 'poisson'のいずれか
+        y:          被説明変数
+        X:          説明変数
+        b0:         回帰係数の事前分布（多変量正規分布）の平均
+        A0:         回帰係数の事前分布（多変量正規分布）の精度行列
+        draws:      標本の大きさ
+        rng:        乱数生成器 (numpy.random.Generator)
+        block:      重要度の重みを一度に計算する標本の数
+        出力
+        runs:       重点リサンプリングによる標本 (反復, パラメータ)
+        pareto_k:   重要度の重みの裾に当てはめた一般化パレート分布の形状
+                    パラメータk
+
+        ラプラス近似から生成した標本を，パレート平滑化した重要度の重みで
+        リサンプリングする．k < 0.5ならばラプラス近似で十分，0.7を超える
+        場合は重みが不安定なので，MCMCで事後分布を求めるべきである．
+    """
+    y = np.asarray(y, dtype=float)
+    X = np.asarray(X, dtype=float)
+    A0 = np.asarray(A0, dtype=float)
+    b_mode, L = glm_laplace(model, y, X, b0, A0)
+    proposal = precision_sample(L, L.dot(L.T.dot(b_mode)), rng, size=draws)
+    #   提案分布と事後分布の対数密度（正規化定数を除く）
+    log_q = -0.5 * np.square((proposal - b_mode).dot(L)).sum(axis=1)
+    log_p = np.empty(draws)
+    for start in range(0, draws, block):
+        b = proposal[start:start+block]
+        diff = b - b0
+        log_p[start:start+block] = \
+            _glm_terms(model, X.dot(b.T), y[:, None])[0].sum(axis=0) \
+            - 0.5 * np.einsum('ij,jk,ik->i', diff, A0, diff)
+    log_w, pareto_k = az.psislw(log_p - log_q)
+    w = np.exp(log_w - log_w.max())
+    index = rng.choice(draws, size=draws, p=w / w.sum())
+    return proposal[index], pareto_k
+#%% ミニバッチによる確率的勾配ランジュバン動学（SGLD）
+#   ディスク上のデータ全体に対する対数尤度，勾配，ヘッセ行列（符号を反転）
+def _stream_terms(model, path, b, chunksize):
+    k = b.size
+    loglik = 0.0
+    grad = np.zeros(k)
+    hess = np.zeros((k, k))
+    for chunk in read_chunks(path, chunksize):
+        y, X = chunk[:, 0], chunk[:, 1:]
+        terms = _glm_terms(model, X.dot(b), y)
+        loglik += terms[0].sum()
+        grad += X.T.dot(terms[1])
+        hess += (X.T * terms[2]).dot(X)
+    return loglik, grad, hess
+def glm_stream_laplace(model, path, b0, A0, chunksize=100000, tol=1e-8,
+                       max_iter=100):
+    """
+        入力
+        model:      'logit', 'probit', 'poisson'のいずれか
+        path:       データのファイル（.npy，1列目が被説明変数，
+                    2列目以降が説明変数）
+        b0:         回帰係数の事前分布（多変量正規分布）の平均
+        A0:         回帰係数の事前分布（多変量正規分布）の精度行列
+        chunksize:  1つの塊に含まれる行数
+        tol:        ニュートン法の収束判定の閾値（更新幅の最大値）
+        max_iter:   ニュートン法の最大反復回数
+        出力
+        b_mode:     事後分布の最頻値
+        L:          最頻値での対数事後密度のヘッセ行列（符号を反転）の
+                    コレスキー因子
+        grad:       最頻値での対数尤度の勾配（データ全体）
+
+        glm_laplaceと同じニュートン法だが，1回の反復ごとにデータを塊に分けて
+        1回読むので，メモリに載らない大きさのデータにも使える．
+    """
+    A0 = np.asarray(A0, dtype=float)
+    b = np.asarray(b0, dtype=float).copy()
+    loglik, grad, hess = _stream_terms(model, path, b, chunksize)
+    log_post = loglik
+    for _ in range(max_iter):
+        step = la.cho_solve((precision_factor(hess + A0), True),
+                            grad - A0.dot(b - b0))
+        while True:
+            b_new = b + step
+            diff = b_new - b0
+            terms = _stream_terms(model, path, b_new, chunksize)
+            log_post_new = terms[0] - 0.5 * diff.dot(A0.dot(diff))
+            if log_post_new >= log_post or np.abs(step).max() < tol:
+                break
+            step *= 0.5
+        b, log_post = b_new, log_post_new
+        loglik, grad, hess = terms
+        if np.abs(step).max() < tol:
+            break
+    return b, precision_factor(hess + A0), grad
+def glm_sgld(model, path, iterations, b0, A0, chains, rng, batch_size=1000,
+             step=0.1, chunksize=100000, trace_path=None):
+    """
+        入力
+        model:      'logit', 'probit', 'poisson'のいずれか
+        path:       データのファイル（.npy，1列目が被説明変数，
+                    2列目以降が説明変数）
+        iterations: 反復回数
+        b0:         回帰係数の事前分布（多変量正規分布）の平均
+        A0:         回帰係数の事前分布（多変量正規分布）の精度行列
+        chains:     チェーンの数
+        rng:        乱数生成器 (numpy.random.Generator)
+        batch_size: ミニバッチの大きさ
+        step:       ステップ幅（前処理行列に対する相対的な大きさ）
+        chunksize:  最頻値を求める際に1つの塊に含まれる行数
+        trace_path: 標本を保存するファイル（.npy）（Noneならばメモリ上に保存）
+        出力
+        runs:       モンテカルロ標本 (チェーン, 反復, パラメータ)
+
+        データ全体の勾配は最頻値b_modeで1回だけ計算し，各反復では
+        ミニバッチのN/batch_size倍の勾配の差 grad_i(b) - grad_i(b_mode)
+        を加える（制御変量）．ラプラス近似の共分散行列を前処理行列Mとして
+        b <- b + step/2 M grad + sqrt(step) M^{1/2} z で更新する．
+        ミニバッチはメモリマップから無作為に選んだ行だけを読むので，
+        必要なメモリはデータの大きさによらない．
+        ステップ幅が一定なので，標本の分布には step に比例する近似誤差がある．
+    """
+    A0 = np.asarray(A0, dtype=float)
+    b_mode, L, grad_mode = glm_stream_laplace(model, path, b0, A0,
+                                              chunksize)
+    data = np.load(path, mmap_mode='r')
+    N = data.shape[0]
+    k = b_mode.size
+    if trace_path is not None:
+        runs = trace_create(trace_path, (chains, iterations, k))
+    else:
+        runs = np.empty((chains, iterations, k))
+    scale = N / batch_size
+    for chain in range(chains):
+        #   初期値はラプラス近似から生成する
+        b = precision_sample(L, L.dot(L.T.dot(b_mode)), rng)
+        for idx in trange(iterations):
+            #   並べ替えた行番号でメモリマップを前から順に読む
+            rows = np.sort(rng.integers(N, size=batch_size))
+            batch = np.asarray(data[rows])
+            y, X = batch[:, 0], batch[:, 1:]
+            g = _glm_terms(model, X.dot(b), y)[1]
+            g_mode = _glm_terms(model, X.dot(b_mode), y)[1]
+            grad = grad_mode + scale * X.T.dot(g - g_mode) - A0.dot(b - b0)
+            drift = la.cho_solve((L, True), grad)
+            noise = la.solve_triangular(L, rng.standard_normal(k),
+                                        lower=True, trans='T')
+            b = b + 0.5 * step * drift + np.sqrt(step) * noise
+            runs[chain, idx] = b
+    if trace_path is not None:
+        runs.flush()
+    return runs
@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+#%% NumPyの読み込み
+import numpy as np
+#   SciPyのspecialモジュールの読み込み
+import scipy.special as sp
+#%% HPD区間の一括計算
+#   分布ごとの分位点関数，対数密度関数，対数密度関数の導関数
+_FUNCTIONS = {
+    'beta': (lambda q, a, b: sp.betaincinv(a, b, q),
+             lambda x, a, b: sp.xlogy(a - 1.0, x) + sp.xlog1py(b - 1.0, -x)
+                             - sp.betaln(a, b),
+             lambda x, a, b: (a - 1.0) / x - (b - 1.0) / (1.0 - x)),
+    'gamma': (lambda q, a, t: t * sp.gammaincinv(a, q),
+              lambda x, a, t: sp.xlogy(a - 1.0, x) - x / t
+                              - sp.gammaln(a) - a * np.log(t),
+              lambda x, a, t: (a - 1.0) / x - 1.0 / t),
+    'invgamma': (lambda q, a, b: b / sp.gammainccinv(a, q),
+                 lambda x, a, b: a * np.log(b) - sp.gammaln(a)
+                                 - (a + 1.0) * np.log(x) - b / x,
+                 lambda x, a, b: -(a + 1.0) / x + b / x**2)}
+#   HPD区間の計算（ニュートン法の一括計算）
+def hpdi(dist, alpha, beta, prob, tol=1e-10, maxiter=100):
+    """
+        入力
+        dist:   'beta', 'gamma', 'invgamma'のいずれか
+        alpha:  分布のパラメータ1（ベータ分布のα，(逆)ガンマ分布の形状）
+        beta:   分布のパラメータ2（ベータ分布のβ，(逆)ガンマ分布の尺度）
+        prob:   HPD区間の確率 (0 < prob < 1)
+        tol:    収束判定の許容誤差
+        maxiter:反復回数の上限
+        出力
+        HPD区間（最後の次元が下限と上限）
+
+        HPD区間の下限の左側の確率をqとすると，下限と上限は分位点
+        F^{-1}(q)とF^{-1}(q + prob)で与えられるので，確率の条件は
+        常に満たされる．残る密度の条件 log f(上限) - log f(下限) = 0 は
+        qの単調減少関数となるので，区間[0, 1 - prob]で二分法により
+        保護したニュートン法で全てのパラメータについて同時に解く．
+        密度が単調な場合（例えばα < 1のベータ分布）はq = 0あるいは
+        q = 1 - probとなる．
+    """
+    alpha, beta, prob = np.broadcast_arrays(np.asarray(alpha, dtype=float),
+                                            np.asarray(beta, dtype=float),
+                                            np.asarray(prob, dtype=float))
+    ppf, logpdf, dlogpdf = _FUNCTIONS[dist]
+    q_upper = 1.0 - prob
+    q = 0.5 * q_upper
+    #   密度が単調な場合の処理
+    fixed = np.zeros(q.shape, dtype=bool)
+    if dist == 'beta':
+        decreasing = (alpha <= 1.0) & (beta >= 1.0) & (alpha < beta)
+        increasing = (alpha >= 1.0) & (beta <= 1.0) & (alpha > beta)
+        #   U字型の密度や一様分布ではHPD区間の代わりに信用区間を返す
+        u_shaped = (alpha <= 1.0) & (beta <= 1.0) & ~decreasing & ~increasing
+        q = np.where(decreasing, 0.0, q)
+        q = np.where(increasing, q_upper, q)
+        fixed = decreasing | increasing | u_shaped
+    elif dist == 'gamma':
+        q = np.where(alpha <= 1.0, 0.0, q)
+        fixed = alpha <= 1.0
+    #   未収束の要素だけを更新する
+    active = np.flatnonzero(~fixed)
+    q, q_upper = q.ravel(), q_upper.ravel()
+    bracket_lower = np.zeros_like(q)
+    bracket_upper = q_upper.copy()
+    a_flat, b_flat, p_flat = (v.ravel() for v in (alpha, beta, prob))
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        for _ in range(maxiter):
+            a = a_flat[active]
+            b = b_flat[active]
+            qa = q[active]
+            qu = q_upper[active]
+            lower = ppf(qa, a, b)
+            upper = ppf(qa + p_flat[active], a, b)
+            log_f_lower = logpdf(lower, a, b)
+            log_f_upper = logpdf(upper, a, b)
+            g = log_f_upper - log_f_lower
+            dg = dlogpdf(upper, a, b) * np.exp(-log_f_upper) \
+                 - dlogpdf(lower, a, b) * np.exp(-log_f_lower)
+            bl = np.where(g > 0.0, qa, bracket_lower[active])
+            bu = np.where(g > 0.0, bracket_upper[active], qa)
+            #   qが0や1 - probに近い場合にも速く収束するように
+            #   u = log(q / (1 - prob - q))についてニュートン法で更新する
+            dq_du = qa * (qu - qa) / qu
+            u_new = np.log(qa / (qu - qa)) - g / (dg * dq_du)
+            q_new = qu * sp.expit(u_new)
+            outside = ~((q_new > bl) & (q_new < bu))
+            q_new = np.where(outside, 0.5 * (bl + bu), q_new)
+            converged = (np.abs(g) <= tol) | (bu - bl <= tol * qu)
+            q_new = np.where(converged, qa, q_new)
+            q[active] = q_new
+            bracket_lower[active] = bl
+            bracket_upper[active] = bu
+            active = active[~converged]
+            if active.size == 0:
+                break
+    q = q.reshape(alpha.shape)
+    return np.stack((ppf(q, alpha, beta), ppf(q + prob, alpha, beta)),
+                    axis=-1)
+#   ベータ分布のHPD区間の計算
+def beta_hpdi(alpha, beta, prob):
+    """
+        入力
+        alpha:  ベータ分布のパラメータ1
+        beta:   ベータ分布のパラメータ2
+        prob:   HPD区間の確率 (0 < prob < 1)
+        出力
+        HPD区間
+    """
+    return hpdi('beta', alpha, beta, prob)
+#   ガンマ分布のHPD区間の計算
+def gamma_hpdi(alpha, theta, prob):
+    """
+        入力
+        alpha:  ガンマ分布の形状パラメータ
+        theta:  ガンマ分布の尺度パラメータ
+        prob:   HPD区間の確率 (0 < prob < 1)
+        出力
+        HPD区間
+    """
+    return hpdi('gamma', alpha, theta, prob)
+#   逆ガンマ分布のHPD区間の計算
+def invgamma_hpdi(alpha, beta, prob):
+    """
+        入力
+        alpha:  逆ガンマ分布の形状パラメータ
+        beta:   逆ガンマ分布の尺度パラメータ
+        prob:   HPD区間の確率 (0 < prob < 1)
+        出力
+        HPD区間
+    """
+    return hpdi('invgamma', alpha, beta, prob)
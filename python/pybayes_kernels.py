@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+#%% NumPyの読み込み
+import numpy as np
+#   数学関数のモジュールの読み込み
+import math
+#   警告を出すモジュールの読み込み
+import warnings
+#   Numbaの読み込み（インストールされていなければNumPy版を使う）
+try:
+    import numba
+except ImportError:
+    numba = None
+#%% 反復計算の核となる関数（NumPy版とNumbaによるJITコンパイル版）
+#   正規分布の平均と分散のギブズ・サンプラーの反復
+def _gaussian_kernel(z, g, n, sum_data, mean_data, inv_tau02, mu0_tau02, c,
+                     sigma2, out):
+    for i in range(len(z)):
+        variance_mu = 1.0 / (n / sigma2 + inv_tau02)
+        mean_mu = variance_mu * (sum_data / sigma2 + mu0_tau02)
+        mu = mean_mu + variance_mu**0.5 * z[i]
+        sigma2 = 0.5 * (n * (mu - mean_data)**2 + c) / g[i]
+        out[i, 0] = mu
+        out[i, 1] = sigma2
+    return sigma2
+#   回帰モデルのギブズ・サンプラーの反復
+def _regression_kernel(XX, Xy, b_ols, A0, A0b0, lam_hat, z, g, sigma2, out):
+    k = XX.shape[0]
+    for i in range(z.shape[0]):
+        L = np.linalg.cholesky(XX / sigma2 + A0)
+        r = Xy / sigma2 + A0b0
+        #   b = Q^{-1} r + L^{-T} z = L^{-T} (L^{-1} r + z)
+        w = np.linalg.solve(L, r) + z[i]
+        b = np.linalg.solve(L.T, w)
+        diff = b - b_ols
+        lam_star = 0.5 * (diff.dot(XX.dot(diff)) + lam_hat)
+        sigma2 = lam_star / g[i]
+        out[i, :k] = b
+        out[i, k] = sigma2
+    return sigma2
+#   AR(1)過程 x[t] = rho * x[t-1] + e[t] の生成
+def _ar1_kernel(rho, e, out):
+    out[0] = e[0]
+    for t in range(1, len(e)):
+        out[t] = rho * out[t-1] + e[t]
+    return out
+#   ノイズを含むAR(1)過程のカルマン・フィルターによる対数尤度
+def _kalman_ar1_kernel(y, rho, omega2, sigma2):
+    #   x[0]は定常分布 N(0, omega2 / (1 - rho**2)) に従う
+    a = 0.0
+    p = omega2 / (1.0 - rho * rho)
+    loglik = 0.0
+    for t in range(len(y)):
+        f = p + sigma2
+        v = y[t] - a
+        loglik -= 0.5 * (math.log(2.0 * math.pi * f) + v * v / f)
+        gain = p / f
+        a = rho * (a + gain * v)
+        p = rho * rho * p * (1.0 - gain) + omega2
+    return loglik
+#   線形ガウス状態空間モデル（観測値は1変量）のカルマン・フィルターによる対数尤度
+def _kalman_kernel(y, Z, T, RQR, H, a0, P0):
+    a = a0.copy()
+    P = P0.copy()
+    loglik = 0.0
+    for t in range(len(y)):
+        PZ = P.dot(Z)
+        f = Z.dot(PZ) + H
+        v = y[t] - Z.dot(a)
+        loglik -= 0.5 * (math.log(2.0 * math.pi * f) + v * v / f)
+        K = T.dot(PZ) / f
+        a = T.dot(a) + K * v
+        P = T.dot(P).dot(T.T) - np.outer(K, K) * f + RQR
+    return loglik
+#%% バックエンドの選択
+_KERNELS = {'gaussian': _gaussian_kernel, 'regression': _regression_kernel,
+            'ar1': _ar1_kernel, 'kalman_ar1': _kalman_ar1_kernel,
+            'kalman': _kalman_kernel}
+_COMPILED = {}
+def get_backend(backend):
+    """
+        入力
+        backend:    'numpy'あるいは'numba'
+        出力
+        実際に使われるバックエンド
+        （Numbaがインストールされていなければ警告を出して'numpy'を返す）
+    """
+    if backend not in ('numpy', 'numba'):
+        raise ValueError("backendは'numpy'か'numba'でなければならない．")
+    if backend == 'numba' and numba is None:
+        warnings.warn('Numbaがインストールされていないので，'
+                      'NumPy版を使います．')
+        return 'numpy'
+    return backend
+def get_kernel(name, backend):
+    """
+        入力
+        name:       'gaussian', 'regression', 'ar1', 'kalman_ar1', 'kalman'
+                    のいずれか
+        backend:    'numpy'あるいは'numba'
+        出力
+        反復計算の関数（'numba'ならば最初の呼び出し時にJITコンパイルされる）
+    """
+    if get_backend(backend) == 'numpy':
+        return _KERNELS[name]
+    if name not in _COMPILED:
+        _COMPILED[name] = numba.njit(cache=True)(_KERNELS[name])
+    return _COMPILED[name]
+#%% AR(1)過程の生成
+def ar1_simulate(rho, e, backend='numpy'):
+    """
+        入力
+        rho:        AR(1)係数
+        e:          撹乱項（e[0]は初期値x[0]そのもの）
+        backend:    'numpy'あるいは'numba'
+        出力
+        x:          x[0] = e[0], x[t] = rho * x[t-1] + e[t]
+    """
+    e = np.asarray(e, dtype=np.float64)
+    return get_kernel('ar1', backend)(float(rho), e, np.empty_like(e))
@@ -7,6 +7,14 @@ import scipy.stats as st
 import pymc as pm
 #   MatplotlibのPyplotモジュールの読み込み
 import matplotlib.pyplot as plt
+#   AR(1)過程を生成する関数の読み込み
+from pybayes_kernels import ar1_simulate
+#   カルマン・フィルターとシミュレーション・スムーザーの関数の読み込み
+from pybayes_statespace import ar1_sample, ar1_smoother
+#   モンテカルロ標本をInferenceDataに変換する関数の読み込み
+from pybayes_trace import trace_to_inference_data
+#   ArviZの読み込み
+import arviz as az
 #   日本語フォントの設定
 from matplotlib.font_manager import FontProperties
 import sys
@@ -22,10 +30,9 @@ jpfont = FontProperties(fname=FontPath)
 #%% ノイズを含むAR(1)過程からデータを生成
 n = 500
 np.random.seed(99)
-x = np.empty(n)
-x[0] = st.norm.rvs() # 定常分布の分散 = 0.19/(1 - 0.9**2) = 1.0
-for t in range(1, n):
-    x[t] = 0.9 * x[t-1] + st.norm.rvs(scale=np.sqrt(0.19))
+e = st.norm.rvs(size=n) # e[0]は初期値x[0]
+e[1:] *= np.sqrt(0.19) # 定常分布の分散 = 0.19/(1 - 0.9**2) = 1.0
+x = ar1_simulate(0.9, e) # backend='numba'ならばJITコンパイル版を使う
 y = x + st.norm.rvs(scale=0.5, size=n)
 #%% 事後分布の設定
 ar1_model = pm.Model()
@@ -45,6 +52,17 @@ with ar1_model:
     trace = pm.sample(draws=n_draws, chains=n_chains, tune=n_tune,
                       random_seed=123)
     print(pm.summary(trace, var_names=param_names))
+#%% 状態変数をカルマン・フィルターで積分消去したサンプリング
+#   sigma, rho, omegaだけをMHアルゴリズムで生成し，状態変数は後から
+#   シミュレーション・スムーザーで生成する（計算量はデータの長さに比例）
+rng = np.random.default_rng(123)
+runs_kalman, accept = ar1_sample(y, n_draws, n_tune, n_chains, rng)
+trace_kalman = trace_to_inference_data(runs_kalman, param_names)
+print(az.summary(trace_kalman))
+draws_kalman = runs_kalman.reshape((-1, 3))[::10]
+states = ar1_smoother(y, draws_kalman[:, 0], draws_kalman[:, 1],
+                      draws_kalman[:, 2], rng)
+print(np.corrcoef(states.mean(axis=0), x)[0, 1])
 #%% 事後分布のグラフの作成
 k = len(param_names)
 fig, ax = plt.subplots(k, 2, num=1, figsize=(8, 1.5*k), facecolor='w')
@@ -7,6 +7,12 @@ import scipy.stats as st
 import pandas as pd
 #   PyMCの読み込み
 import pymc as pm
+#   ArviZの読み込み
+import arviz as az
+#   状態空間モデルによる時系列の分解の関数の読み込み
+from pybayes_statespace import structural_sample, structural_decompose
+#   モンテカルロ標本をInferenceDataに変換する関数の読み込み
+from pybayes_trace import trace_to_inference_data
 #   MatplotlibのPyplotモジュールの読み込み
 import matplotlib.pyplot as plt
 #   日本語フォントの設定
@@ -55,6 +61,16 @@ with timeseries_decomp:
     trace = pm.sample(draws=n_draws, chains=n_chains, tune=n_tune,
                       target_accept=0.95, random_seed=123)
     print(pm.summary(trace, var_names=param_names))
+#%% トレンドと季節変動をカルマン・フィルターで積分消去したサンプリング
+#   sigma, tau, omegaだけをMHアルゴリズムで生成し，トレンドと季節変動は
+#   後からシミュレーション・スムーザーで生成する
+rng = np.random.default_rng(123)
+runs_kalman, accept = structural_sample(y, n_draws, n_tune, n_chains, rng)
+print(az.summary(trace_to_inference_data(runs_kalman, param_names)))
+draws_kalman = runs_kalman.reshape((-1, 3))[::10]
+trend_kalman, seasonal_kalman \
+    = structural_decompose(y, draws_kalman[:, 0], draws_kalman[:, 1],
+                           draws_kalman[:, 2], rng)
 #%% 事後分布のグラフの作成
 series_name = ['原系列', '平滑値', 'トレンド', '季節変動', 'ノイズ']
 k = len(param_names)
@@ -84,11 +100,20 @@ seasonal = trace.posterior['seasonal'].values.reshape(n_draws*n_chains, n).mean(
 noise = y - trend - seasonal
 series = np.vstack((y, trend + seasonal, trend, seasonal, noise)).T
 results = pd.DataFrame(series, index=series_date, columns=series_name)
+#   シミュレーション・スムーザーによるトレンドと季節変動の事後平均
+trend_mean = trend_kalman.mean(axis=0)
+seasonal_mean = seasonal_kalman.mean(axis=0)
+series_kalman = np.vstack((y, trend_mean + seasonal_mean, trend_mean,
+                           seasonal_mean, y - trend_mean - seasonal_mean)).T
+results_kalman = pd.DataFrame(series_kalman, index=series_date,
+                              columns=series_name)
 fig2, ax2 = plt.subplots(4, 1, sharex='col',
                          num=2, figsize=(8, 6), facecolor='w')
 for index in range(4):
     ts_name = series_name[index+1]
-    ax2[index].plot(results[ts_name], 'k-', label=ts_name)
+    ax2[index].plot(results[ts_name], 'k-', label='PyMC')
+    ax2[index].plot(results_kalman[ts_name], 'k--',
+                    label='シミュレーション・スムーザー')
     ax2[index].set_ylabel(ts_name, fontproperties=jpfont)
 ax2[0].plot(results[series_name[0]], 'k:', label=series_name[0])
 ax2[0].set_xlim(series_date[0], series_date[-1])
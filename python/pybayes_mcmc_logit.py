@@ -5,6 +5,12 @@ import numpy as np
 import scipy.stats as st
 #   PyMCの読み込み
 import pymc as pm
+#   ArviZの読み込み
+import arviz as az
+#   ロジット・モデルのギブズ・サンプラーとラプラス近似の関数の読み込み
+from pybayes_glm import logit_gibbs, glm_laplace_sample
+#   モンテカルロ標本をInferenceDataに変換する関数の読み込み
+from pybayes_trace import trace_to_inference_data
 #   MatplotlibのPyplotモジュールの読み込み
 import matplotlib.pyplot as plt
 #   日本語フォントの設定
@@ -45,6 +51,22 @@ with logit_model:
     trace = pm.sample(draws=n_draws, chains=n_chains, tune=n_tune,
                       random_seed=123)
     print(pm.summary(trace))
+#%% PyMCを使わないギブズ・サンプラーによるサンプリング
+#   ポリア・ガンマ分布に従う潜在変数を加えると回帰係数の条件付事後分布は
+#   正規分布となるので，モデルのコンパイルや勾配の計算は不要である
+runs_pg = logit_gibbs(y, X, n_tune + n_draws, b0, A0, n_chains,
+                      np.random.default_rng(123))
+trace_pg = trace_to_inference_data(runs_pg[:, n_tune:, :], ['b'] * k)
+print(az.summary(trace_pg))
+#%% ラプラス近似と重点リサンプリングによる近似事後分布
+#   パレート平滑化した重要度の重みの形状パラメータkが0.7を超える場合は
+#   近似が不十分なので，MCMCの結果を使う
+runs_laplace, pareto_k = glm_laplace_sample('logit', y, X, b0, A0,
+                                            n_draws * n_chains,
+                                            np.random.default_rng(123))
+print('k = {0:.3f}'.format(pareto_k))
+print(az.summary(trace_to_inference_data(runs_laplace[None], ['b'] * k),
+                 kind='stats'))
 #%% 事後分布のグラフの作成
 fig, ax = plt.subplots(k, 2, num=1, figsize=(8, 1.5*k), facecolor='w')
 for index in range(k):
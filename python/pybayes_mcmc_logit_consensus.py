@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+#%% NumPyの読み込み
+import numpy as np
+#   SciPyのstatsモジュールの読み込み
+import scipy.stats as st
+#   ArviZの読み込み
+import arviz as az
+#   一時フォルダーの作成に用いるモジュールの読み込み
+import os
+import tempfile
+#   データを分割したコンセンサス・モンテカルロ法の関数の読み込み
+from pybayes_consensus import write_shards, consensus_sample
+#   ロジット・モデルのギブズ・サンプラーの読み込み（全データとの比較）
+from pybayes_glm import logit_gibbs
+#   モンテカルロ標本をInferenceDataに変換する関数の読み込み
+from pybayes_trace import trace_to_inference_data
+#%% データを分割したコンセンサス・モンテカルロ法
+#   データを4つのファイルに分け，それぞれの部分事後分布をプロセスプールで
+#   並列に生成して統合する（WindowsやmacOSなどでは子プロセスがこのファイルを
+#   読み込み直すので，関数の読み込み以外は全て if __name__ == '__main__': の
+#   中で実行する）
+if __name__ == '__main__':
+    #   pybayes_mcmc_logit.pyと同じデータと事前分布
+    n = 500
+    np.random.seed(99)
+    x1 = st.uniform.rvs(loc=-np.sqrt(3.0), scale=2.0*np.sqrt(3.0), size=n)
+    x2 = st.uniform.rvs(loc=-np.sqrt(3.0), scale=2.0*np.sqrt(3.0), size=n)
+    q = st.logistic.cdf(0.5*x1 - 0.5*x2)
+    y = st.bernoulli.rvs(q)
+    X = np.stack((np.ones(n), x1, x2), axis=1)
+    n, k = X.shape
+    b0 = np.zeros(k)
+    A0 = 0.01 * np.eye(k)
+    n_draws = 5000
+    n_chains = 4
+    n_tune = 1000
+    #   分割したファイルは一時フォルダーに置き，終了時に削除する
+    with tempfile.TemporaryDirectory() as directory:
+        data_path = os.path.join(directory, 'pybayes_logit_data.npy')
+        np.save(data_path, np.column_stack((y, X)))
+        shard_paths = write_shards(data_path, 4,
+                                   os.path.join(directory,
+                                                'pybayes_logit_shard'))
+        runs_consensus, _ = consensus_sample('logit', shard_paths,
+                                             n_tune + n_draws, n_tune, b0,
+                                             A0, seed=123)
+    print(az.summary(trace_to_inference_data(runs_consensus[None],
+                                             ['b'] * k), kind='stats'))
+    #   全データのギブズ・サンプラーとの比較
+    runs_full = logit_gibbs(y, X, n_tune + n_draws, b0, A0, n_chains,
+                            np.random.default_rng(123))
+    print(az.summary(trace_to_inference_data(runs_full[:, n_tune:, :],
+                                             ['b'] * k), kind='stats'))
@@ -5,6 +5,15 @@ import numpy as np
 import scipy.stats as st
 #   PyMCの読み込み
 import pymc as pm
+#   ArviZの読み込み
+import arviz as az
+#   ラプラス近似と確率的勾配ランジュバン動学の関数の読み込み
+from pybayes_glm import glm_laplace_sample, glm_sgld
+#   モンテカルロ標本をInferenceDataに変換する関数の読み込み
+from pybayes_trace import trace_to_inference_data
+#   一時フォルダーの作成に用いるモジュールの読み込み
+import os
+import tempfile
 #   MatplotlibのPyplotモジュールの読み込み
 import matplotlib.pyplot as plt
 #   日本語フォントの設定
@@ -45,6 +54,26 @@ with poisson_regression_model:
     trace = pm.sample(draws=n_draws, chains=n_chains, tune=n_tune,
                       random_seed=123)
     print(pm.summary(trace))
+#%% ラプラス近似と重点リサンプリングによる近似事後分布
+#   パレート平滑化した重要度の重みの形状パラメータkが0.7を超える場合は
+#   近似が不十分なので，MCMCの結果を使う
+runs_laplace, pareto_k = glm_laplace_sample('poisson', y, X, b0, A0,
+                                            n_draws * n_chains,
+                                            np.random.default_rng(123))
+print('k = {0:.3f}'.format(pareto_k))
+print(az.summary(trace_to_inference_data(runs_laplace[None], ['b'] * k),
+                 kind='stats'))
+#%% ミニバッチによる確率的勾配ランジュバン動学（SGLD）
+#   データを.npyファイルに保存すれば，ミニバッチはそこから読み込むので
+#   データ全体をメモリに載せる必要はない
+#   （ファイルは一時フォルダーに作り，計算が終われば削除する）
+with tempfile.TemporaryDirectory() as directory:
+    data_path = os.path.join(directory, 'pybayes_poisson_data.npy')
+    np.save(data_path, np.column_stack((y, X)))
+    runs_sgld = glm_sgld('poisson', data_path, n_tune + n_draws, b0, A0,
+                         n_chains, np.random.default_rng(123), batch_size=50)
+print(az.summary(trace_to_inference_data(runs_sgld[:, n_tune:, :],
+                                         ['b'] * k)))
 #%% 事後分布のグラフの作成
 fig, ax = plt.subplots(k, 2, num=1, figsize=(8, 1.5*k), facecolor='w')
 for index in range(k):
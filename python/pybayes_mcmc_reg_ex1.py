@@ -5,8 +5,15 @@ import numpy as np
 import scipy.stats as st
 #   SciPyのLinalgモジュールの読み込み
 import scipy.linalg as la
-#   PyMCの読み込み
-import pymc as pm
+#   PyMCの読み込み（NUTSとの比較に用いる．インストールされていなくてもよい）
+try:
+    import pymc as pm
+except ImportError:
+    pm = None
+#   ArviZの読み込み
+import arviz as az
+#   共役事前分布の事後分布からの標本の直接生成の関数の読み込み
+from pybayes_conjugate import suffstats, regression_sample
 #   MatplotlibのPyplotモジュールの読み込み
 import matplotlib.pyplot as plt
 #   日本語フォントの設定
@@ -35,22 +42,35 @@ nu0 = 5.0
 lam0 = 7.0
 h0 = np.sqrt(np.diag(lam0 / nu0 * la.inv(A0)))
 sd0 = np.sqrt(np.diag(la.inv(A0)))
-regression_conjugate = pm.Model()
-with regression_conjugate:
-    sigma2 = pm.InverseGamma('sigma2', alpha=0.5*nu0, beta=0.5*lam0)
-    sigma = pm.math.sqrt(sigma2)
-    a = pm.Normal('a', mu=b0[0], sigma=sigma*sd0[0])
-    b = pm.Normal('b', mu=b0[1], sigma=sigma*sd0[1])
-    y_hat = a + b * x
-    likelihood = pm.Normal('y', mu=y_hat, sigma=sigma, observed=y)
-#%% 事後分布からのサンプリング
+#%% 事後分布からの独立な標本の直接生成（MCMCを使わない）
+#   自然共役事前分布なので事後分布は正規・逆ガンマ分布となる
 n_draws = 5000
 n_chains = 4
-n_tune = 1000
-with regression_conjugate:
-    trace = pm.sample(draws=n_draws, chains=n_chains, tune=n_tune,
-                      random_seed=123)
-    print(pm.summary(trace))
+X = np.stack((np.ones(n), x), axis=1)
+state = suffstats('regression', np.column_stack((y, X)))
+trace = regression_sample(state, b0, A0, nu0, lam0, n_draws,
+                          np.random.default_rng(123), chains=n_chains,
+                          var_names=['a', 'b'])
+print(az.summary(trace))
+#%% PyMCのNUTSによるサンプリングとの比較（compare_nutsがTrueのときだけ）
+#   同じモデルをPyMCで定義してNUTSで事後分布からサンプリングする．
+#   結果は上の直接生成と一致するが，モデルのコンパイルとサンプリングに
+#   時間がかかる．
+compare_nuts = False
+if compare_nuts and pm is not None:
+    regression_conjugate = pm.Model()
+    with regression_conjugate:
+        sigma2 = pm.InverseGamma('sigma2', alpha=0.5*nu0, beta=0.5*lam0)
+        sigma = pm.math.sqrt(sigma2)
+        a = pm.Normal('a', mu=b0[0], sigma=sigma*sd0[0])
+        b = pm.Normal('b', mu=b0[1], sigma=sigma*sd0[1])
+        y_hat = a + b * x
+        likelihood = pm.Normal('y', mu=y_hat, sigma=sigma, observed=y)
+    n_tune = 1000
+    with regression_conjugate:
+        trace_nuts = pm.sample(draws=n_draws, chains=n_chains, tune=n_tune,
+                               random_seed=123)
+        print(pm.summary(trace_nuts))
 #%% 事後分布のグラフの作成
 k = b0.size
 param_names = ['a', 'b', 'sigma2']
@@ -5,8 +5,17 @@ import numpy as np
 import scipy.stats as st
 #   SciPyのLinalgモジュールの読み込み
 import scipy.linalg as la
-#   PyMCの読み込み
-import pymc as pm
+#   PyMCの読み込み（NUTSとの比較に用いる．インストールされていなくてもよい）
+try:
+    import pymc as pm
+except ImportError:
+    pm = None
+#   ArviZの読み込み
+import arviz as az
+#   複数チェーンのギブズ・サンプラーの関数の読み込み
+from pybayes_gibbs import gibbs_regression_chains
+#   モンテカルロ標本をInferenceDataに変換する関数の読み込み
+from pybayes_trace import trace_to_inference_data
 #   MatplotlibのPyplotモジュールの読み込み
 import matplotlib.pyplot as plt
 #   日本語フォントの設定
@@ -37,21 +46,37 @@ A0 = 0.2 * np.eye(k)
 nu0 = 5.0
 lam0 = 7.0
 sd0 = np.sqrt(np.diag(la.inv(A0)))
-multiple_regression = pm.Model()
-with multiple_regression:
-    sigma2 = pm.InverseGamma('sigma2', alpha=0.5*nu0, beta=0.5*lam0)
-    b = pm.MvNormal('b', mu=b0, tau=A0, shape=k)
-    y_hat = pm.math.dot(X, b)
-    likelihood = pm.Normal('y', mu=y_hat, sigma=pm.math.sqrt(sigma2),
-                           observed=y)
-#%% 事後分布からのサンプリング
+#%% PyMCを使わないギブズ・サンプラーによるサンプリング
+#   回帰係数の事前分布が誤差項の分散に依存しないので自然共役事前分布ではなく，
+#   pybayes_mcmc_reg_ex1.pyのように事後分布から直接は生成できない．
+#   しかし条件付事後分布は正規分布と逆ガンマ分布なので，
+#   ギブズ・サンプラーで全チェーンをまとめて生成できる
 n_draws = 5000
 n_chains = 4
 n_tune = 1000
-with multiple_regression:
-    trace = pm.sample(draws=n_draws, chains=n_chains, tune=n_tune,
-                      random_seed=123)
-    print(pm.summary(trace))
+runs_gibbs = gibbs_regression_chains(y, X, n_tune + n_draws, b0, A0, nu0,
+                                     lam0, n_chains,
+                                     np.random.default_rng(123))
+trace = trace_to_inference_data(runs_gibbs[:, n_tune:, :],
+                                ['b'] * k + ['sigma2'])
+print(az.summary(trace))
+#%% PyMCのNUTSによるサンプリングとの比較（compare_nutsがTrueのときだけ）
+#   同じモデルをPyMCで定義してNUTSで事後分布からサンプリングする．
+#   結果は上のギブズ・サンプラーと一致するが，モデルのコンパイルと
+#   サンプリングに時間がかかる．
+compare_nuts = False
+if compare_nuts and pm is not None:
+    multiple_regression = pm.Model()
+    with multiple_regression:
+        sigma2 = pm.InverseGamma('sigma2', alpha=0.5*nu0, beta=0.5*lam0)
+        b = pm.MvNormal('b', mu=b0, tau=A0, shape=k)
+        y_hat = pm.math.dot(X, b)
+        likelihood = pm.Normal('y', mu=y_hat, sigma=pm.math.sqrt(sigma2),
+                               observed=y)
+    with multiple_regression:
+        trace_nuts = pm.sample(draws=n_draws, chains=n_chains, tune=n_tune,
+                               random_seed=123)
+        print(pm.summary(trace_nuts))
 #%% 事後分布のグラフの作成
 fig, ax = plt.subplots(k+1, 2, num=1, figsize=(8, 1.5*(k+1)), facecolor='w')
 for index in range(k+1):
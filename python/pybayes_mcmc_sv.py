@@ -7,6 +7,13 @@ import scipy.stats as st
 import pandas as pd
 #   PyMCの読み込み
 import pymc as pm
+#   ArviZの読み込み
+import arviz as az
+#   混合正規分布による近似を用いたSVモデルのサンプラーの読み込み
+from pybayes_sv import sv_sample, sv_filter_init, sv_filter_update, \
+                       sv_filter_result
+#   モンテカルロ標本をInferenceDataに変換する関数の読み込み
+from pybayes_trace import trace_to_inference_data
 #   MatplotlibのPyplotモジュールの読み込み
 import matplotlib.pyplot as plt
 #   日本語フォントの設定
@@ -53,6 +60,27 @@ with sv_model:
     trace = pm.sample(draws=n_draws, chains=n_chains, tune=n_tune,
                       target_accept=0.95, random_seed=123)
     print(pm.summary(trace, var_names=param_names))
+#%% 混合正規分布による近似を用いたサンプラー（PyMCとの比較）
+runs, vol_summary, h_last = sv_sample(y, n_draws, n_tune, n_chains,
+                                      np.random.default_rng(123))
+print(az.summary(trace_to_inference_data(runs, param_names)))
+vol_ksc = vol_summary[:, 1]
+#%% 粒子フィルターによるボラティリティとパラメータの逐次更新
+#   新しい収益率が得られるたびにsv_filter_updateを呼べば，計算量は
+#   それまでの観測値の数に依存しない（全期間の再推定はsv_sampleで行い，
+#   sv_filter_init(n_particles, rng, runs, h_last=h_last)で
+#   逐次更新を再開できる）
+n_particles = 5000
+rng = np.random.default_rng(123)
+filter_state = sv_filter_init(n_particles, rng)
+vol_filtered = np.empty(n)
+for t in range(n):
+    sv_filter_update(filter_state, y[t], rng)
+    vol_filtered[t] = sv_filter_result(filter_state)[4, 1]
+stats_string = ['平均', '中央値', '標準偏差', '信用区間（下限）',
+                '信用区間（上限）']
+print(pd.DataFrame(sv_filter_result(filter_state),
+                   index=param_names + ['volatility'], columns=stats_string))
 #%% 事後分布のグラフの作成
 k = len(param_names)
 x_minimum = [ 3.0, 0.15, 0.9, 0.02]
@@ -78,17 +106,31 @@ plt.tight_layout()
 plt.savefig('pybayes_fig_sv_posterior.png', dpi=300)
 plt.show()
 #%% ボラティリティのプロット
-vol= np.median(np.reshape(
-         np.tile(trace.posterior['sigma'].values.T, (n, 1, 1)).swapaxes(0, 2)
-         * np.exp(trace.posterior['log_vol'].values), (n_draws*n_chains, n)), axis=0)
-fig2 = plt.figure(num=2, facecolor='w')
-plt.plot(series_date, y, 'k-', linewidth=0.5, label='ドル円為替レート')
-plt.plot(series_date, 2.0 * vol, 'k:', linewidth=0.5, label='2シグマ区間')
-plt.plot(series_date, -2.0 * vol, 'k:', linewidth=0.5)
-plt.xlim(series_date[0], series_date[-1])
-plt.xticks(['2014', '2015', '2016', '2017'])
-plt.xlabel('営業日', fontproperties=jpfont)
-plt.ylabel('日次変化率 (%)', fontproperties=jpfont)
-plt.legend(loc='best', frameon=False, prop=jpfont)
+#   全期間の(乱数系列, 期間)の配列を複製しないように期間を分けて計算する
+sigma_draws = trace.posterior['sigma'].values[:, :, None]
+vol = np.hstack([np.median(sigma_draws
+                           * np.exp(trace.posterior['log_vol'][:, :, t:t+100]
+                                    .values), axis=(0, 1))
+                 for t in range(0, n, 100)])
+fig2, ax2 = plt.subplots(2, 1, num=2, figsize=(8, 6), sharex=True,
+                         facecolor='w')
+ax2[0].plot(series_date, y, 'k-', linewidth=0.5, label='ドル円為替レート')
+ax2[0].plot(series_date, 2.0 * vol, 'k:', linewidth=0.5, label='2シグマ区間')
+ax2[0].plot(series_date, -2.0 * vol, 'k:', linewidth=0.5)
+ax2[0].set_ylabel('日次変化率 (%)', fontproperties=jpfont)
+ax2[0].legend(loc='best', frameon=False, prop=jpfont)
+#   PyMC，混合正規分布による近似，粒子フィルター（各時点までの観測値による
+#   逐次推定）のボラティリティの比較
+ax2[1].plot(series_date, vol, 'k-', linewidth=0.5, label='PyMC')
+ax2[1].plot(series_date, vol_ksc, 'k--', linewidth=0.5,
+            label='混合正規分布による近似')
+ax2[1].plot(series_date, vol_filtered, 'k:', linewidth=0.5,
+            label='粒子フィルター')
+ax2[1].set_xlim(series_date[0], series_date[-1])
+ax2[1].set_xticks(['2014', '2015', '2016', '2017'])
+ax2[1].set_xlabel('営業日', fontproperties=jpfont)
+ax2[1].set_ylabel('ボラティリティ（中央値）', fontproperties=jpfont)
+ax2[1].legend(loc='best', frameon=False, prop=jpfont)
+plt.tight_layout()
 plt.savefig('pybayes_fig_sv_volatility.png', dpi=300)
 plt.show()
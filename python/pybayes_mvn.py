@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+#%% NumPyの読み込み
+import numpy as np
+#   SciPyのlinalgモジュールの読み込み
+import scipy.linalg as la
+#   SciPyのsparseモジュールの読み込み
+import scipy.sparse as sparse
+#   SciPyのsparse.linalgモジュールの読み込み
+import scipy.sparse.linalg as spla
+#%% 精度行列による多変量正規乱数の生成
+#   精度行列のコレスキー分解
+def precision_factor(Q):
+    """
+        入力
+        Q:      精度行列（正定値対称行列）
+        出力
+        L:      Q = L L' となる下三角行列
+    """
+    return la.cholesky(Q, lower=True)
+#   多変量正規分布 N(Q^{-1} b, Q^{-1}) からの乱数の生成
+def precision_sample(L, b, rng, size=None):
+    """
+        入力
+        L:      precision_factorで計算した精度行列のコレスキー因子
+        b:      平均がQ^{-1} bとなるベクトル
+        rng:    乱数生成器（numpy.random.Generatorあるいはnumpy.random）
+        size:   乱数の個数（Noneならば1個）
+        出力
+        乱数 (パラメータ) あるいは (size, パラメータ)
+
+        x = L'^{-1} (L^{-1} b + z) とすると，平均はQ^{-1} b，共分散行列は
+        L'^{-1} L^{-1} = Q^{-1}となる．共分散行列を求める逆行列の計算も，
+        その分解も不要で，同じLを使えば複数の乱数をまとめて生成できる．
+    """
+    w = la.solve_triangular(L, b, lower=True)
+    if size is None:
+        z = rng.standard_normal(w.size)
+    else:
+        z = rng.standard_normal((size, w.size))
+    return la.solve_triangular(L, (w + z).T, lower=True, trans='T').T
+#%% 精度行列による多変量正規乱数の生成（疎行列）
+#   疎な精度行列の並べ替え
+def sparse_precision_ordering(Q):
+    """
+        入力
+        Q:      精度行列（scipy.sparseの正定値対称行列）
+        出力
+        perm:   分解の非ゼロ要素の数を小さく抑える並べ替え（最小次数順序）
+                （Q[perm][:, perm]を分解する）
+
+        並べ替えは非ゼロ要素の位置だけで決まるので，位置が同じ精度行列を
+        繰り返し分解する場合は1回だけ求めてsparse_precision_factorに渡す．
+        SciPyのSuperLUは並べ替えだけを計算する関数を持たないので，
+        1回分解して並べ替えを取り出す．
+    """
+    lu = spla.splu(sparse.csc_matrix(Q), permc_spec='MMD_AT_PLUS_A',
+                   diag_pivot_thresh=0.0, options={'SymmetricMode': True})
+    return np.argsort(lu.perm_c)
+#   疎な精度行列の分解
+def sparse_precision_factor(Q, perm=None):
+    """
+        入力
+        Q:      精度行列（scipy.sparseの正定値対称行列）
+        perm:   sparse_precision_orderingで求めた並べ替え
+                （Noneならばここで求める）
+        出力
+        精度行列の分解の辞書
+
+        並べ替えたQ[perm][:, perm] = L D L' と分解する（Lは単位下三角行列，
+        Dは対角行列）．並べ替えにより分解の非ゼロ要素の数を小さく抑えられる．
+        SuperLUのLU分解が行の入れ替えをせず，Dの対角要素が全て正の場合
+        だけU = D L'となるので，そうでなければ（Qが正定値でなければ）
+        エラーとする．
+    """
+    Q = sparse.csc_matrix(Q)
+    if perm is None:
+        perm = sparse_precision_ordering(Q)
+    lu = spla.splu(Q[perm][:, perm].tocsc(), permc_spec='NATURAL',
+                   diag_pivot_thresh=0.0, options={'SymmetricMode': True})
+    d = lu.U.diagonal()
+    identity = np.arange(d.size)
+    if not (np.array_equal(lu.perm_r, identity)
+            and np.array_equal(lu.perm_c, identity)):
+        raise ValueError('LU分解で行あるいは列が入れ替えられたので，'
+                         '対称な分解が得られない．')
+    if not np.all(d > 0.0):
+        raise ValueError('精度行列が正定値でない．')
+    return {'lu': lu, 'L': lu.L.tocsr(), 'sqrt_d': np.sqrt(d),
+            'perm': perm, 'inverse_perm': np.argsort(perm)}
+#   疎な精度行列による連立方程式 Q x = b の計算
+def sparse_precision_solve(factor, b):
+    """
+        入力
+        factor: sparse_precision_factorで計算した分解の辞書
+        b:      右辺のベクトル（あるいは列ごとに並べた行列）
+        出力
+        Q^{-1} b
+    """
+    b = np.asarray(b, dtype=np.float64)
+    return factor['lu'].solve(b[factor['perm']])[factor['inverse_perm']]
+#   多変量正規分布 N(Q^{-1} b, Q^{-1}) からの乱数の生成
+def sparse_precision_sample(factor, b, rng, size=None):
+    """
+        入力
+        factor: sparse_precision_factorで計算した分解の辞書
+        b:      平均がQ^{-1} bとなるベクトル
+        rng:    乱数生成器 (numpy.random.Generator)
+        size:   乱数の個数（Noneならば1個）
+        出力
+        乱数 (パラメータ) あるいは (size, パラメータ)
+
+        並べ替えを元に戻したw = P' L D^{1/2} zの共分散行列はQとなるので，
+        x = Q^{-1} (b + w) は平均Q^{-1} b，共分散行列Q^{-1}に従う．
+        したがって1回の連立方程式の計算で乱数が得られる．
+    """
+    k = factor['sqrt_d'].size
+    shape = (k,) if size is None else (k, size)
+    z = rng.standard_normal(shape)
+    if size is None:
+        w = factor['L'].dot(factor['sqrt_d'] * z)
+        return sparse_precision_solve(factor,
+                                      b + w[factor['inverse_perm']])
+    w = factor['L'].dot(factor['sqrt_d'][:, None] * z)
+    return sparse_precision_solve(
+        factor, np.asarray(b)[:, None] + w[factor['inverse_perm']]).T
@@ -3,8 +3,8 @@
 import numpy as np
 #   SciPyのstatsモジュールの読み込み
 import scipy.stats as st
-#   SciPyのoptimizeモジュールの読み込み
-import scipy.optimize as opt
+#   HPD区間の計算の関数の読み込み
+from pybayes_hpdi import beta_hpdi
 #   Pandasの読み込み
 import pandas as pd
 #   MatplotlibのPyplotモジュールの読み込み
@@ -22,31 +22,6 @@ else:
     print('このPythonコードが対応していないOSを使用しています．')
     sys.exit()
 jpfont = FontProperties(fname=FontPath)
-#%%   ベータ分布のHPD区間の計算
-def beta_hpdi(ci0, alpha, beta, prob):
-    """
-        入力
-        ci0:    HPD区間の初期値
-        alpha:  ベータ分布のパラメータ1
-        beta:   ベータ分布のパラメータ2
-        prob:   HPD区間の確率 (0 < prob < 1)
-        出力
-        HPD区間
-    """
-    def hpdi_conditions(v, a, b, p):
-        """
-            入力
-            v:  HPD区間
-            a:  ベータ分布のパラメータ1
-            b:  ベータ分布のパラメータ2
-            p:  HPD区間の確率 (0 < p < 1)
-            出力
-            HPD区間の条件式の値
-        """
-        eq1 = st.beta.cdf(v[1], a, b) - st.beta.cdf(v[0], a, b) - p
-        eq2 = st.beta.pdf(v[1], a, b) - st.beta.pdf(v[0], a, b)
-        return np.hstack((eq1, eq2))
-    return opt.root(hpdi_conditions, ci0, args=(alpha, beta, prob)).x
 #%% 損失関数のグラフ
 q = np.linspace(0, 1, 250)
 fig1 = plt.figure(num=1, facecolor='w')
@@ -69,7 +44,7 @@ a = 2.0
 b = 5.0
 prob = 0.9
 ci = st.beta.interval(prob, a, b)
-hpdi = beta_hpdi(ci, a, b, prob)
+hpdi = beta_hpdi(a, b, prob)
 q = np.linspace(0, 1, 250)
 qq = [np.linspace(ci[0], ci[1], 250), np.linspace(hpdi[0], hpdi[1], 250)]
 label1 = 'ベータ分布 ($\\alpha$ = {0:<3.1f}, $\\beta$ = {1:<3.1f})' \
@@ -0,0 +1,337 @@
+# -*- coding: utf-8 -*-
+#%% NumPyの読み込み
+import numpy as np
+#   tqdmからプログレスバーの関数を読み込む
+from tqdm import trange
+#   反復計算の核となる関数（NumPy版とNumba版）の読み込み
+from pybayes_kernels import get_backend, get_kernel
+#%% ノイズを含むAR(1)過程の状態空間モデル
+#   y[t] = x[t] + v[t],  v[t] ~ N(0, sigma^2)
+#   x[t] = rho * x[t-1] + e[t],  e[t] ~ N(0, omega^2)
+#   カルマン・フィルターによる対数尤度（状態変数xを積分消去したもの）
+def ar1_loglik(y, sigma, rho, omega, backend='numpy'):
+    """
+        入力
+        y:          観測値
+        sigma:      観測ノイズの標準偏差
+        rho:        AR(1)係数 (-1 < rho < 1)
+        omega:      AR(1)過程の撹乱項の標準偏差
+        backend:    'numpy'あるいは'numba'
+        出力
+        対数尤度
+    """
+    backend = get_backend(backend)
+    if backend == 'numpy':
+        #   Pythonの反復ではNumPyの配列よりリストの方が速い
+        y = np.asarray(y, dtype=float).tolist()
+    else:
+        y = np.asarray(y, dtype=np.float64)
+    return get_kernel('kalman_ar1', backend)(y, float(rho), float(omega)**2,
+                                             float(sigma)**2)
+#   パラメータの対数事前密度（変換したパラメータに関するヤコビアンを含む）
+def _ar1_logprior(theta):
+    #   theta = (log sigma, atanh rho, log omega)
+    #   sigmaとomegaは半コーシー分布 (尺度1)，rhoは区間(-1, 1)の一様分布
+    sigma, rho, omega = np.exp(theta[0]), np.tanh(theta[1]), np.exp(theta[2])
+    return -np.log1p(sigma**2) + theta[0] + np.log1p(-rho**2) \
+           - np.log1p(omega**2) + theta[2]
+#   ランダム・ウォークMHアルゴリズムによるパラメータのサンプリング
+def ar1_sample(y, draws, tune, chains, rng, backend='numpy'):
+    """
+        入力
+        y:          観測値
+        draws:      チェーンごとの標本の大きさ
+        tune:       提案分布の調整に用いる反復回数（標本には含めない）
+        chains:     チェーンの数
+        rng:        乱数生成器 (numpy.random.Generator)
+        backend:    'numpy'あるいは'numba'（カルマン・フィルターの反復）
+        出力
+        runs:       モンテカルロ標本 (チェーン, 反復, パラメータ)
+                    （パラメータの順番はsigma, rho, omega）
+        accept:     チェーンごとの採択率
+
+        状態変数はカルマン・フィルターで積分消去し，3個のパラメータだけを
+        周辺尤度に基づいてサンプリングするので，1回の反復の計算量はO(n)で済む．
+        状態変数はar1_smootherで後から生成する．
+        提案分布の共分散行列は調整期間の標本から適応的に定める．
+    """
+    y = np.asarray(y, dtype=float)
+    backend = get_backend(backend)
+    def log_posterior(theta):
+        log_prior = _ar1_logprior(theta)
+        #   |rho| = 1 となる（定常でない）場合は採択しない
+        if not np.isfinite(log_prior):
+            return -np.inf
+        return ar1_loglik(y, np.exp(theta[0]), np.tanh(theta[1]),
+                          np.exp(theta[2]), backend) + log_prior
+    d = 3
+    runs = np.empty((chains, draws, d))
+    accept = np.zeros(chains)
+    for chain in range(chains):
+        theta = np.array([np.log(0.5 * y.std()), 0.0, np.log(0.5 * y.std())])
+        theta += 0.1 * rng.standard_normal(d)
+        log_p = log_posterior(theta)
+        chol = 0.1 * np.eye(d)
+        history = np.empty((tune + draws, d))
+        for idx in trange(tune + draws):
+            if idx >= 100 and idx < tune and idx % 100 == 0:
+                cov = 2.38**2 / d * np.cov(history[idx//2:idx].T) \
+                      + 1e-8 * np.eye(d)
+                chol = np.linalg.cholesky(cov)
+            proposal = theta + chol.dot(rng.standard_normal(d))
+            log_p_proposal = log_posterior(proposal)
+            if np.log(rng.uniform()) < log_p_proposal - log_p:
+                theta, log_p = proposal, log_p_proposal
+                if idx >= tune:
+                    accept[chain] += 1.0
+            history[idx] = theta
+        runs[chain] = np.column_stack((np.exp(history[tune:, 0]),
+                                       np.tanh(history[tune:, 1]),
+                                       np.exp(history[tune:, 2])))
+    return runs, accept / draws
+#   シミュレーション・スムーザー（前向きフィルター・後ろ向きサンプリング）
+def ar1_smoother(y, sigma, rho, omega, rng):
+    """
+        入力
+        y:      観測値
+        sigma:  観測ノイズの標準偏差（パラメータの標本のベクトルでもよい）
+        rho:    AR(1)係数（同上）
+        omega:  AR(1)過程の撹乱項の標準偏差（同上）
+        rng:    乱数生成器 (numpy.random.Generator)
+        出力
+        状態変数の標本 (パラメータの標本, 時点)
+
+        パラメータの標本ごとの計算は配列でまとめて行うので，時点についての
+        反復だけが残り，計算量は O(時点の数) となる．
+    """
+    y = np.asarray(y, dtype=float)
+    sigma2 = np.atleast_1d(np.asarray(sigma, dtype=float))**2
+    rho = np.atleast_1d(np.asarray(rho, dtype=float))
+    omega2 = np.atleast_1d(np.asarray(omega, dtype=float))**2
+    n = y.size
+    D = np.broadcast(sigma2, rho, omega2).size
+    m = np.empty((n, D))
+    P = np.empty((n, D))
+    #   前向きのカルマン・フィルター
+    a = np.zeros(D)
+    p = omega2 / (1.0 - rho**2) * np.ones(D)
+    for t in range(n):
+        gain = p / (p + sigma2)
+        m[t] = a + gain * (y[t] - a)
+        P[t] = p * (1.0 - gain)
+        a = rho * m[t]
+        p = rho**2 * P[t] + omega2
+    #   後ろ向きのサンプリング
+    z = rng.standard_normal((n, D))
+    x = np.empty((n, D))
+    x[-1] = m[-1] + np.sqrt(P[-1]) * z[-1]
+    for t in range(n - 2, -1, -1):
+        J = rho * P[t] / (rho**2 * P[t] + omega2)
+        mean = m[t] + J * (x[t+1] - rho * m[t])
+        variance = P[t] * (1.0 - J * rho)
+        x[t] = mean + np.sqrt(variance) * z[t]
+    return x.T
+#%% 線形ガウス状態空間モデル（観測値は1変量）
+#   y[t] = Z' alpha[t] + v[t],  v[t] ~ N(0, H)
+#   alpha[t+1] = T alpha[t] + R w[t],  w[t] ~ N(0, diag(q))
+#   alpha[0] ~ N(a0, P0)
+#   パラメータの組（バッチ）ごとのカルマン・フィルター
+def _kalman_filter(y, Z, T, R, q, H, a0, P0, store=False):
+    B = H.size
+    m = a0.size
+    RQR = np.einsum('ij,bj,kj->bik', R, q, R)
+    a = np.tile(a0, (B, 1))
+    P = np.tile(P0, (B, 1, 1))
+    loglik = np.zeros(B)
+    if store:
+        n = y.shape[-1]
+        history = {'a': np.empty((n, B, m)), 'P': np.empty((n, B, m, m)),
+                   'v': np.empty((n, B)), 'F': np.empty((n, B)),
+                   'K': np.empty((n, B, m))}
+    for t in range(y.shape[-1]):
+        PZ = P.dot(Z)
+        F = PZ.dot(Z) + H
+        v = y[..., t] - a.dot(Z)
+        loglik -= 0.5 * (np.log(2.0 * np.pi * F) + v**2 / F)
+        K = PZ.dot(T.T) / F[:, None]
+        if store:
+            history['a'][t] = a
+            history['P'][t] = P
+            history['v'][t] = v
+            history['F'][t] = F
+            history['K'][t] = K
+        a = a.dot(T.T) + K * v[:, None]
+        P = T @ P @ T.T - K[:, :, None] * K[:, None, :] * F[:, None, None] \
+            + RQR
+    if store:
+        return loglik, history
+    return loglik
+#   カルマン・フィルターによる対数尤度
+def kalman_loglik(y, Z, T, R, q, H, a0, P0, backend='numpy'):
+    """
+        入力
+        y:          観測値 (時点)
+        Z:          観測方程式の係数ベクトル (状態変数)
+        T:          状態方程式の係数行列 (状態変数, 状態変数)
+        R:          状態方程式の撹乱項の係数行列 (状態変数, 撹乱項)
+        q:          状態方程式の撹乱項の分散 (パラメータの組, 撹乱項)
+        H:          観測ノイズの分散 (パラメータの組)
+        a0:         状態変数の初期値の平均
+        P0:         状態変数の初期値の共分散行列
+        backend:    'numpy'（パラメータの組をまとめて計算）あるいは
+                    'numba'（パラメータの組ごとにJITコンパイル版で計算）
+        出力
+        パラメータの組ごとの対数尤度
+    """
+    y = np.asarray(y, dtype=float)
+    q = np.atleast_2d(np.asarray(q, dtype=float))
+    H = np.atleast_1d(np.asarray(H, dtype=float))
+    if get_backend(backend) == 'numpy':
+        return _kalman_filter(y, Z, T, R, q, H, a0, P0)
+    kernel = get_kernel('kalman', backend)
+    return np.array([kernel(y, Z, T, (R * q_b).dot(R.T), H_b, a0, P0)
+                     for q_b, H_b in zip(q, H)])
+#   シミュレーション・スムーザー（DurbinとKoopmanの方法）
+def simulation_smoother(y, Z, T, R, q, H, a0, P0, rng):
+    """
+        入力
+        y:      観測値 (時点)
+        Z, T, R, q, H, a0, P0:  kalman_loglikと同じ
+        rng:    乱数生成器 (numpy.random.Generator)
+        出力
+        状態変数の標本 (パラメータの組, 時点, 状態変数)
+
+        モデルから状態変数alpha+と観測値y+を生成して，y - y+ の平滑化推定値を
+        alpha+に加えると事後分布からの標本が得られる．状態方程式の撹乱項が
+        退化していても（例えばトレンドや季節変動の遅れの項）そのまま使える．
+        平滑化の後ろ向きの反復には逆行列が不要である．
+    """
+    y = np.asarray(y, dtype=float)
+    q = np.atleast_2d(np.asarray(q, dtype=float))
+    H = np.atleast_1d(np.asarray(H, dtype=float))
+    B = H.size
+    n = y.size
+    m = a0.size
+    #   モデルからの状態変数と観測値の生成
+    alpha_plus = np.empty((n, B, m))
+    alpha = a0 + rng.standard_normal((B, m)).dot(np.linalg.cholesky(P0).T)
+    for t in range(n):
+        alpha_plus[t] = alpha
+        w = rng.standard_normal(q.shape) * np.sqrt(q)
+        alpha = alpha.dot(T.T) + w.dot(R.T)
+    y_plus = alpha_plus.dot(Z) + rng.standard_normal((n, B)) * np.sqrt(H)
+    #   y - y+ に対するカルマン・フィルターと平滑化（初期値の平均は0）
+    _, history = _kalman_filter((y[:, None] - y_plus).T, Z, T, R, q, H,
+                                np.zeros(m), P0, store=True)
+    r = np.zeros((B, m))
+    for t in range(n - 1, -1, -1):
+        #   r[t-1] = Z v[t] / F[t] + L[t]' r[t],  L[t] = T - K[t] Z'
+        u = history['v'][t] / history['F'][t]
+        Kr = np.einsum('bi,bi->b', history['K'][t], r)
+        r = (u - Kr)[:, None] * Z + r.dot(T)
+        alpha_plus[t] += history['a'][t] \
+                         + np.einsum('bij,bj->bi', history['P'][t], r)
+    return alpha_plus.transpose((1, 0, 2))
+#%% 確率的トレンドと季節変動による時系列の分解（構造時系列モデル）
+#   y[t] = trend[t] + seasonal[t] + v[t],  v[t] ~ N(0, sigma^2)
+#   trend[t] = 2 trend[t-1] - trend[t-2] + e[t],  e[t] ~ N(0, tau^2)
+#   seasonal[t] = -(seasonal[t-1] + ... + seasonal[t-period+1]) + u[t],
+#   u[t] ~ N(0, omega^2)
+#   状態空間表現の行列
+def structural_model(period=4, scale0=100.0):
+    """
+        入力
+        period: 季節変動の周期（四半期データならば4）
+        scale0: 状態変数の初期値の事前分布（正規分布）の標準偏差
+        出力
+        Z, T, R, a0, P0の辞書
+        （状態変数は trend[t], trend[t-1], seasonal[t], ...,
+          seasonal[t-period+2] の順）
+    """
+    m = 2 + period - 1
+    T = np.zeros((m, m))
+    T[0, :2] = [2.0, -1.0]
+    T[1, 0] = 1.0
+    T[2, 2:] = -1.0
+    T[3:, 2:-1] = np.eye(period - 2)
+    Z = np.zeros(m)
+    Z[[0, 2]] = 1.0
+    R = np.zeros((m, 2))
+    R[0, 0] = 1.0
+    R[2, 1] = 1.0
+    return {'Z': Z, 'T': T, 'R': R, 'a0': np.zeros(m),
+            'P0': scale0**2 * np.eye(m)}
+#   ランダム・ウォークMHアルゴリズムによるパラメータのサンプリング
+def structural_sample(y, draws, tune, chains, rng, period=4,
+                      backend='numpy'):
+    """
+        入力
+        y:          観測値
+        draws:      チェーンごとの標本の大きさ
+        tune:       提案分布の調整に用いる反復回数（標本には含めない）
+        chains:     チェーンの数
+        rng:        乱数生成器 (numpy.random.Generator)
+        period:     季節変動の周期
+        backend:    'numpy'あるいは'numba'（カルマン・フィルターの反復）
+        出力
+        runs:       モンテカルロ標本 (チェーン, 反復, パラメータ)
+                    （パラメータの順番はsigma, tau, omega）
+        accept:     チェーンごとの採択率
+
+        トレンドと季節変動はカルマン・フィルターで積分消去し，
+        3個の標準偏差（事前分布は尺度1の半コーシー分布）だけを
+        対数変換してサンプリングする．全てのチェーンを同時に進めるので，
+        カルマン・フィルターはチェーンについてまとめて計算される．
+        トレンドと季節変動はstructural_decomposeで後から生成する．
+    """
+    y = np.asarray(y, dtype=float)
+    model = structural_model(period)
+    def log_posterior(theta):
+        s = np.exp(theta)
+        log_prior = (theta - np.log1p(s**2)).sum(axis=1)
+        return kalman_loglik(y, model['Z'], model['T'], model['R'],
+                             s[:, 1:]**2, s[:, 0]**2, model['a0'],
+                             model['P0'], backend) + log_prior
+    d = 3
+    theta = np.log(0.5 * y.std() + 0.1 * rng.standard_exponential((chains,
+                                                                    d)))
+    log_p = log_posterior(theta)
+    chol = 0.1 * np.eye(d)
+    history = np.empty((tune + draws, chains, d))
+    accept = np.zeros(chains)
+    for idx in trange(tune + draws):
+        if idx >= 100 and idx < tune and idx % 100 == 0:
+            recent = history[idx//2:idx].reshape((-1, d))
+            chol = np.linalg.cholesky(2.38**2 / d * np.cov(recent.T)
+                                      + 1e-8 * np.eye(d))
+        proposal = theta + rng.standard_normal((chains, d)).dot(chol.T)
+        log_p_proposal = log_posterior(proposal)
+        accepted = np.log(rng.uniform(size=chains)) < log_p_proposal - log_p
+        theta = np.where(accepted[:, None], proposal, theta)
+        log_p = np.where(accepted, log_p_proposal, log_p)
+        if idx >= tune:
+            accept += accepted
+        history[idx] = theta
+    return np.exp(history[tune:]).transpose((1, 0, 2)), accept / draws
+#   パラメータの標本からのトレンドと季節変動の生成
+def structural_decompose(y, sigma, tau, omega, rng, period=4):
+    """
+        入力
+        y:      観測値
+        sigma:  観測ノイズの標準偏差（パラメータの標本のベクトルでもよい）
+        tau:    トレンドの撹乱項の標準偏差（同上）
+        omega:  季節変動の撹乱項の標準偏差（同上）
+        rng:    乱数生成器 (numpy.random.Generator)
+        period: 季節変動の周期
+        出力
+        trend:      トレンドの標本 (パラメータの標本, 時点)
+        seasonal:   季節変動の標本 (パラメータの標本, 時点)
+    """
+    model = structural_model(period)
+    sigma, tau, omega = np.broadcast_arrays(np.atleast_1d(sigma),
+                                            np.atleast_1d(tau),
+                                            np.atleast_1d(omega))
+    q = np.column_stack((tau**2, omega**2))
+    states = simulation_smoother(y, model['Z'], model['T'], model['R'], q,
+                                 sigma**2, model['a0'], model['P0'], rng)
+    return states[:, :, 0], states[:, :, 2]
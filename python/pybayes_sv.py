@@ -0,0 +1,295 @@
+# -*- coding: utf-8 -*-
+#%% NumPyの読み込み
+import numpy as np
+#   SciPyのlinalgモジュールの読み込み
+import scipy.linalg as la
+#   SciPyのspecialモジュールの読み込み
+import scipy.special as sp
+#   tqdmからプログレスバーの関数を読み込む
+from tqdm import trange
+#   事後統計量の逐次計算の関数の読み込み
+from pybayes_diagnostics import summary_init, summary_update, summary_result
+#%% 確率的ボラティリティ（SV）モデル
+#   y[t] = sigma * exp(h[t]) * e[t],  e[t] ~ t(nu)
+#   h[t] = rho * h[t-1] + omega * u[t],  u[t] ~ N(0, 1)
+#   h[0] ~ N(0, omega^2 / (1 - rho^2))
+#   log chi^2(1)分布を近似する7個の正規分布の混合（Kim, Shephard and Chib）
+_KSC_PROB = np.array([0.00730, 0.10556, 0.00002, 0.04395, 0.34001, 0.24566,
+                      0.25750])
+_KSC_MEAN = np.array([-10.12999, -3.97281, -8.56686, 2.77786, 0.61942,
+                      1.79518, -1.08819]) - 1.2704
+_KSC_VAR = np.array([5.79596, 2.61369, 5.17950, 0.16735, 0.64009, 0.34023,
+                     1.26261])
+#   AR(1)過程の精度行列（三重対角行列）の帯行列表現
+def _ar1_precision_banded(n, rho, omega):
+    ab = np.empty((2, n))
+    ab[0, 0] = 0.0
+    ab[0, 1:] = -rho
+    ab[1, :] = 1.0 + rho**2
+    ab[1, [0, -1]] = 1.0
+    return ab / omega**2
+#   混合正規分布の成分の生成
+def _sample_components(r, rng):
+    #   r = log y*^2 - mu - 2h は log chi^2(1) 分布に従う
+    log_w = np.log(_KSC_PROB) - 0.5 * np.log(_KSC_VAR) \
+            - 0.5 * (r[:, None] - _KSC_MEAN)**2 / _KSC_VAR
+    w = np.exp(log_w - log_w.max(axis=1, keepdims=True))
+    cdf = np.cumsum(w, axis=1)
+    u = rng.uniform(size=r.size) * cdf[:, -1]
+    return (u[:, None] > cdf).sum(axis=1)
+#   混合の成分を与えた場合の線形ガウスモデルにおけるhの条件付事後分布
+def _state_posterior(r, inv_v, mu, rho, omega):
+    #   r = 2h + N(0, v) と hの事前分布から，精度行列（三重対角行列）の
+    #   帯行列コレスキー分解と条件付事後平均を求める（計算量はO(n)）
+    ab = _ar1_precision_banded(r.size, rho, omega)
+    ab[1] += 4.0 * inv_v
+    cb = la.cholesky_banded(ab)
+    mean_h = la.cho_solve_banded((cb, False), 2.0 * (r - mu) * inv_v)
+    return cb, mean_h
+#   hを積分消去したパラメータ theta = (mu, atanh rho, log omega) の対数事後密度
+def _log_posterior(theta, r, inv_v):
+    mu, rho, omega = theta[0], np.tanh(theta[1]), np.exp(theta[2])
+    n = r.size
+    cb, h = _state_posterior(r, inv_v, mu, rho, omega)
+    #   log p(r) = log p(r | h) + log p(h) - log p(h | r) をh = 事後平均で評価
+    resid = r - mu - 2.0 * h
+    ar1_resid = h[1:] - rho * h[:-1]
+    log_lik = -0.5 * (resid**2 * inv_v).sum() + 0.5 * np.log(inv_v).sum()
+    log_prior_h = 0.5 * np.log1p(-rho**2) - n * np.log(omega) \
+                  - 0.5 * ((1.0 - rho**2) * h[0]**2
+                           + ar1_resid.dot(ar1_resid)) / omega**2
+    log_det = np.log(cb[1]).sum()
+    #   事前分布: sigma = exp(mu/2)とomegaは尺度1の半コーシー分布，
+    #   rhoは区間(-1, 1)の一様分布（いずれも変換のヤコビアンを含む）
+    log_prior = 0.5 * mu - np.log1p(np.exp(mu)) + np.log1p(-rho**2) \
+                + theta[2] - np.log1p(omega**2)
+    return log_lik + log_prior_h - log_det + log_prior
+#   t分布の自由度の生成（尺度混合の潜在変数lamを積分消去したt分布の尤度による）
+def _sample_nu(e2, nu, rng, step=0.3):
+    n = e2.size
+    def log_posterior(log_nu):
+        v = np.exp(log_nu)
+        #   事前分布は指数分布 (率0.2)，log nuのヤコビアンを含む
+        return n * (sp.gammaln(0.5 * (v + 1.0)) - sp.gammaln(0.5 * v)
+                    - 0.5 * np.log(v)) \
+               - 0.5 * (v + 1.0) * np.log1p(e2 / v).sum() - 0.2 * v + log_nu
+    log_nu = np.log(nu)
+    proposal = log_nu + step * rng.standard_normal()
+    if np.log(rng.uniform()) < log_posterior(proposal) - log_posterior(log_nu):
+        return np.exp(proposal)
+    return nu
+#   混合正規分布による近似を用いたSVモデルのギブズ・サンプラー
+def sv_sample(y, draws, tune, chains, rng, prob=0.95, offset=1e-4):
+    """
+        入力
+        y:      収益率
+        draws:  チェーンごとの標本の大きさ
+        tune:   バーンインの回数（標本には含めない）
+        chains: チェーンの数
+        rng:    乱数生成器 (numpy.random.Generator)
+        prob:   ボラティリティの信用区間の確率
+        offset: log(y^2 + offset)のy = 0に対する補正
+        出力
+        runs:   モンテカルロ標本 (チェーン, 反復, パラメータ)
+                （パラメータの順番はnu, sigma, rho, omega）
+        vol:    ボラティリティ sigma * exp(h[t]) の事後統計量 (時点, 統計量)
+                （統計量はsummary_resultと同じく平均，中央値，標準偏差，
+                  近似誤差，信用区間（下限），信用区間（上限））
+        h_last: 最終時点の対数ボラティリティh[n-1]の標本 (チェーン, 反復)
+                （runsの同じ位置の標本と組になっていて，sv_filter_initに
+                  渡せば粒子フィルターによる逐次更新を再開できる）
+
+        t分布を正規分布の尺度混合 e[t] = sqrt(lam[t]) z[t] で表し，
+        log(y[t]^2 / lam[t]) = 2 log sigma + 2 h[t] + log z[t]^2 の
+        log chi^2(1)分布を7個の正規分布の混合で近似する．
+        混合の成分を与えると線形ガウスモデルとなるので，hを積分消去した
+        (2 log sigma, rho, omega)の事後分布からランダム・ウォークMHで生成し，
+        対数ボラティリティhは三重対角の精度行列の帯行列コレスキー分解により
+        O(n)でまとめて生成する．
+        混合正規分布による近似の誤差は補正していない．
+        ボラティリティの標本は保存せずに事後統計量を逐次計算する．
+    """
+    y = np.asarray(y, dtype=float)
+    n = y.size
+    d = 3
+    runs = np.empty((chains, draws, 4))
+    h_last = np.empty((chains, draws))
+    summary = summary_init(n, prob)
+    for chain in range(chains):
+        nu = 10.0
+        theta = np.array([np.log(y.var()), np.arctanh(0.9), np.log(0.1)])
+        h = np.zeros(n)
+        lam = np.ones(n)
+        chol = 0.05 * np.eye(d)
+        history = np.empty((tune, d))
+        for idx in trange(tune + draws):
+            z = np.log(y**2 / lam + offset)
+            s = _sample_components(z - theta[0] - 2.0 * h, rng)
+            r = z - _KSC_MEAN[s]
+            inv_v = 1.0 / _KSC_VAR[s]
+            #   hを積分消去してパラメータをランダム・ウォークMHで生成する
+            if idx >= 100 and idx < tune and idx % 100 == 0:
+                chol = np.linalg.cholesky(
+                    2.38**2 / d * np.cov(history[idx//2:idx].T)
+                    + 1e-8 * np.eye(d))
+            proposal = theta + chol.dot(rng.standard_normal(d))
+            if np.log(rng.uniform()) < _log_posterior(proposal, r, inv_v) \
+                                       - _log_posterior(theta, r, inv_v):
+                theta = proposal
+            if idx < tune:
+                history[idx] = theta
+            mu, rho, omega = theta[0], np.tanh(theta[1]), np.exp(theta[2])
+            #   hは条件付事後分布からまとめて生成する
+            cb, mean_h = _state_posterior(r, inv_v, mu, rho, omega)
+            h = mean_h + la.solve_banded((0, 1), cb, rng.standard_normal(n))
+            #   尺度混合の潜在変数 lam[t] ~ IG((nu + 1)/2, (nu + e[t]^2)/2)
+            #   （nuはlamを積分消去したt分布の尤度から先に生成する）
+            e2 = y**2 * np.exp(-mu - 2.0 * h)
+            nu = _sample_nu(e2, nu, rng)
+            lam = 0.5 * (nu + e2) / rng.standard_gamma(0.5 * (nu + 1.0),
+                                                       size=n)
+            if idx >= tune:
+                sigma = np.exp(0.5 * mu)
+                runs[chain, idx - tune] = (nu, sigma, rho, omega)
+                h_last[chain, idx - tune] = h[-1]
+                summary_update(summary, sigma * np.exp(h))
+    return runs, summary_result(summary), h_last
+#%% 粒子フィルターによるSVモデルの逐次更新（Liu and Westの方法）
+#   パラメータの変換 theta = (log nu, log sigma, atanh rho, log omega)
+def _theta_to_params(theta):
+    return np.exp(theta[:, 0]), np.exp(theta[:, 1]), np.tanh(theta[:, 2]), \
+           np.exp(theta[:, 3])
+#   t分布の対数密度 log p(y | h, theta)
+def _t_logpdf(y, theta, h):
+    nu = np.exp(theta[:, 0])
+    log_scale = theta[:, 1] + h
+    #   log(1 + e^2 / nu)をオーバーフローしないように計算する
+    with np.errstate(divide='ignore'):
+        log_e2 = 2.0 * (np.log(np.abs(y)) - log_scale) - theta[:, 0]
+    return sp.gammaln(0.5 * (nu + 1.0)) - sp.gammaln(0.5 * nu) \
+           - 0.5 * np.log(np.pi * nu) \
+           - 0.5 * (nu + 1.0) * np.logaddexp(0.0, log_e2) - log_scale
+#   正規化した重み
+def _normalized_weights(log_w):
+    w = np.exp(log_w - log_w.max())
+    return w / w.sum()
+#   系統的リサンプリング
+def _systematic_resample(w, rng):
+    u = (rng.uniform() + np.arange(w.size)) / w.size
+    return np.minimum(np.searchsorted(np.cumsum(w), u), w.size - 1)
+#   粒子フィルターの初期化
+def sv_filter_init(particles, rng, runs=None, discount=0.99, h_last=None):
+    """
+        入力
+        particles:  粒子の数
+        rng:        乱数生成器 (numpy.random.Generator)
+        runs:       sv_sampleで得たモンテカルロ標本 (チェーン, 反復, パラメータ)
+                    （Noneならば粒子を事前分布とhの定常分布から生成する）
+        discount:   Liu and Westの方法の割引率 (0 < discount < 1)
+        h_last:     sv_sampleで得た最終時点の対数ボラティリティの標本
+                    (チェーン, 反復)（runsを与える場合は必須）
+        出力
+        粒子フィルターの状態を保持する辞書
+
+        runsとh_lastを与えると，パラメータと最終時点の対数ボラティリティの
+        組 (theta, h[n-1]) をその時点までの全データによる同時事後分布から
+        復元抽出して粒子の初期値とし，逐次更新を再開できる．
+    """
+    if not 0.0 < discount < 1.0:
+        raise ValueError('discountは0と1の間でなければならない．')
+    if runs is None:
+        #   事前分布はpybayes_mcmc_sv.pyのPyMCのモデルと同じ
+        nu = rng.exponential(5.0, size=particles)
+        sigma = np.abs(rng.standard_cauchy(size=particles))
+        rho = rng.uniform(-1.0, 1.0, size=particles)
+        omega = np.abs(rng.standard_cauchy(size=particles))
+        h = omega / np.sqrt(1.0 - rho**2) * rng.standard_normal(particles)
+    else:
+        if h_last is None:
+            raise ValueError('runsを与える場合はh_lastも必要である．')
+        draws = np.asarray(runs, dtype=float).reshape(-1, 4)
+        h_draws = np.asarray(h_last, dtype=float).ravel()
+        if h_draws.size != draws.shape[0]:
+            raise ValueError('h_lastの標本の数がrunsと一致しない．')
+        #   パラメータとhは同じ反復の標本を組にしたまま選ぶ
+        index = rng.integers(draws.shape[0], size=particles)
+        nu, sigma, rho, omega = draws[index].T
+        h = h_draws[index]
+    theta = np.column_stack((np.log(nu), np.log(sigma), np.arctanh(rho),
+                             np.log(omega)))
+    #   カーネルの縮小係数 a = (3 discount - 1) / (2 discount)
+    return {'theta': theta, 'h': h, 'log_w': np.zeros(particles),
+            'shrink': 0.5 * (3.0 * discount - 1.0) / discount,
+            'count': 0, 'loglik': 0.0, 'ess': float(particles)}
+#   新しい観測値による粒子フィルターの更新
+def sv_filter_update(state, y, rng):
+    """
+        入力
+        state:  粒子フィルターの状態を保持する辞書
+        y:      新しい収益率（1時点分）
+        rng:    乱数生成器 (numpy.random.Generator)
+        出力
+        なし（stateを更新する）
+
+        補助粒子フィルターで対数ボラティリティhとパラメータを同時に更新する．
+        パラメータの粒子は加重平均に向けて縮小した上で正規カーネルで撹乱し，
+        粒子の分散が増えないようにする．計算量は粒子数に比例し，
+        それまでの観測値の数には依存しない．
+    """
+    theta, h = state['theta'], state['h']
+    particles, k = theta.shape
+    a = state['shrink']
+    w = _normalized_weights(state['log_w'])
+    theta_mean = w.dot(theta)
+    theta_cov = np.cov(theta.T, aweights=w)
+    #   1段階目: 縮小したパラメータとhの予測値で粒子を選ぶ
+    m = a * theta + (1.0 - a) * theta_mean
+    h_pred = np.tanh(m[:, 2]) * h
+    log_g = _t_logpdf(y, m, h_pred)
+    log_w_norm = state['log_w'] - sp.logsumexp(state['log_w'])
+    log_first = log_w_norm + log_g
+    log_first_max = log_first.max()
+    first = np.exp(log_first - log_first_max)
+    index = _systematic_resample(first / first.sum(), rng)
+    #   2段階目: パラメータを撹乱し，hを遷移させて重みを修正する
+    chol = np.linalg.cholesky((1.0 - a**2) * theta_cov + 1e-12 * np.eye(k))
+    theta = m[index] + rng.standard_normal((particles, k)).dot(chol.T)
+    h = np.tanh(theta[:, 2]) * h[index] \
+        + np.exp(theta[:, 3]) * rng.standard_normal(particles)
+    log_w = _t_logpdf(y, theta, h) - log_g[index]
+    #   対数周辺尤度 log p(y[t] | y[1], ..., y[t-1]) の累積
+    log_w_max = log_w.max()
+    state['loglik'] += log_first_max + np.log(first.sum()) + log_w_max \
+                       + np.log(np.mean(np.exp(log_w - log_w_max)))
+    state['theta'], state['h'], state['log_w'] = theta, h, log_w
+    state['count'] += 1
+    w = _normalized_weights(log_w)
+    state['ess'] = 1.0 / w.dot(w)
+#   粒子フィルターの状態からの事後統計量の計算
+def sv_filter_result(state, prob=0.95):
+    """
+        入力
+        state:  粒子フィルターの状態を保持する辞書
+        prob:   信用区間の確率
+        出力
+        results:    事後統計量 (パラメータ, 統計量)
+                    （パラメータの順番はnu, sigma, rho, omega, 最新時点の
+                      ボラティリティ sigma * exp(h[t])，統計量の順番は
+                      平均，中央値，標準偏差，信用区間（下限），信用区間（上限））
+    """
+    w = _normalized_weights(state['log_w'])
+    nu, sigma, rho, omega = _theta_to_params(state['theta'])
+    values = np.column_stack((nu, sigma, rho, omega,
+                              sigma * np.exp(state['h'])))
+    post_mean = w.dot(values)
+    post_sd = np.sqrt(w.dot((values - post_mean)**2))
+    #   重み付きの分位点
+    order = np.argsort(values, axis=0)
+    cdf = np.cumsum(w[order], axis=0)
+    p = np.array([0.5, 0.5 * (1.0 - prob), 1.0 - 0.5 * (1.0 - prob)])
+    position = np.minimum((cdf[None, :, :] < p[:, None, None]).sum(axis=1),
+                          w.size - 1)
+    quantiles = np.take_along_axis(values, np.take_along_axis(
+        order, position, axis=0), axis=0)
+    return np.column_stack((post_mean, quantiles[0], post_sd,
+                            quantiles[1], quantiles[2]))
@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+#%% NumPyの読み込み
+import numpy as np
+#   ArviZの読み込み
+import arviz as az
+#   MCMCの診断統計量の関数の読み込み
+from pybayes_diagnostics import mcmc_summary
+#%% ディスク上のモンテカルロ標本（メモリマップ）
+#   モンテカルロ標本を保存するファイルの作成
+def trace_create(path, shape):
+    """
+        入力
+        path:   保存先のファイル（.npy）
+        shape:  モンテカルロ標本の形状（例えば(反復回数, パラメータ数)）
+        出力
+        ファイルに対応付けられた配列（numpy.memmap）
+    """
+    return np.lib.format.open_memmap(path, mode='w+', dtype=np.float64,
+                                     shape=tuple(shape))
+#   保存されたモンテカルロ標本の読み込み
+def trace_load(path, mode='r'):
+    """
+        入力
+        path:   保存されたファイル（.npy）
+        mode:   'r'（読み込みのみ）あるいは'r+'（書き込みも可）
+        出力
+        ファイルに対応付けられた配列（必要な部分だけがメモリに読み込まれる）
+    """
+    return np.load(path, mmap_mode=mode)
+#   パラメータを何個かずつに分けた事後統計量の計算
+def trace_summary(traces, prob, block=64):
+    """
+        入力
+        traces: モンテカルロ標本 (チェーン, 反復, パラメータ)
+                （メモリマップされた配列でもよい）
+        prob:   区間確率 (0 < prob < 1)
+        block:  一度にメモリに読み込むパラメータの数
+        出力
+        事後統計量 (パラメータ, 統計量)（mcmc_summaryと同じ形式）
+    """
+    k = traces.shape[2]
+    return np.vstack([mcmc_summary(np.asarray(traces[:, :, i:i+block]), prob)
+                      for i in range(0, k, block)])
+#   モンテカルロ標本のArviZのInferenceDataへの変換
+def trace_to_inference_data(runs, var_names):
+    """
+        入力
+        runs:       モンテカルロ標本 (チェーン, 反復, パラメータ)
+        var_names:  パラメータごとの変数名のリスト
+                    （同じ名前が続く列は1つのベクトルの変数にまとめる．
+                      例えば['b', 'b', 'b', 'sigma2']）
+        出力
+        ArviZのInferenceData（PyMCのpm.sampleの結果と同じように使える）
+    """
+    if len(var_names) != runs.shape[2]:
+        raise ValueError('var_namesの長さがパラメータの数と一致しない．')
+    posterior = {}
+    start = 0
+    for stop in range(1, len(var_names) + 1):
+        if stop == len(var_names) or var_names[stop] != var_names[start]:
+            if stop - start == 1:
+                posterior[var_names[start]] = runs[:, :, start]
+            else:
+                posterior[var_names[start]] = runs[:, :, start:stop]
+            start = stop
+    return az.from_dict(posterior=posterior)
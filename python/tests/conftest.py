@@ -0,0 +1,5 @@
+# -*- coding: utf-8 -*-
+#%% 補助モジュール（pybayes_*.py）をテストから読み込めるようにする
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+#%% NumPyの読み込み
+import numpy as np
+#   pytestの読み込み
+import pytest
+#   回帰モデルのギブズ・サンプラーの読み込み
+import pybayes_gibbs
+from pybayes_gibbs import gibbs_regression_chains, gibbs_regression_resume
+#%% 回帰モデルのデータと事前分布
+def _data():
+    rng = np.random.default_rng(0)
+    X = np.column_stack((np.ones(50), rng.standard_normal((50, 2))))
+    y = X.dot([1.0, 2.0, -1.0]) + 0.7 * rng.standard_normal(50)
+    return y, X, np.zeros(3), 0.2 * np.eye(3), 5.0, 7.0
+#   calls回目の途中経過の保存の直前（標本を書き込んだ後）に中断する
+class _Interrupt(Exception):
+    pass
+def _interrupt_at(monkeypatch, calls):
+    save = pybayes_gibbs._save_checkpoint
+    count = [0]
+    def interrupt_or_save(*args):
+        count[0] += 1
+        if count[0] == calls:
+            raise _Interrupt()
+        save(*args)
+    monkeypatch.setattr(pybayes_gibbs, '_save_checkpoint',
+                        interrupt_or_save)
+#%% 中断して再開した結果は中断しない場合と一致する
+@pytest.mark.parametrize('method, calls', [('cholesky', 2), ('eigh', 2),
+                                           ('eigh', 4), ('eigh', 5)])
+@pytest.mark.parametrize('bit_generator', [np.random.PCG64,
+                                           np.random.Philox,
+                                           np.random.SFC64,
+                                           np.random.MT19937])
+def test_resume_matches_uninterrupted(tmp_path, monkeypatch, method, calls,
+                                      bit_generator):
+    #   3000回の反復を1000回ごとに保存するので，eighの4回目と5回目の保存は
+    #   標本の変換の途中となる
+    args = _data()
+    expected = np.array(gibbs_regression_chains(
+        *args[:2], 3000, *args[2:], 2,
+        np.random.Generator(bit_generator(1)), method=method,
+        trace_path=str(tmp_path / 'reference.npy')))
+    trace_path = str(tmp_path / 'trace.npy')
+    checkpoint_path = str(tmp_path / 'checkpoint.pkl')
+    with monkeypatch.context() as m:
+        _interrupt_at(m, calls)
+        with pytest.raises(_Interrupt):
+            gibbs_regression_chains(*args[:2], 3000, *args[2:], 2,
+                                    np.random.Generator(bit_generator(1)),
+                                    method=method, trace_path=trace_path,
+                                    checkpoint_path=checkpoint_path)
+    runs = gibbs_regression_resume(*args, checkpoint_path)
+    np.testing.assert_array_equal(np.asarray(runs), expected)
+#%% データあるいは事前分布が異なる場合は再開できない
+def test_resume_rejects_different_setup(tmp_path, monkeypatch):
+    y, X, b0, A0, nu0, lam0 = _data()
+    checkpoint_path = str(tmp_path / 'checkpoint.pkl')
+    with monkeypatch.context() as m:
+        _interrupt_at(m, 2)
+        with pytest.raises(_Interrupt):
+            gibbs_regression_chains(y, X, 3000, b0, A0, nu0, lam0, 2,
+                                    np.random.default_rng(1),
+                                    trace_path=str(tmp_path / 'trace.npy'),
+                                    checkpoint_path=checkpoint_path)
+    with pytest.raises(ValueError):
+        gibbs_regression_resume(y + 1.0, X, b0, A0, nu0, lam0,
+                                checkpoint_path)
+    with pytest.raises(ValueError):
+        gibbs_regression_resume(y, X, b0, 2.0 * A0, nu0, lam0,
+                                checkpoint_path)
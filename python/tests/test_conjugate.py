@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+#%% NumPyの読み込み
+import numpy as np
+#   グループごとの回帰モデルの事後分布の関数の読み込み
+from pybayes_conjugate import regression_posterior, grouped_suffstats, \
+    grouped_regression_posterior, grouped_regression_stats
+#%% 事前分布の設定
+k = 3
+b0 = np.zeros(k)
+A0 = 0.2 * np.eye(k)
+nu0 = 5.0
+lam0 = 7.0
+#   事後分布の定義どおりの計算（逆行列を使う）
+def _posterior_direct(y, X):
+    A_star = X.T.dot(X) + A0
+    b_star = np.linalg.solve(A_star, X.T.dot(y) + A0.dot(b0))
+    lam_star = y.dot(y) + b0.dot(A0).dot(b0) \
+               - b_star.dot(A_star).dot(b_star) + lam0
+    return b_star, A_star, y.size + nu0, lam_star
+#%% 全てのグループでXXが正則ならば通常の回帰モデルと一致する
+def test_grouped_matches_regression_posterior():
+    rng = np.random.default_rng(0)
+    groups = np.repeat(np.arange(4), 50)
+    X = np.column_stack((np.ones(groups.size),
+                         rng.standard_normal((groups.size, k - 1))))
+    y = X.dot([1.0, -0.5, 2.0]) + rng.standard_normal(groups.size)
+    b_star, L_star, nu_star, lam_star \
+        = grouped_regression_posterior(grouped_suffstats(y, X, groups),
+                                       b0, A0, nu0, lam0)
+    for g in range(4):
+        Xg, yg = X[groups == g], y[groups == g]
+        state = {'n': yg.size, 'XX': Xg.T.dot(Xg), 'Xy': Xg.T.dot(yg),
+                 'yy': yg.dot(yg)}
+        b, A, nu, lam, _ = regression_posterior(state, b0, A0, nu0, lam0)
+        np.testing.assert_allclose(b_star[g], b)
+        np.testing.assert_allclose(L_star[g].dot(L_star[g].T), A)
+        assert nu_star[g] == nu
+        np.testing.assert_allclose(lam_star[g], lam)
+#%% 観測値が説明変数より少ないグループと欠番のグループ
+def test_grouped_small_and_empty_groups():
+    rng = np.random.default_rng(1)
+    #   グループ1は観測値が1つ，グループ2は欠番
+    groups = np.array([0] * 20 + [1] + [3] * 20)
+    X = np.column_stack((np.ones(groups.size),
+                         rng.standard_normal((groups.size, k - 1))))
+    y = X.dot([1.0, -0.5, 2.0]) + rng.standard_normal(groups.size)
+    state = grouped_suffstats(y, X, groups)
+    b_star, L_star, nu_star, lam_star \
+        = grouped_regression_posterior(state, b0, A0, nu0, lam0)
+    assert b_star.shape == (4, k)
+    for g in (0, 1, 3):
+        b, A, nu, lam = _posterior_direct(y[groups == g], X[groups == g])
+        np.testing.assert_allclose(b_star[g], b)
+        np.testing.assert_allclose(L_star[g].dot(L_star[g].T), A)
+        assert nu_star[g] == nu
+        np.testing.assert_allclose(lam_star[g], lam)
+    #   欠番のグループの事後分布は事前分布
+    np.testing.assert_allclose(b_star[2], b0)
+    np.testing.assert_allclose(L_star[2].dot(L_star[2].T), A0)
+    assert nu_star[2] == nu0
+    np.testing.assert_allclose(lam_star[2], lam0)
+    results = grouped_regression_stats(state, b0, A0, nu0, lam0, 0.95)[0]
+    assert np.isfinite(results.values).all()
@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+#%% NumPyの読み込み
+import numpy as np
+#   pytestの読み込み
+import pytest
+#   コンセンサス・モンテカルロ法の関数の読み込み
+from pybayes_consensus import shard_sample, consensus_combine, \
+    consensus_sample
+#%% 部分事前分布が正則でない分割の数はエラーとなる
+def test_improper_shard_prior(tmp_path):
+    rng = np.random.default_rng(0)
+    path = str(tmp_path / 'shard.npy')
+    np.save(path, rng.standard_normal((20, 3)))
+    #   (5 + 2) / 4 - 2 = -0.25
+    with pytest.raises(ValueError):
+        shard_sample('regression', path, 4, 10, np.zeros(2), np.eye(2), rng,
+                     5.0, 7.0)
+    with pytest.raises(ValueError):
+        consensus_sample('regression', [path] * 4, 10, 0, np.zeros(2),
+                         np.eye(2), 5.0, 7.0)
+    runs = shard_sample('regression', path, 2, 10, np.zeros(2), np.eye(2),
+                        rng, 5.0, 7.0)
+    assert runs.shape == (10, 3)
+#%% 正規分布の部分事後分布の統合は事後分布に一致する
+def test_combine_gaussian_subposteriors():
+    rng = np.random.default_rng(1)
+    means = np.array([[0.0, 1.0], [1.0, 0.0], [0.5, 0.5]])
+    subdraws = means[:, None, :] + rng.standard_normal((3, 20000, 2))
+    for method in ('consensus', 'gaussian'):
+        #   'gaussian'はrngを与えなくてもよい
+        draws = consensus_combine(subdraws, method)
+        np.testing.assert_allclose(draws.mean(axis=0), [0.5, 0.5],
+                                   atol=0.02)
+        np.testing.assert_allclose(draws.var(axis=0), [1.0 / 3.0] * 2,
+                                   rtol=0.05)
@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+#%% NumPyの読み込み
+import numpy as np
+#   pytestの読み込み
+import pytest
+#   MCMCの診断統計量の関数の読み込み
+from pybayes_diagnostics import rhat, ess, hdi
+#   ArviZがなければテストを飛ばす
+az = pytest.importorskip('arviz')
+#%% 比較に使うモンテカルロ標本 (チェーン, 反復, パラメータ)
+def _traces(chains, draws, rng):
+    e = rng.standard_normal((chains, draws, 3))
+    traces = np.empty_like(e)
+    traces[:, 0] = e[:, 0]
+    for t in range(1, draws):
+        traces[:, t] = 0.8 * traces[:, t-1] + e[:, t]
+    #   2番目のパラメータはチェーンごとに位置をずらす，3番目は同順位を含む
+    traces[:, :, 1] += 0.3 * np.arange(chains)[:, None]
+    traces[:, :, 2] = np.round(traces[:, :, 2])
+    return traces
+@pytest.mark.parametrize('chains, draws', [(4, 1000), (4, 501), (1, 800),
+                                           (3, 77)])
+def test_matches_arviz(chains, draws):
+    traces = _traces(chains, draws, np.random.default_rng(draws))
+    rhat_az = [az.rhat(traces[:, :, i]) for i in range(3)]
+    ess_az = [az.ess(traces[:, :, i]) for i in range(3)]
+    hdi_az = [az.hdi(traces[:, :, i].ravel(), hdi_prob=0.9)
+              for i in range(3)]
+    #   ArviZはチェーンが1つのときR-hatを計算しない
+    if chains > 1:
+        np.testing.assert_allclose(rhat(traces), rhat_az, rtol=1e-10)
+    np.testing.assert_allclose(ess(traces), ess_az, rtol=1e-10)
+    np.testing.assert_allclose(hdi(traces, 0.9), hdi_az, rtol=1e-10)
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+#%% NumPyの読み込み
+import numpy as np
+#   SciPyのstatsモジュールの読み込み
+import scipy.stats as st
+#   pytestの読み込み
+import pytest
+#   反復計算の核となる関数の読み込み
+from pybayes_kernels import ar1_simulate
+#   状態空間モデルの対数尤度の関数の読み込み
+from pybayes_statespace import ar1_loglik, kalman_loglik, structural_model
+#   ギブズ・サンプラーの読み込み
+from pybayes_gibbs import gibbs_gaussian_chain, gibbs_regression_chain
+#   Numbaがなければテストを飛ばす
+pytest.importorskip('numba')
+#%% カルマン・フィルターの対数尤度はNumPy版とNumba版で一致する
+def test_ar1_kernels_match():
+    rng = np.random.default_rng(0)
+    e = rng.standard_normal(500)
+    x = ar1_simulate(0.9, e, backend='numpy')
+    np.testing.assert_array_equal(ar1_simulate(0.9, e, backend='numba'), x)
+    y = x + 0.5 * rng.standard_normal(500)
+    for sigma, rho, omega in [(0.5, 0.9, 1.0), (2.0, -0.3, 0.1)]:
+        np.testing.assert_allclose(
+            ar1_loglik(y, sigma, rho, omega, backend='numba'),
+            ar1_loglik(y, sigma, rho, omega, backend='numpy'),
+            rtol=1e-12)
+def test_kalman_kernels_match():
+    rng = np.random.default_rng(1)
+    model = structural_model(period=4)
+    y = np.cumsum(rng.standard_normal(120)) \
+        + np.tile([1.0, -0.5, 0.3, -0.8], 30)
+    q = np.array([[0.1, 0.01], [1.0, 0.5], [0.01, 2.0]])
+    H = np.array([0.5, 1.0, 0.1])
+    args = (y, model['Z'], model['T'], model['R'], q, H, model['a0'],
+            model['P0'])
+    np.testing.assert_allclose(kalman_loglik(*args, backend='numba'),
+                               kalman_loglik(*args, backend='numpy'),
+                               rtol=1e-12)
+#%% ギブズ・サンプラーの標本はNumPy版とNumba版で同じ分布に従う
+def _same_distribution(runs_a, runs_b, thin=10):
+    #   自己相関を弱めるために間引いてからコルモゴロフ・スミルノフ検定を行う
+    for i in range(runs_a.shape[1]):
+        p = st.ks_2samp(runs_a[::thin, i], runs_b[::thin, i]).pvalue
+        assert p > 1e-3, 'パラメータ{0:d}の分布が異なる (p={1:.2g})'.format(i, p)
+def test_gaussian_chain_backends():
+    data = np.random.default_rng(2).normal(1.0, 2.0, 100)
+    args = (data, 20000, 0.0, 10.0, 5.0, 7.0)
+    _same_distribution(
+        gibbs_gaussian_chain(*args, np.random.default_rng(3),
+                             backend='numpy'),
+        gibbs_gaussian_chain(*args, np.random.default_rng(3),
+                             backend='numba'))
+def test_regression_chain_backends():
+    rng = np.random.default_rng(4)
+    X = np.column_stack((np.ones(100), rng.standard_normal((100, 2))))
+    y = X.dot([1.0, -0.5, 2.0]) + rng.standard_normal(100)
+    args = (y, X, 20000, np.zeros(3), 0.2 * np.eye(3), 5.0, 7.0)
+    _same_distribution(
+        gibbs_regression_chain(*args, np.random.default_rng(5),
+                               backend='numpy'),
+        gibbs_regression_chain(*args, np.random.default_rng(5),
+                               backend='numba'))
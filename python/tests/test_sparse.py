@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+#%% NumPyの読み込み
+import numpy as np
+#   SciPyのstatsモジュールの読み込み
+import scipy.stats as st
+#   SciPyのsparseモジュールの読み込み
+import scipy.sparse as sparse
+#   pytestの読み込み
+import pytest
+#   疎な精度行列の分解の関数の読み込み
+from pybayes_mvn import sparse_precision_ordering, sparse_precision_factor, \
+    sparse_precision_solve, sparse_precision_sample
+#   十分統計量と事後分布の関数の読み込み
+from pybayes_conjugate import suffstats, stream_suffstats, \
+    regression_posterior, regression_sample
+#   回帰モデルのギブズ・サンプラーの読み込み
+from pybayes_gibbs import gibbs_regression_chains
+#%% 連続変数とダミー変数を説明変数とするデータ
+def _dummy_data(n, groups, rng):
+    group = rng.integers(0, groups, size=n)
+    X = sparse.hstack((
+        sparse.csr_matrix(rng.standard_normal((n, 2))),
+        sparse.csr_matrix((np.ones(n), (np.arange(n), group)),
+                          shape=(n, groups)))).tocsr()
+    b = np.concatenate(([1.0, -0.5], rng.normal(size=groups)))
+    y = X @ b + rng.normal(scale=0.5, size=n)
+    return y, X
+#%% 疎な精度行列の分解
+def test_sparse_precision_factor():
+    rng = np.random.default_rng(0)
+    _, X = _dummy_data(500, 40, rng)
+    Q = (X.T @ X + sparse.eye(X.shape[1])).tocsc()
+    b = rng.standard_normal(X.shape[1])
+    x = np.linalg.solve(Q.toarray(), b)
+    np.testing.assert_allclose(
+        sparse_precision_solve(sparse_precision_factor(Q), b), x)
+    #   並べ替えは非ゼロ要素の位置が同じ別の精度行列にも使える
+    perm = sparse_precision_ordering(Q)
+    np.testing.assert_allclose(
+        sparse_precision_solve(sparse_precision_factor(2.0 * Q, perm), b),
+        0.5 * x)
+    #   乱数の平均と共分散行列
+    factor = sparse_precision_factor(Q, perm)
+    draws = sparse_precision_sample(factor, b, rng, size=200000)
+    np.testing.assert_allclose(draws.mean(axis=0), x, atol=0.02)
+    np.testing.assert_allclose(np.cov(draws.T), np.linalg.inv(Q.toarray()),
+                               atol=0.01)
+#%% 対称な分解が得られない行列はエラーとなる
+def test_sparse_precision_factor_not_positive_definite():
+    identity = np.arange(2)
+    #   対角要素が0なので行の入れ替えが起こる
+    Q = sparse.csc_matrix(np.array([[0.0, 1.0], [1.0, 0.0]]))
+    with pytest.raises(ValueError):
+        sparse_precision_factor(Q, identity)
+    #   行の入れ替えは起こらないが正定値でない
+    Q = sparse.csc_matrix(np.array([[1.0, 2.0], [2.0, 1.0]]))
+    with pytest.raises(ValueError):
+        sparse_precision_factor(Q, identity)
+#%% 疎行列のデータは既存の関数でそのまま扱える
+def test_sparse_conjugate_matches_dense():
+    rng = np.random.default_rng(1)
+    y, X = _dummy_data(2000, 30, rng)
+    k = X.shape[1]
+    data = sparse.hstack((sparse.csr_matrix(y[:, None]), X)).tocsr()
+    state = stream_suffstats('regression',
+                             (data[i:i+300] for i in range(0, 2000, 300)))
+    assert sparse.issparse(state['XX'])
+    dense = suffstats('regression', data.toarray())
+    b0 = np.zeros(k)
+    A0 = 0.2 * np.eye(k)
+    b, A, nu, lam, rss = regression_posterior(state, b0, np.full(k, 0.2),
+                                              5.0, 7.0)
+    b_d, A_d, nu_d, lam_d, _ = regression_posterior(dense, b0, A0, 5.0, 7.0)
+    assert rss is None
+    np.testing.assert_allclose(b, b_d)
+    np.testing.assert_allclose(A.toarray(), A_d)
+    assert nu == nu_d
+    np.testing.assert_allclose(lam, lam_d)
+    trace = regression_sample(state, b0, A0, 5.0, 7.0, 5000, rng)
+    np.testing.assert_allclose(trace.posterior['b'].values[0].mean(axis=0),
+                               b, atol=0.02)
+#%% 疎行列のギブズ・サンプラーは密行列の場合と同じ分布に従う
+def test_sparse_gibbs_matches_dense():
+    rng = np.random.default_rng(2)
+    y, X = _dummy_data(400, 10, rng)
+    k = X.shape[1]
+    args = (np.zeros(k), 0.2 * np.eye(k), 5.0, 7.0)
+    runs = gibbs_regression_chains(y, X, 5000, *args, 2,
+                                   np.random.default_rng(3))
+    runs_dense = gibbs_regression_chains(y, X.toarray(), 5000, *args, 2,
+                                         np.random.default_rng(4))
+    for i in range(k + 1):
+        p = st.ks_2samp(runs[:, 500::5, i].ravel(),
+                        runs_dense[:, 500::5, i].ravel()).pvalue
+        assert p > 1e-3, 'パラメータ{0:d}の分布が異なる (p={1:.2g})'.format(i, p)
+def test_sparse_gibbs_singular_design():
+    #   切片と全てのダミー変数を含むのでX'Xは正則でない
+    rng = np.random.default_rng(5)
+    y, X = _dummy_data(300, 8, rng)
+    X = sparse.hstack((sparse.csr_matrix(np.ones((300, 1))), X)).tocsr()
+    k = X.shape[1]
+    runs = gibbs_regression_chains(y, X, 500, np.zeros(k), np.full(k, 0.2),
+                                   5.0, 7.0, 2, rng)
+    assert runs.shape == (2, 500, k + 1)
+    assert np.isfinite(runs).all()
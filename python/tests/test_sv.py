@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+#%% NumPyの読み込み
+import numpy as np
+#   pytestの読み込み
+import pytest
+#   確率的ボラティリティ・モデルの関数の読み込み
+from pybayes_sv import sv_sample, sv_filter_init, sv_filter_update, \
+    sv_filter_result
+#%% 再推定の直後の粒子フィルターのボラティリティはsv_sampleと一致する
+def test_filter_resumes_from_final_volatility():
+    rng = np.random.default_rng(0)
+    n = 300
+    h = np.empty(n)
+    h[0] = 0.0
+    for t in range(1, n):
+        h[t] = 0.95 * h[t-1] + 0.3 * rng.standard_normal()
+    #   最終時点のボラティリティが定常分布の中心から離れるようにする
+    h[-20:] += 1.5
+    y = 0.01 * np.exp(h) * rng.standard_normal(n)
+    runs, vol, h_last = sv_sample(y, 500, 200, 2, rng)
+    assert h_last.shape == runs.shape[:2]
+    state = sv_filter_init(20000, rng, runs, h_last=h_last)
+    result = sv_filter_result(state)
+    np.testing.assert_allclose(result[4, 0], vol[-1, 0], rtol=0.05)
+    np.testing.assert_allclose(result[4, 1], vol[-1, 1], rtol=0.05)
+    sv_filter_update(state, 0.0, rng)
+    assert np.all(np.isfinite(sv_filter_result(state)))
+    with pytest.raises(ValueError):
+        sv_filter_init(100, rng, runs)